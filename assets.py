@@ -0,0 +1,10 @@
+# BT81x bitmaps of images/, generated by tools/imgprep.py (do not edit)
+#
+# name: file (from the project root, registered by its name), width, height,
+# format, stride, size (in RAM_G), packed size,
+# compressed (for CMD_INFLATE), sha1 of the file
+
+IMAGES = {
+    'gui_riverdi_logo.png': ('images/build/gui_riverdi_logo.argb4.z', 642, 144, 6, 1284, 184896, 5488, True, '1b9cdb014ac0e7093b70d03d2221b4383860cdae'),
+    'screensaver.png': ('images/build/screensaver.argb4.z', 300, 75, 6, 600, 45000, 2333, True, '2469b5846e24b5e09b9ffa96cdc331323e07850e'),
+}
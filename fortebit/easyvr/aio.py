@@ -0,0 +1,518 @@
+"""
+.. module:: aio
+
+******************
+EasyVR for asyncio
+******************
+
+    Asynchronous client for the EasyVR protocol, for host deployments running
+    CPython 3.7 or newer.
+
+    Long-running operations (recognition, training, playback, token detection,
+    recording and verification) return *asyncio* futures that resolve with a
+    :class:`easyvr.Result` record, so that a single event loop can drive voice,
+    display and network I/O without threads or ``sleep()`` polling. Any number of
+    modules can be driven from the same event loop, each with its own transport::
+
+        async def listen(port):
+            evr = AsyncEasyVR(await open_serial(port, 9600))
+            if await evr.detect():
+                result = await evr.recognizeWord(evr.TRIGGER_SET)
+                print(port, result.getWord())
+
+        async def main():
+            await asyncio.gather(*[listen(p) for p in ports])
+
+        asyncio.run(main())
+
+    Cancelling a pending future (for example with ``asyncio.wait_for()``) interrupts
+    the module task like :meth:`easyvr.EasyVR.stop()`.
+
+    """
+
+import asyncio
+
+from fortebit.easyvr.easyvr import EasyVR, Result, _millis, _ARG_MIN, _ARG_MAX, _ARG_ZERO, _ARG_ACK, \
+    _CMD_BREAK, _CMD_ID, _CMD_LANGUAGE, _CMD_TIMEOUT, _CMD_MIC_DIST, _CMD_KNOB, \
+    _CMD_TRAILING, _CMD_LEVEL, _CMD_FAST_SD, _CMD_RECOG_SD, _CMD_RECOG_SI, \
+    _CMD_TRAIN_SD, _CMD_PLAY_SX, _CMD_RECV_SN, _CMD_RECORD_RP, _CMD_SERVICE, \
+    _SVC_VERIFY_SD, _STS_SUCCESS, _STS_INTERR, _STS_ID, _STS_SIMILAR, _STS_RESULT, \
+    _STS_TOKEN, _STS_AWAKEN, _STS_TIMEOUT, _STS_INVALID, _STS_ERROR
+
+
+class AsyncSerial(asyncio.Protocol):
+    """
+.. class:: AsyncSerial
+
+    Serial transport abstraction used by :class:`AsyncEasyVR`: an *asyncio* protocol \
+    that buffers incoming data and lets the client wait for it. Create instances \
+    with :func:`open_serial()` or :func:`open_socket()`, or pass it as protocol \
+    factory to any *asyncio* transport constructor.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._transport = None
+        self._waiter = None
+        self._lost = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def data_received(self, data):
+        self._buf.extend(data)
+        self._wakeup()
+
+    def connection_lost(self, exc):
+        self._lost = exc if exc is not None else ConnectionError("connection closed")
+        self._wakeup()
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def write(self, data):
+        """
+.. method:: write(data)
+
+        Queues *data* for transmission.
+        """
+        if self._lost is not None:
+            raise self._lost
+        self._transport.write(bytes(data))
+
+    def discard(self):
+        """
+.. method:: discard()
+
+        Drops any received data not read yet.
+        """
+        del self._buf[:]
+
+    async def read(self, n, timeout = -1):
+        """
+.. method:: read(n, timeout)
+
+        Reads exactly *n* bytes.
+
+        :param timeout: is the maximum time to wait for each chunk of data, in \
+        milliseconds, or (-1) to wait without time limits
+
+        :return: a *bytes* object, raises *TimeoutError* if the timeout expires
+        """
+        while len(self._buf) < n:
+            if self._lost is not None:
+                raise self._lost
+            self._waiter = asyncio.get_event_loop().create_future()
+            try:
+                if timeout < 0:
+                    await self._waiter
+                else:
+                    await asyncio.wait_for(self._waiter, timeout * 0.001)
+            except asyncio.TimeoutError:
+                raise TimeoutError
+            finally:
+                self._waiter = None
+        data = bytes(self._buf[:n])
+        del self._buf[:n]
+        return data
+
+    def close(self):
+        """
+.. method:: close()
+
+        Closes the underlying transport.
+        """
+        if self._transport is not None:
+            self._transport.close()
+
+
+async def open_serial(port, baudrate = 9600):
+    """
+.. function:: open_serial(port, baudrate)
+
+    Opens a serial port (or pseudo-terminal) with the optional *pyserial-asyncio* package.
+
+    :return: an :class:`AsyncSerial` object
+    """
+    try:
+        import serial_asyncio
+    except ImportError:
+        raise RuntimeError("open_serial() requires the pyserial-asyncio package")
+    loop = asyncio.get_event_loop()
+    transport, protocol = await serial_asyncio.create_serial_connection(loop, AsyncSerial, port, baudrate=baudrate)
+    return protocol
+
+
+async def open_socket(sock):
+    """
+.. function:: open_socket(sock)
+
+    Wraps a connected socket (such as one end of a *socketpair()*, or a TCP serial bridge).
+
+    :return: an :class:`AsyncSerial` object
+    """
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_connection(AsyncSerial, sock=sock)
+    return protocol
+
+
+class AsyncEasyVR():
+    """
+.. class:: AsyncEasyVR
+
+    The asyncio counterpart of the :class:`easyvr.EasyVR` class, speaking the same \
+    protocol over an :class:`AsyncSerial` transport. The constants defined by the \
+    EasyVR class are available on this class as well.
+
+    Only one task at a time can run on a module: operations started while another \
+    one is pending are queued until it completes.
+    """
+
+    def __init__(self, transport):
+        """
+.. method:: __init__(transport)
+
+        :param transport: the :class:`AsyncSerial` object connected to the module
+        """
+        self._io = transport
+        self._lock = asyncio.Lock()
+        self._group = -1
+        self._id = -1
+        self._current = None
+
+    # internal functions
+
+    async def _send(self, cmd, args = (), group = None, tail = ()):
+        # write a whole frame, split after the group argument when the module
+        # needs to cache a different group
+        self._io.discard()
+        tx = bytearray(cmd)
+        for i in args:
+            tx.append(i + _ARG_ZERO)
+        pause = 0
+        if group is not None:
+            tx.append(group + _ARG_ZERO)
+            if group != self._group:
+                self._group = group
+                # worst case time to cache a full group in memory
+                if self._id >= EasyVR.EASYVR3PLUS:
+                    pause = 0.079
+                elif self._id >= EasyVR.EASYVR3:
+                    pause = 0.039
+                else:
+                    pause = 0.019
+        rest = bytearray()
+        for i in tail:
+            rest.append(i + _ARG_ZERO)
+        if not pause:
+            self._io.write(tx + rest)
+            return
+        # the frame is completed even if the caller is cancelled meanwhile,
+        # or the module would take the next bytes as the missing arguments
+        write = asyncio.ensure_future(self._sendSplit(tx, pause, rest))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            await write
+            raise
+
+    async def _sendSplit(self, head, pause, tail):
+        self._io.write(head)
+        await asyncio.sleep(pause)
+        if tail:
+            self._io.write(tail)
+
+    async def _recv(self, timeout):
+        return await self._io.read(1, timeout)
+
+    async def _recvArgs(self, n):
+        # pipelined acknowledge, as in EasyVR._recvArgs()
+        self._io.write(_ARG_ACK * n)
+        data = await self._io.read(n, EasyVR.DEF_TIMEOUT)
+        for r in data:
+            if r < _ARG_MIN or r > _ARG_MAX:
+                raise ValueError
+        return [r - _ARG_ZERO for r in data]
+
+    async def _readResult(self, request, timeout = -1):
+        # same decoding as EasyVR._readStatus()
+        rx = await self._recv(timeout)
+        status = 0
+        value = 0
+        if rx == _STS_SIMILAR:
+            status = EasyVR._is_builtin
+            value = (await self._recvArgs(1))[0]
+        elif rx == _STS_RESULT:
+            status = EasyVR._is_command
+            value = (await self._recvArgs(1))[0]
+        elif rx == _STS_TOKEN:
+            status = EasyVR._is_token
+            data = await self._recvArgs(2)
+            value = (data[0] << 5) | data[1]
+        elif rx == _STS_AWAKEN:
+            status = EasyVR._is_awakened
+        elif rx == _STS_TIMEOUT:
+            status = EasyVR._is_timeout
+        elif rx == _STS_INVALID:
+            status = EasyVR._is_invalid
+        elif rx == _STS_ERROR:
+            status = EasyVR._is_error
+            data = await self._recvArgs(2)
+            value = (data[0] << 4) | data[1]
+        elif rx != _STS_SUCCESS:
+            raise ValueError
+        return Result(request, status, value, _millis())
+
+    async def _break(self, pending = False):
+        # as in EasyVR.stop(): the result of a pending task may cross the break,
+        # so it is read (if already received) instead of discarded
+        if not pending:
+            self._io.discard()
+        self._io.write(_CMD_BREAK)
+        rx = await self._recv(EasyVR.STORAGE_TIMEOUT)
+        if rx != _STS_INTERR and pending:
+            # the task completed before the break: its result is discarded and
+            # the module replies to the break as if idle
+            rx = await self._recv(EasyVR.DEF_TIMEOUT)
+        if rx == _STS_INTERR or rx == _STS_SUCCESS:
+            return
+        raise ValueError
+
+    async def _task(self, cmd, args = (), group = None, tail = ()):
+        async with self._lock:
+            try:
+                await self._send(cmd, args, group, tail)
+                return await self._readResult(cmd)
+            except asyncio.CancelledError:
+                # interrupt the module before giving up the link
+                try:
+                    await self._break(True)
+                except (TimeoutError, ValueError):
+                    pass
+                raise
+
+    def _start(self, cmd, args = (), group = None, tail = ()):
+        self._current = asyncio.ensure_future(self._task(cmd, args, group, tail))
+        return self._current
+
+    async def _config(self, cmd, args):
+        async with self._lock:
+            await self._send(cmd, args)
+            if await self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
+                return
+            raise ValueError
+
+    # lifecycle and configuration
+
+    async def detect(self):
+        """
+.. method:: detect()
+
+        Detects an EasyVR module, waking it from sleep mode and checking
+        it responds correctly.
+
+        :return: *True* if a compatible module has been found
+        """
+        async with self._lock:
+            for i in range(5):
+                self._io.discard()
+                self._io.write(_CMD_BREAK)
+                try:
+                    if await self._recv(EasyVR.WAKE_TIMEOUT) == _STS_SUCCESS:
+                        return True
+                except TimeoutError:
+                    pass
+            return False
+
+    async def stop(self):
+        """
+.. method:: stop()
+
+        Interrupts pending recognition or playback operations (the pending future \
+        is cancelled).
+        """
+        task = self._current
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            return
+        async with self._lock:
+            await self._break()
+
+    async def getID(self):
+        """
+.. method:: getID()
+
+        Gets the module identification number (firmware version).
+
+        :return: integer is one of the values in ModuleId
+        """
+        async with self._lock:
+            self._id = -1
+            await self._send(_CMD_ID)
+            if await self._recv(EasyVR.DEF_TIMEOUT) == _STS_ID:
+                self._id = (await self._recvArgs(1))[0]
+            return self._id
+
+    async def setLanguage(self, lang):
+        """
+.. method:: setLanguage(lang)
+
+        Same as :meth:`easyvr.EasyVR.setLanguage()`.
+        """
+        await self._config(_CMD_LANGUAGE, (lang,))
+
+    async def setTimeout(self, seconds):
+        """
+.. method:: setTimeout(seconds)
+
+        Same as :meth:`easyvr.EasyVR.setTimeout()`.
+        """
+        await self._config(_CMD_TIMEOUT, (seconds,))
+
+    async def setMicDistance(self, dist):
+        """
+.. method:: setMicDistance(dist)
+
+        Same as :meth:`easyvr.EasyVR.setMicDistance()`.
+        """
+        await self._config(_CMD_MIC_DIST, (-1, dist))
+
+    async def setKnob(self, knob):
+        """
+.. method:: setKnob(knob)
+
+        Same as :meth:`easyvr.EasyVR.setKnob()`.
+        """
+        await self._config(_CMD_KNOB, (knob,))
+
+    async def setTrailingSilence(self, dur):
+        """
+.. method:: setTrailingSilence(dur)
+
+        Same as :meth:`easyvr.EasyVR.setTrailingSilence()`.
+        """
+        await self._config(_CMD_TRAILING, (-1, dur))
+
+    async def setLevel(self, level):
+        """
+.. method:: setLevel(level)
+
+        Same as :meth:`easyvr.EasyVR.setLevel()`.
+        """
+        await self._config(_CMD_LEVEL, (level,))
+
+    async def setCommandLatency(self, mode):
+        """
+.. method:: setCommandLatency(mode)
+
+        Same as :meth:`easyvr.EasyVR.setCommandLatency()`.
+        """
+        await self._config(_CMD_FAST_SD, (-1, mode))
+
+    # long-running operations
+
+    def recognizeCommand(self, group):
+        """
+.. method:: recognizeCommand(group)
+
+        Starts recognition of a custom command.
+
+        :param group: (0-16) is the target group, or one of the values in #Groups
+
+        :return: a future resolving with a :class:`easyvr.Result`
+        """
+        return self._start(_CMD_RECOG_SD, (group,))
+
+    def recognizeWord(self, wordset):
+        """
+.. method:: recognizeWord(wordset)
+
+        Starts recognition of a built-in word or custom grammar.
+
+        :param wordset: (0-3) is the target word set, (4-31) is the target custom grammar
+
+        :return: a future resolving with a :class:`easyvr.Result`
+        """
+        return self._start(_CMD_RECOG_SI, (wordset,))
+
+    def trainCommand(self, group, index):
+        """
+.. method:: trainCommand(group, index)
+
+        Starts training of a custom command.
+
+        :param group: (0-16) is the target group, or one of the values in #Groups
+        :param index: (0-31) is the index of the command within the selected group
+
+        :return: a future resolving with a :class:`easyvr.Result`
+        """
+        return self._start(_CMD_TRAIN_SD, (), group, (index,))
+
+    def playSoundAsync(self, index, volume):
+        """
+.. method:: playSoundAsync(index, volume)
+
+        Starts playback of a sound from the sound table.
+
+        :param index: is the index of the target sound in the sound table
+        :param volume: (0-31) may be one of the values in #SoundVolume
+
+        :return: a future resolving with a :class:`easyvr.Result` when playback ends
+        """
+        return self._start(_CMD_PLAY_SX, ((index >> 5) & 0x1F, index & 0x1F, volume))
+
+    def detectToken(self, bits, rejection, timeout):
+        """
+.. method:: detectToken(bits, rejection, timeout)
+
+        Starts listening for a SonicNet token.
+
+        :param bits: (4 or 8) specifies the length of received tokens
+        :param rejection: (0-2) specifies the noise rejection level
+        :param timeout: (1-28090) is the maximum time in milliseconds to keep \
+        listening for a valid token or (0) to listen without time limits.
+
+        :return: a future resolving with a :class:`easyvr.Result`
+        """
+        if timeout > 0:
+            timeout = int((timeout * 2 + 53)/ 55) # approx / 27.46 - err < 0.15%
+        return self._start(_CMD_RECV_SN, (bits, rejection, (timeout >> 5) & 0x1F, timeout & 0x1F))
+
+    def recordMessageAsync(self, index, bits, timeout):
+        """
+.. method:: recordMessageAsync(index, bits, timeout)
+
+        Starts recording a message.
+
+        :param index: (0-31) is the index of the target message slot
+        :param bits: (8) specifies the audio format (see `MessageType`)
+        :param timeout: (0-31) is the maximum recording time (0=infinite)
+
+        :return: a future resolving with a :class:`easyvr.Result`
+        """
+        return self._start(_CMD_RECORD_RP, (-1, index, bits, timeout))
+
+    def verifyCommand(self, group, index):
+        """
+.. method:: verifyCommand(group, index)
+
+        Verifies training of a custom command (useful after import).
+
+        :param group: (0-16) is the target group, or one of the values in #Groups
+        :param index: (0-31) is the index of the command within the selected group
+
+        :return: a future resolving with a :class:`easyvr.Result`
+        """
+        return self._start(_CMD_SERVICE, (ord(_SVC_VERIFY_SD) - _ARG_ZERO,), group, (index,))
+
+
+# share the public constants of the EasyVR class
+for _name in dir(EasyVR):
+    if _name.isupper():
+        setattr(AsyncEasyVR, _name, getattr(EasyVR, _name))
@@ -0,0 +1,157 @@
+"""
+.. module:: bench
+
+****************
+EasyVR Benchmark
+****************
+
+    Measures the cost of the :class:`easyvr.EasyVR` protocol operations against the
+    simulated module of the :mod:`simulator` module (CPython only): wall time,
+    bytes on the wire in both directions and round trips (host writes) per call.
+
+    Run it from the project root::
+
+        python -m fortebit.easyvr.bench --baud 9600 115200 --repeat 5 --output bench.json
+
+    Results are printed (or saved) as a JSON document, with one record per
+    operation and baudrate, to track regressions of the serial protocol code.
+
+    """
+
+import json
+import sys
+import time
+
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.simulator import EasyVRSimulator, open_loopback
+
+
+def _setup(sim):
+    # a populated module: a trigger, a few commands and two passwords
+    sim.addCommand(EasyVR.TRIGGER, 0, "HELLO ROBOT", training=2)
+    for i, label in enumerate(["LIGHTS ON", "LIGHTS OFF", "OPEN DOOR", "CLOSE DOOR"]):
+        sim.addCommand(1, i, label, training=2)
+    sim.addCommand(EasyVR.PASSWORD, 0, "USER 1", training=2)
+    sim.addCommand(EasyVR.PASSWORD, 1, "USER 2", training=2)
+    sim.addCommand(3, 0, "SCRATCH")
+
+
+def _recognizeCycle(evr):
+    evr.recognizeWord(EasyVR.TRIGGER_SET)
+    while not evr.hasFinished():
+        pass
+
+
+def _recognizeWait(evr):
+    evr.recognizeWord(EasyVR.TRIGGER_SET)
+    evr.waitResult(EasyVR.PLAY_TIMEOUT)
+
+
+_BLOB = bytearray(258)
+
+BENCHMARKS = [
+    ("detect",              lambda evr: evr.detect()),
+    ("getID",               lambda evr: evr.getID()),
+    ("setLanguage",         lambda evr: evr.setLanguage(EasyVR.ENGLISH)),
+    ("setTimeout",          lambda evr: evr.setTimeout(5)),
+    ("setKnob",             lambda evr: evr.setKnob(EasyVR.TYPICAL)),
+    ("setLevel",            lambda evr: evr.setLevel(EasyVR.NORMAL)),
+    ("setCommandLatency",   lambda evr: evr.setCommandLatency(EasyVR.MODE_FAST)),
+    ("setMicDistance",      lambda evr: evr.setMicDistance(EasyVR.ARMS_LENGTH)),
+    ("setTrailingSilence",  lambda evr: evr.setTrailingSilence(EasyVR.TRAILING_DEF)),
+    ("setDelay",            lambda evr: evr.setDelay(0)),
+    ("getGroupMask",        lambda evr: evr.getGroupMask()),
+    ("getCommandCount",     lambda evr: evr.getCommandCount(1)),
+    ("dumpCommand",         lambda evr: evr.dumpCommand(1, 0)),
+    ("exportCommand",       lambda evr: evr.exportCommand(EasyVR.PASSWORD, 0)),
+    ("importCommand",       lambda evr: evr.importCommand(3, 0, _BLOB)),
+    ("dumpSoundTable",      lambda evr: evr.dumpSoundTable()),
+    ("getGrammarsCount",    lambda evr: evr.getGrammarsCount()),
+    ("dumpGrammar",         lambda evr: evr.dumpGrammar(EasyVR.ACTION_SET)),
+    ("recognize+hasFinished", _recognizeCycle),
+    ("recognize+waitResult",  _recognizeWait),
+    ("dumpCommand (cached)",  lambda evr: evr.dumpCommand(1, 0)),
+]
+
+# served from the inventory cache after the warm up call, all the other
+# operations are measured on the link (the cache is cleared before each call)
+CACHED = ("dumpCommand (cached)",)
+
+
+def run(baudrate = 9600, repeat = 5, names = None, **latency):
+    """
+.. function:: run(baudrate, repeat, names, **latency)
+
+    Runs the benchmarks against a new simulated module.
+
+    :param baudrate: the link speed
+    :param repeat: how many times each operation is measured
+    :param names: the list of operations to run (default all of :data:`BENCHMARKS`)
+    :param latency: latencies passed to :class:`simulator.EasyVRSimulator`
+
+    :return: a list of dictionaries, one per operation
+    """
+    if 'recognition' not in latency:
+        latency['recognition'] = 0.02
+    sim = EasyVRSimulator(baudrate=baudrate, **latency)
+    _setup(sim)
+    stream = open_loopback(sim)
+    evr = EasyVR(stream)
+    results = []
+    try:
+        if not evr.detect():
+            raise RuntimeError("simulated module not detected")
+        evr.getID()
+        for (name, fn) in BENCHMARKS:
+            if names is not None and name not in names:
+                continue
+            fn(evr) # warm up (group cache, first reply)
+            times = []
+            stream.resetCounters()
+            for i in range(repeat):
+                if name not in CACHED:
+                    evr.invalidateCache()
+                t = time.perf_counter()
+                fn(evr)
+                times.append(time.perf_counter() - t)
+            times.sort()
+            results.append({
+                "operation": name,
+                "baudrate": baudrate,
+                "repeat": repeat,
+                "min_ms": round(times[0] * 1000, 3),
+                "median_ms": round(times[len(times) // 2] * 1000, 3),
+                "mean_ms": round(sum(times) / len(times) * 1000, 3),
+                "bytes_sent": stream.bytesWritten / repeat,
+                "bytes_received": stream.bytesRead / repeat,
+                "round_trips": stream.writes / repeat,
+            })
+    finally:
+        stream.close()
+    return results
+
+
+def main(argv = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fortebit.easyvr.bench", description="EasyVR protocol benchmark")
+    parser.add_argument("--baud", type=int, nargs="+", default=[9600, 115200], help="baudrates to test")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per operation")
+    parser.add_argument("--only", nargs="+", default=None, help="operations to run")
+    parser.add_argument("--output", default=None, help="JSON output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for baud in args.baud:
+        results.extend(run(baud, args.repeat, args.only))
+    doc = {"python": sys.version.split()[0], "results": results}
+    if args.output is None:
+        json.dump(doc, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -94,6 +94,61 @@ _ARG_ZERO     = 0x41
 
 _ARG_ACK      = b' '     # to read more status arguments
 
+# receive buffer
+
+_RX_SIZE      = 1024    # ring buffer size (power of two)
+_RX_MASK      = _RX_SIZE - 1
+_ARGS_SIZE    = 1 + 258 * 2  # longest reply (raw command export)
+
+# single byte objects, to return received status codes without allocations
+_BYTES = [bytes([i]) for i in range(256)]
+
+# instrumentation counters, per opcode (see EasyVR.enableStats)
+_ST_CALLS     = 0
+_ST_SENT      = 1
+_ST_RECEIVED  = 2
+_ST_WRITES    = 3
+_ST_ACKS      = 4
+_ST_TIMEOUTS  = 5
+_ST_ERRORS    = 6
+_ST_DELAY     = 7
+_ST_SAMPLES   = 8
+_ST_TOTAL     = 9
+_ST_MAX       = 10
+_ST_HIST      = 11
+_ST_BOUNDS    = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+_ST_SIZE      = _ST_HIST + len(_ST_BOUNDS) + 1
+
+# module speeds (bps) and their baudrate codes, fastest first
+_BAUDRATES    = ((115200, 1), (57600, 2), (38400, 3), (19200, 6), (9600, 12))
+
+# inventory snapshot header (see EasyVR.saveInventory)
+_INV_MAGIC    = b'EVI1'
+
+
+def _packLabel(buf, label):
+    buf.append(len(label))
+    for c in label:
+        buf.append(ord(c))
+
+def _unpackLabel(data, pos):
+    # returns the label and the position after it
+    end = pos + 1 + data[pos]
+    label = ''
+    for i in range(pos + 1, end):
+        label += chr(data[i])
+    return (label, end)
+
+def _statSample(row, ms):
+    row[_ST_SAMPLES] += 1
+    row[_ST_TOTAL] += ms
+    if ms > row[_ST_MAX]:
+        row[_ST_MAX] = ms
+    i = 0
+    while i < len(_ST_BOUNDS) and ms > _ST_BOUNDS[i]:
+        i += 1
+    row[_ST_HIST + i] += 1
+
 
 # Define abstractions for different python environments
 
@@ -112,8 +167,14 @@ try:
         return stream.available()
     def _delay(ms):
         sleep(ms)
-    def _millis(ms):
-        return timers.now(ms)
+    def _millis():
+        return timers.now()
+    def _ticks_add(t, ms):
+        return t + ms
+    def _ticks_diff(a, b):
+        return a - b
+    def _wait(stream, ms):
+        sleep(1)
     _api = True
 except:
     pass
@@ -124,25 +185,48 @@ if not _api:
     try:
         # use CPython/circuitpython
         from time import sleep,monotonic
+        try:
+            from select import select as _select
+        except:
+            _select = None
         def _delay(ms):
             sleep(0.001*ms)
         def _available(stream):
             return stream.in_waiting
-        def _millis(ms):
+        def _millis():
             return monotonic()*1000
+        def _ticks_add(t, ms):
+            return t + ms
+        def _ticks_diff(a, b):
+            return a - b
+        def _wait(stream, ms):
+            # wake up as soon as data arrives, when the stream can be selected
+            if _select is not None and hasattr(stream, 'fileno'):
+                try:
+                    _select((stream,), (), (), 0.001*ms)
+                    return
+                except:
+                    pass
+            sleep(0.001*(ms if ms < 1 else 1))
         _api = True
     except:
         pass
 if not _api:
     try:
         # use micropython
-        from utime import sleep_ms,tick_ms
+        from utime import sleep_ms,ticks_ms,ticks_add,ticks_diff
         def _delay(ms):
             sleep_ms(ms)
         def _available(stream):
             return stream.any()
-        def _millis(ms):
-            return tick_ms()
+        def _millis():
+            return ticks_ms()
+        def _ticks_add(t, ms):
+            return ticks_add(t, ms)
+        def _ticks_diff(a, b):
+            return ticks_diff(a, b)
+        def _wait(stream, ms):
+            sleep_ms(1)
         _api = True
     except:
         pass
@@ -151,6 +235,146 @@ if not _api:
 
 #-endif
 
+# Optional threading support (background reader)
+
+_threads = False
+
+#-if USE_ZERYNTH
+
+try:
+    import timers, threading
+    def _start_thread(fn):
+        thread(fn)
+    _Lock = threading.Lock
+    _threads = True
+except:
+    pass
+
+#-else
+
+if not _threads:
+    try:
+        # use CPython
+        import threading
+        def _start_thread(fn):
+            t = threading.Thread(target=fn)
+            t.daemon = True
+            t.start()
+        _Lock = threading.Lock
+        _threads = True
+    except:
+        pass
+if not _threads:
+    try:
+        # use micropython
+        import _thread
+        def _start_thread(fn):
+            _thread.start_new_thread(fn, ())
+        _Lock = _thread.allocate_lock
+        _threads = True
+    except:
+        pass
+
+#-endif
+
+class Result():
+    """
+.. class:: Result
+
+    A read-only record with the outcome of an asynchronous task, delivered by \
+    the background reader (see :meth:`EasyVR.startReader()`).
+
+    The getter methods have the same meaning as the ones of the EasyVR class.
+    """
+
+    def __init__(self, request, status, value, time):
+        self._request = request
+        self._status = status
+        self._value = value
+        self._time = time
+
+    def getRequest(self):
+        """
+.. method:: getRequest()
+
+        :return: the protocol command that started the task (such as ``b'd'`` for \
+        :meth:`EasyVR.recognizeCommand()`), *None* if unknown
+        """
+        return self._request
+
+    def getTime(self):
+        """
+.. method:: getTime()
+
+        :return: the time in milliseconds when the result was received
+        """
+        return self._time
+
+    def getCommand(self):
+        """
+.. method:: getCommand()
+
+        :return: (0-31) is the recognised command index, (-1) if none
+        """
+        if (self._status & EasyVR._is_command) != 0:
+            return self._value
+        return -1
+
+    def getWord(self):
+        """
+.. method:: getWord()
+
+        :return: (0-31) is the recognised word index, (-1) if none
+        """
+        if (self._status & EasyVR._is_builtin) != 0:
+            return self._value
+        return -1
+
+    def getToken(self):
+        """
+.. method:: getToken()
+
+        :return: the index of the received SonicNet token, (-1) if none
+        """
+        if (self._status & EasyVR._is_token) != 0:
+            return self._value
+        return -1
+
+    def getError(self):
+        """
+.. method:: getError()
+
+        :return: (0-255) is the error code, (-1) if no error occurred
+        """
+        if (self._status & EasyVR._is_error) != 0:
+            return self._value
+        return -1
+
+    def isTimeout(self):
+        """
+.. method:: isTimeout()
+
+        :return: *True* if the task timed out
+        """
+        return (self._status & EasyVR._is_timeout) != 0
+
+    def isAwakened(self):
+        """
+.. method:: isAwakened()
+
+        :return: *True* if the module has been awakened from sleep mode
+        """
+        return (self._status & EasyVR._is_awakened) != 0
+
+    def isInvalid(self):
+        """
+.. method:: isInvalid()
+
+        :return: *True* if an invalid sequence has been detected in the communication \
+        protocol
+        """
+        return (self._status & EasyVR._is_invalid) != 0
+
 class EasyVR():
     """
 .. class:: EasyVR
@@ -452,6 +676,9 @@ class EasyVR():
     TOKEN_TIMEOUT   = 1500
     STORAGE_TIMEOUT = 500
 
+    # latency limits of the statistics histogram (milliseconds)
+    STATS_BUCKETS   = _ST_BOUNDS
+
     """ Module identification number (firmware version) """
     VRBOT       = 0     #: Identifies a VRbot module
     EASYVR      = 1     #: Identifies an EasyVR module
@@ -664,6 +891,8 @@ class EasyVR():
     # internal functions
 
     def _flush(self):
+        self._rxhead = 0
+        self._rxcount = 0
         while True:
             a = _available(self._s)
             if a > 0:
@@ -671,49 +900,285 @@ class EasyVR():
             else:
                 break
 
+    def _fill(self):
+        # drain all the available input into the receive buffer in one read,
+        # returns the number of buffered bytes
+        a = _available(self._s)
+        free = _RX_SIZE - self._rxcount
+        if a <= 0 or free <= 0:
+            if (self._listen is not None or self._chain is not None) and self._rxcount == 0:
+                self._rxidle = _millis()
+            return self._rxcount
+        r = self._s.read(a if a < free else free)
+        n = len(r)
+        t = (self._rxhead + self._rxcount) & _RX_MASK
+        k = _RX_SIZE - t
+        if n <= k:
+            self._rxview[t:t + n] = r
+        else:
+            r = memoryview(r)
+            self._rxview[t:] = r[:k]
+            self._rxview[:n - k] = r[k:]
+        self._rxcount += n
+        if (self._listen is not None or self._chain is not None) and self._rxcount == n:
+            # a result arrived since the last check (dead time starts)
+            self._rxtime = _ticks_add(self._rxidle, _ticks_diff(_millis(), self._rxidle) // 2)
+        if self._stats is not None:
+            self._statrow[_ST_RECEIVED] += n
+            self._statend = _millis()
+        return self._rxcount
+
+    def _poll(self):
+        # non-blocking read of one byte, None if no data is available
+        if self._rxcount == 0 and self._fill() == 0:
+            return None
+        c = self._rxbuf[self._rxhead]
+        self._rxhead = (self._rxhead + 1) & _RX_MASK
+        self._rxcount -= 1
+        return _BYTES[c]
+
     def _send(self, c):
-        _delay(1)
         self._s.write(c)
+        if self._stats is not None:
+            self._statrow[_ST_SENT] += len(c)
+            self._statrow[_ST_WRITES] += 1
+
+    # commands are built into a frame (opcode plus all arguments) and written
+    # with a single call, before the first reply is read or explicitly with
+    # _sendFrame() for commands that do not wait for a reply
 
     def _sendCmd(self, c):
-        self._flush()
-        self._send(c)
+        # returns the command of the task that was pending, if any
+        lock = self._lock
+        if lock is not None:
+            # a new command cancels any result the reader is waiting for
+            lock.acquire()
+        pending = self._pending
+        self._pending = None
+        self._chain = None
+        if self._listen is not None:
+            self._listen = None
+            self._listenend = _millis()
+        if pending is None or c != _CMD_BREAK:
+            self._flush()
+        # else the result of the task, if any, must be read before the reply to the break
+        if lock is not None:
+            lock.release()
+        if self._stats is not None:
+            self._statBegin(c)
+        self._tx = bytearray(c)
+        self._txcmd = c
+        self._txgroup = 0
+        return pending
 
     def _sendArg(self, i):
-        self._send(bytes([i + _ARG_ZERO]))
+        self._tx.append(i + _ARG_ZERO)
+
+    def _sendChar(self, c):
+        self._tx.append(ord(c))
 
     def _sendGroup(self, i):
-        self._send(bytes([i + _ARG_ZERO]))
+        self._tx.append(i + _ARG_ZERO)
         if i != self._group:
             self._group = i
-            # worst case time to cache a full group in memory
-            if self._id >= EasyVR.EASYVR3PLUS:
-                _delay(79)
-            elif self._id >= EasyVR.EASYVR3:
-                _delay(39)
+            # the frame is split after the group argument
+            self._txgroup = len(self._tx)
+
+    def _sendFrame(self):
+        tx = self._tx
+        if tx is None:
+            return 0
+        self._tx = None
+        if self._txdelay > 0:
+            self._pause(self._txdelay)
+        n = self._txgroup
+        if n == 0:
+            self._send(tx)
+            return len(tx)
+        self._send(tx[:n])
+        # worst case time to cache a full group in memory
+        if self._id >= EasyVR.EASYVR3PLUS:
+            self._pause(79)
+        elif self._id >= EasyVR.EASYVR3:
+            self._pause(39)
+        else:
+            self._pause(19)
+        if n < len(tx):
+            self._send(tx[n:])
+        return len(tx)
+
+    def _wireTime(self, n):
+        # time to shift n bytes out at the stream baudrate (ms), if known,
+        # since writes return before long frames have left the host
+        baud = getattr(self._s, 'baudrate', 0)
+        if not baud:
+            return 0
+        return (n * 10000) // baud
+
+    def _pause(self, ms):
+        _delay(ms)
+        if self._stats is not None:
+            self._statrow[_ST_DELAY] += ms
+
+    def _timeout(self):
+        if self._stats is not None:
+            self._statrow[_ST_TIMEOUTS] += 1
+        return TimeoutError()
+
+    def _invalid(self):
+        # unexpected reply (protocol failure)
+        if self._stats is not None:
+            self._statrow[_ST_ERRORS] += 1
+        return ValueError()
+
+    # instrumentation (only active after enableStats)
+
+    def _statBegin(self, c):
+        self._statClose()
+        key = chr(c[0])
+        row = self._stats.get(key)
+        if row is None:
+            row = [0] * _ST_SIZE
+            self._stats[key] = row
+        row[_ST_CALLS] += 1
+        self._statrow = row
+        self._statstart = _millis()
+        self._statend = None
+
+    def _statClose(self):
+        # the latency of a command ends with the last byte of its reply
+        if self._statstart is not None and self._statend is not None:
+            _statSample(self._statrow, _ticks_diff(self._statend, self._statstart))
+        self._statstart = None
+
+    # inventory cache (commands, grammars and sound table), kept up to date
+    # by the functions that modify the module's memory
+
+    def _uncacheCommands(self, group, index):
+        # forget the commands of a group from the given index on
+        for key in list(self._cdump):
+            if (key >> 5) == group and (key & 0x1F) >= index:
+                del self._cdump[key]
+        for key in list(self._csum):
+            if (key >> 5) == group and (key & 0x1F) >= index:
+                del self._csum[key]
+
+    def _uncacheGroup(self, group):
+        # forget the size of a group (and whether it is empty)
+        if group in self._ccount:
+            del self._ccount[group]
+        self._cmask = None
+
+    def _uncacheAll(self):
+        self._cmask = None
+        self._ccount = {}
+        self._cdump = {}
+        self._csum = {}
+
+    def _sendAsync(self):
+        # the module replies when the task completes
+        self._sendFrame()
+        self._pending = self._txcmd
+
+    # all blocking operations wait for a deadline on the monotonic clock
+
+    def _deadline(self, timeout):
+        # deadline of a timeout in milliseconds (None if infinite)
+        if timeout < 0:
+            return None
+        return _ticks_add(_millis(), timeout)
+
+    def _waitData(self, deadline):
+        # wait until some input is buffered, False if the deadline expired
+        while self._rxcount == 0 and self._fill() == 0:
+            if deadline is None:
+                _wait(self._s, 1000)
             else:
-                _delay(19)
+                left = _ticks_diff(deadline, _millis())
+                if left <= 0:
+                    return False
+                _wait(self._s, left)
+            self._watched()
+        return True
 
-    def _recv(self, timeout = _INFINITE):
-        while timeout != 0 and _available(self._s) <= 0:
-            _delay(1)
-            if timeout > 0:
-                timeout -= 1
+    def _watched(self):
+        # the stream has been watched until now (after a blocking wait)
+        if self._listen is not None or self._chain is not None:
+            self._rxidle = _millis()
 
-        if _available(self._s) > 0:
-            r = self._s.read()
+    def _recv(self, timeout = _INFINITE):
+        n = self._sendFrame()
+        if timeout >= 0 and n > 0:
+            timeout += self._wireTime(n)
+        self._waitData(self._deadline(timeout))
+        r = self._poll()
+        if r is not None:
             #print(r)
             return r
-        raise TimeoutError
+        raise self._timeout()
+
+    def _recvBuf(self, n, timeout):
+        # the timeout applies to each gap in the incoming data, not to the
+        # whole transfer, so that long replies work at any baudrate
+        # (the returned view is only valid until the next call)
+        view = self._argview if n <= _ARGS_SIZE else memoryview(bytearray(n))
+        i = 0
+        while i < n:
+            if not self._waitData(self._deadline(timeout)):
+                raise self._timeout()
+            # copy the contiguous buffered bytes
+            h = self._rxhead
+            k = _RX_SIZE - h
+            if k > self._rxcount:
+                k = self._rxcount
+            if k > n - i:
+                k = n - i
+            view[i:i + k] = self._rxview[h:h + k]
+            self._rxhead = (h + k) & _RX_MASK
+            self._rxcount -= k
+            i += k
+        return view[:n]
 
     def _recvArg(self):
         self._send(_ARG_ACK)
+        if self._stats is not None:
+            self._statrow[_ST_ACKS] += 1
         r = self._recv(EasyVR.DEF_TIMEOUT)[0]
-        if r < _ARG_MIN and r > _ARG_MAX:
-            raise ValueError
+        if r < _ARG_MIN or r > _ARG_MAX:
+            raise self._invalid()
         c = r - _ARG_ZERO
         return c
 
+    def _recvArgs(self, n):
+        # pipelined acknowledge: all the ACKs are sent at once and the
+        # arguments are read back in a single buffered pass
+        # (raw bytes are returned, subtract _ARG_ZERO to get values)
+        if n <= 0:
+            return bytearray()
+        self._send(_ARG_ACK * n)
+        if self._stats is not None:
+            self._statrow[_ST_ACKS] += n
+        data = self._recvBuf(n, EasyVR.DEF_TIMEOUT)
+        for r in data:
+            if r < _ARG_MIN or r > _ARG_MAX:
+                raise self._invalid()
+        return data
+
+    def _recvLabel(self, length):
+        # counted string, digits are escaped with '^' (and count as two)
+        data = self._recvArgs(length)
+        name = ''
+        i = 0
+        while i < length:
+            rx = data[i]
+            i += 1
+            if rx == 0x5E and i < length: # '^'
+                name += chr(ord('0') + data[i] - _ARG_ZERO)
+                i += 1
+            else:
+                name += chr(rx)
+        return name
+
     def _readStatus(self,rx):
         self._status = 0
         self._value = 0
@@ -733,8 +1198,8 @@ class EasyVR():
 
         if rx == _STS_TOKEN:
             self._status |= EasyVR._is_token
-            self._value = self._recvArg() << 5
-            self._value |= self._recvArg()
+            data = self._recvArgs(2)
+            self._value = ((data[0] - _ARG_ZERO) << 5) | (data[1] - _ARG_ZERO)
             return
 
         if rx == _STS_AWAKEN:
@@ -751,13 +1216,13 @@ class EasyVR():
 
         if rx == _STS_ERROR:
             self._status |= EasyVR._is_error
-            self._value = self._recvArg() << 4
-            self._value |= self._recvArg()
+            data = self._recvArgs(2)
+            self._value = ((data[0] - _ARG_ZERO) << 4) | (data[1] - _ARG_ZERO)
             return
 
         # unexpected condition (communication error)
         self._status |= EasyVR._is_error
-        raise ValueError
+        raise self._invalid()
 
 
     def __init__(self,stream):
@@ -775,6 +1240,41 @@ class EasyVR():
         self._group = -1
         self._id = -1
         self._status = 0
+        self._tx = None
+        self._txgroup = 0
+        self._txdelay = 0
+        self._rxbuf = bytearray(_RX_SIZE)
+        self._rxview = memoryview(self._rxbuf)
+        self._rxhead = 0
+        self._rxcount = 0
+        self._argview = memoryview(bytearray(_ARGS_SIZE))
+        self._txcmd = None
+        self._pending = None
+        self._lock = None
+        self._reading = False
+        self._listeners = []
+        self._queue = None
+        self._stats = None
+        self._statrow = None
+        self._statstart = None
+        self._statend = None
+        self._cmask = None
+        self._ccount = {}
+        self._cdump = {}
+        self._csum = {}
+        self._cgcount = None
+        self._cgrammar = {}
+        self._csounds = None
+        self._cwords = None
+        self._cwordpos = 0
+        self._latency = -1
+        self._chain = None
+        self._listen = None
+        self._rxtime = 0
+        self._rxidle = 0
+        self._deaf = 0
+        self._listenstart = None
+        self._listenend = None
 
 
     def detect(self):
@@ -796,18 +1296,95 @@ class EasyVR():
         return False
 
 
+    def _reopen(self, reopen, baudrate):
+        # switch the host side of the link to a new speed
+        if reopen is None:
+            self._s.baudrate = baudrate
+        else:
+            stream = reopen(baudrate)
+            if stream is not None:
+                self._s = stream
+        self._flush()
+
+    def connect(self, baudrate = 9600, reopen = None, rates = None):
+        """
+.. method:: connect(baudrate, reopen, rates)
+
+        Detects the module and switches the link to the fastest speed supported by both \
+        sides, checking it with :meth:`detect()`. The module keeps its speed until \
+        it is powered off, so if it does not respond at the current speed (for \
+        example after the host has been reset) all the other speeds are tried.
+        If the new speed does not work, the link falls back to the previous one.
+
+        :param baudrate: is the current speed of the Stream object (in bps)
+        :param reopen: is a function that reconfigures the Stream for the speed passed \
+        as argument (in bps), returning the new Stream object or *None* to keep \
+        using the same one. By default the *baudrate* attribute of the Stream is \
+        changed (as for *pyserial* objects).
+        :param rates: is the list of speeds supported by the host (in bps), by default \
+        all the module speeds from 115200 to 9600
+
+        :return: the speed of the link (in bps), or 0 if the module has not been found
+        """
+        if rates is None:
+            rates = [bps for (bps, code) in _BAUDRATES]
+        current = 0
+        if self.detect():
+            current = baudrate
+        else:
+            # look for a module left at a different speed
+            for (bps, code) in _BAUDRATES:
+                if bps == baudrate or bps not in rates:
+                    continue
+                self._reopen(reopen, bps)
+                if self.detect():
+                    current = bps
+                    break
+            if current == 0:
+                self._reopen(reopen, baudrate)
+                return 0
+        prev = EasyVR.B9600
+        for (bps, code) in _BAUDRATES:
+            if bps == current:
+                prev = code
+        for (bps, code) in _BAUDRATES:
+            if bps <= current:
+                break
+            if bps not in rates:
+                continue
+            try:
+                self.changeBaudrate(code)
+            except (TimeoutError, ValueError):
+                pass # the module may have switched anyway
+            self._reopen(reopen, bps)
+            if self.detect():
+                return bps
+            # try to bring the module back, even if the link is unreliable
+            try:
+                self.changeBaudrate(prev)
+            except (TimeoutError, ValueError):
+                pass
+            self._reopen(reopen, current)
+            if not self.detect():
+                return 0
+        return current
+
     def stop(self):
         """
 .. method:: stop()
 
         Interrupts pending recognition or playback operations.
         """
-        self._sendCmd(_CMD_BREAK)
+        pending = self._sendCmd(_CMD_BREAK)
 
         rx = self._recv(EasyVR.STORAGE_TIMEOUT)
+        if rx != _STS_INTERR and pending is not None:
+            # the task completed before the break: its result is discarded and
+            # the module replies to the break as if idle
+            rx = self._recv(EasyVR.DEF_TIMEOUT)
         if rx == _STS_INTERR or rx == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
 
     def getID(self):
@@ -838,7 +1415,7 @@ class EasyVR():
 
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def hasFinished(self):
         """
@@ -849,13 +1426,511 @@ class EasyVR():
 
         :return: *True* if the operation has completed
         """
-        try:
-            rx = self._recv(EasyVR._NO_TIMEOUT)
-        except TimeoutError:
+        rx = self._poll()
+        if rx is None:
+            return False
+        self._pending = None
+        self._readResultStatus(rx)
+        return True
+
+    def waitResult(self, timeout = _INFINITE):
+        """
+.. method:: waitResult(timeout)
+
+        Waits for the completion of on-going recognition, training or asynchronous \
+        playback tasks, returning as soon as the module replies.
+
+        :param timeout: is the maximum time to wait in milliseconds, or (-1) to \
+        wait without time limits
+
+        :return: *True* if the operation has completed, *False* if the timeout expired
+        """
+        self._sendFrame()
+        if not self._waitData(self._deadline(timeout)):
             return False
+        self._pending = None
+        self._readResultStatus(self._poll())
+        return True
+
+    def _readResultStatus(self, rx):
+        # returns False if the result only started the next command of a chain
+        chain = self._chain
+        if chain is not None:
+            try:
+                self._readStatus(rx)
+                if rx != _STS_SUCCESS:
+                    return True
+                (cmd, frame) = chain
+                self._latency = _ticks_diff(self._sendNext(cmd, frame), self._rxtime)
+                return False
+            finally:
+                self._chain = None
+        listen = self._listen
+        if listen is None:
+            self._readStatus(rx)
+            return True
+        self._listen = None # stays off after a communication error
         self._readStatus(rx)
+        if self._status & (EasyVR._is_invalid | EasyVR._is_error):
+            # the module refused to listen (or failed), the error is the result
+            self._listenend = _millis()
+            return True
+        self._listen = listen
+        # start listening again right away
+        self._sendNext(self._txcmd, listen)
+        self._deaf += _ticks_diff(self._rxidle, self._rxtime)
         return True
 
+    def _sendNext(self, cmd, frame):
+        # writes the frame of the next task as soon as a result is read,
+        # returns the time the module has received it
+        if self._stats is not None:
+            self._statBegin(cmd)
+        if self._txdelay > 0:
+            self._pause(self._txdelay)
+        self._send(frame)
+        self._txcmd = cmd
+        self._pending = cmd
+        self._rxidle = _millis()
+        return _ticks_add(self._rxidle, self._wireTime(len(frame)))
+
+    # continuous recognition
+
+    def _startListening(self, cmd, arg):
+        self._sendCmd(cmd)
+        self._sendArg(arg)
+        self._sendAsync()
+        frame = bytearray(cmd)
+        frame.append(arg + _ARG_ZERO)
+        self._listen = frame
+        self._deaf = 0
+        self._listenstart = _millis()
+        self._rxidle = self._listenstart
+        self._listenend = None
+
+    def listenCommands(self, group):
+        """
+.. method:: listenCommands(group)
+
+        Starts continuous recognition of custom commands: like :meth:`recognizeCommand()`, \
+        but recognition starts again as soon as each result (or timeout) is read with \
+        :meth:`hasFinished()`, :meth:`waitResult()` or by the background reader \
+        (see :meth:`startReader()`), so the microphone is only off while the result \
+        is transferred. Any other command (such as :meth:`stopListening()`) ends it, \
+        as does an invalid or error result (see :meth:`isInvalid()` and :meth:`getError()`), \
+        that is returned like the others but leaves :meth:`isListening()` false.
+
+        :param group: (0-16) is the target group, or one of the values in #Groups
+        """
+        self._startListening(_CMD_RECOG_SD, group)
+
+    def listenWords(self, wordset):
+        """
+.. method:: listenWords(wordset)
+
+        Starts continuous recognition of built-in words or a custom grammar \
+        (see :meth:`listenCommands()` and :meth:`recognizeWord()`).
+
+        :param wordset: (0-3) is the target word set, or one of the values in \
+        #Wordset, (4-31) is the target custom grammar, if present
+        """
+        self._startListening(_CMD_RECOG_SI, wordset)
+
+    def isListening(self):
+        """
+.. method:: isListening()
+
+        :return: *True* if continuous recognition is active
+        """
+        return self._listen is not None
+
+    def stopListening(self):
+        """
+.. method:: stopListening()
+
+        Ends continuous recognition, interrupting the current one (see :meth:`stop()`).
+        """
+        self.stop()
+
+    def getDeadTime(self):
+        """
+.. method:: getDeadTime()
+
+        Gets how long the microphone was off during continuous recognition, from the \
+        arrival of each result to the start of the next recognition (including the \
+        time the application took to read it, estimated from the time of the last \
+        check that found no result).
+
+        :return: the average dead time in milliseconds per minute of listening \
+        (since the last :meth:`listenCommands()` or :meth:`listenWords()`)
+        """
+        if self._listenstart is None:
+            return 0
+        end = self._listenend
+        if end is None:
+            end = _millis()
+        elapsed = _ticks_diff(end, self._listenstart)
+        if elapsed <= 0:
+            return 0
+        return (self._deaf * 60000) // elapsed
+
+    # background reader
+
+    def _readResult(self):
+        request = self._pending
+        self._pending = None
+        try:
+            if not self._readResultStatus(self._poll()):
+                return None # the next command of a chain has been sent
+        except Exception:
+            # communication error (_readStatus sets the error flag)
+            self._status |= EasyVR._is_error
+        return Result(request, self._status, self._value, _millis())
+
+    def _readerLoop(self):
+        while self._reading:
+            if self._pending is None:
+                _delay(5)
+                continue
+            if self._rxcount == 0 and _available(self._s) <= 0:
+                _wait(self._s, 50)
+                self._watched()
+                continue
+            result = None
+            self._lock.acquire()
+            try:
+                if self._pending is not None and (self._rxcount > 0 or self._fill() > 0):
+                    result = self._readResult()
+            finally:
+                self._lock.release()
+            if result is None:
+                continue
+            for callback in self._listeners:
+                try:
+                    callback(result)
+                except Exception:
+                    pass # keep the reader alive
+            if self._queue is not None:
+                self._queue.put(result)
+
+    def startReader(self, queue = None):
+        """
+.. method:: startReader(queue)
+
+        Starts a background thread that collects the results of asynchronous tasks \
+        (recognition, training, playback, token detection, ...) the moment they arrive. \
+        Each result is delivered as a :class:`Result` record to the callbacks registered \
+        with :meth:`addListener()` and to the optional *queue*.
+
+        :param queue: an object with a *put()* method (such as a *Queue*), or *None*
+
+        :note: While the reader is running, results must not be polled with \
+        :meth:`hasFinished()` or :meth:`waitResult()`. Callbacks run on the reader thread.
+        """
+        if not _threads:
+            raise RuntimeError
+        self._queue = queue
+        if self._reading:
+            return
+        if self._lock is None:
+            self._lock = _Lock()
+        self._reading = True
+        _start_thread(self._readerLoop)
+
+    def stopReader(self):
+        """
+.. method:: stopReader()
+
+        Stops the background thread started with :meth:`startReader()`.
+        """
+        self._reading = False
+
+    def addListener(self, callback):
+        """
+.. method:: addListener(callback)
+
+        Registers a function to be called with a :class:`Result` record each time \
+        an asynchronous task completes (see :meth:`startReader()`).
+
+        :param callback: a function accepting one argument
+        """
+        self._listeners.append(callback)
+
+    def removeListener(self, callback):
+        """
+.. method:: removeListener(callback)
+
+        Unregisters a function added with :meth:`addListener()`.
+
+        :param callback: the function to remove
+        """
+        self._listeners.remove(callback)
+
+    # instrumentation
+
+    def enableStats(self, enable = True):
+        """
+.. method:: enableStats(enable)
+
+        Starts (or stops) collecting per-command statistics, returned by :meth:`getStats()`. \
+        When disabled, the cost of instrumentation is a single test on each transfer.
+
+        :param enable: *True* to collect statistics, *False* to stop and discard them
+        """
+        if not enable:
+            self._stats = None
+            self._statstart = None
+            return
+        if self._stats is None:
+            self._statrow = [0] * _ST_SIZE # until the first command
+            self._stats = {}
+
+    def resetStats(self):
+        """
+.. method:: resetStats()
+
+        Clears the statistics collected so far (see :meth:`enableStats()`).
+        """
+        if self._stats is not None:
+            self._statrow = [0] * _ST_SIZE
+            self._statstart = None
+            self._stats = {}
+
+    def getStats(self):
+        """
+.. method:: getStats()
+
+        Gets a snapshot of the statistics collected since :meth:`enableStats()` or \
+        :meth:`resetStats()`, as a dictionary indexed by protocol command code (a single \
+        character, such as ``'d'`` for :meth:`recognizeCommand()` or ``'w'`` for \
+        :meth:`playSound()`). Each entry is a dictionary with the following keys:
+
+            * ``calls`` Number of commands sent
+            * ``sent``, ``received`` Bytes written to and read from the module
+            * ``writes`` Number of writes to the stream
+            * ``acks`` Number of reply arguments requested (one round trip each, when not batched)
+            * ``timeouts`` Number of replies that did not arrive in time
+            * ``errors`` Number of invalid or unexpected replies
+            * ``delay`` Time spent in host side delays, in milliseconds (group caching and :meth:`setDelay()`)
+            * ``samples``, ``total``, ``max`` Count, sum and maximum of the latencies in milliseconds, \
+            measured from the command to the last byte of its reply (or final result)
+            * ``histogram`` Latency counts for each of the limits in ``STATS_BUCKETS`` (in \
+            milliseconds), plus one for longer latencies
+
+        :return: a dictionary of statistics, empty when disabled
+        """
+        stats = self._stats
+        snapshot = {}
+        if stats is None:
+            return snapshot
+        for key in stats:
+            row = list(stats[key])
+            if stats[key] is self._statrow:
+                # include the latency of the last command so far
+                if self._statstart is not None and self._statend is not None:
+                    _statSample(row, _ticks_diff(self._statend, self._statstart))
+            snapshot[key] = {
+                "calls": row[_ST_CALLS],
+                "sent": row[_ST_SENT],
+                "received": row[_ST_RECEIVED],
+                "writes": row[_ST_WRITES],
+                "acks": row[_ST_ACKS],
+                "timeouts": row[_ST_TIMEOUTS],
+                "errors": row[_ST_ERRORS],
+                "delay": row[_ST_DELAY],
+                "samples": row[_ST_SAMPLES],
+                "total": row[_ST_TOTAL],
+                "max": row[_ST_MAX],
+                "histogram": row[_ST_HIST:],
+            }
+        return snapshot
+
+    # inventory cache
+
+    def invalidateCache(self):
+        """
+.. method:: invalidateCache()
+
+        Discards the inventory of the module kept by this object. The results of \
+        :meth:`getGroupMask()`, :meth:`getCommandCount()`, :meth:`dumpCommand()`, \
+        :meth:`getGrammarsCount()`, :meth:`dumpGrammar()` and :meth:`dumpSoundTable()` \
+        are cached and updated by the functions that modify commands and groups, so \
+        this is only needed if the module's memory is changed by other means (another \
+        host, a new sound table or grammar, or a different module on the same port).
+        """
+        self._uncacheAll()
+        self._cgcount = None
+        self._cgrammar = {}
+        self._csounds = None
+        self._cwords = None
+
+    def saveInventory(self):
+        """
+.. method:: saveInventory()
+
+        Serializes the whole inventory of the module (custom commands with their labels, \
+        training, conflicts and the checksums known so far, see :meth:`getCommandChecksum()`, \
+        grammars with their words and the sound table) in \
+        a compact form that can be restored with :meth:`loadInventory()`, usually at the \
+        next boot. Items not in the cache are read from the module.
+
+        :return: a *bytearray* holding the inventory snapshot
+        """
+        id = self.getID()
+        mask = self.getGroupMask()
+        buf = bytearray(_INV_MAGIC)
+        buf.append(id & 0xFF)
+        for i in range(4):
+            buf.append((mask >> (i * 8)) & 0xFF)
+        for group in range(EasyVR.PASSWORD + 1):
+            if (mask >> group) & 1 == 0:
+                continue
+            count = self.getCommandCount(group)
+            if count < 0:
+                raise self._invalid()
+            buf.append(count)
+            for index in range(count):
+                (name, training) = self.dumpCommand(group, index)
+                buf.append(training)
+                buf.append(1 if self.isConflict() else 0)
+                buf.append((self._value + 1) & 0xFF)
+                _packLabel(buf, name)
+        count = self.getGrammarsCount()
+        buf.append(count + 1)
+        for grammar in range(count):
+            self.dumpGrammar(grammar)
+            (words, flags, labels) = self._cgrammar[grammar]
+            buf.append(words)
+            buf.append(flags)
+            for label in labels:
+                _packLabel(buf, label)
+        (name, count) = self.dumpSoundTable()
+        buf.append(count >> 8)
+        buf.append(count & 0xFF)
+        _packLabel(buf, name)
+        # checksums of the templates seen so far (optional)
+        buf.append(len(self._csum) >> 8)
+        buf.append(len(self._csum) & 0xFF)
+        for key in self._csum:
+            buf.append(key >> 8)
+            buf.append(key & 0xFF)
+            buf.append(self._csum[key] >> 8)
+            buf.append(self._csum[key] & 0xFF)
+        return buf
+
+    def loadInventory(self, data):
+        """
+.. method:: loadInventory(data)
+
+        Restores the inventory cache from a snapshot made with :meth:`saveInventory()`, \
+        if it still matches the module. The check only takes a few commands \
+        (module id, group mask, the size of each group and the number of grammars), \
+        then the cached functions (see :meth:`invalidateCache()`) do not need to \
+        query the module any more.
+
+        :param data: the inventory snapshot
+
+        :return: *True* if the snapshot has been loaded, *False* if it is invalid or \
+        it belongs to a different module (or memory contents)
+
+        :note: Changes that do not alter the size of groups (such as training the same \
+        commands again from another host) are not detected.
+        """
+        self.invalidateCache()
+        try:
+            if data[:4] != _INV_MAGIC or data[4] != self.getID():
+                return False
+            mask = 0
+            for i in range(4):
+                mask |= data[5 + i] << (i * 8)
+            if self.getGroupMask() != mask:
+                return False
+            pos = 9
+            dumps = {}
+            for group in range(EasyVR.PASSWORD + 1):
+                if (mask >> group) & 1 == 0:
+                    continue
+                count = data[pos]
+                pos += 1
+                if self.getCommandCount(group) != count:
+                    return False
+                for index in range(count):
+                    training = data[pos]
+                    status = 0
+                    if data[pos + 1] != 0:
+                        status = EasyVR._is_conflict | EasyVR._is_command | EasyVR._is_builtin
+                    value = data[pos + 2] - 1
+                    (name, pos) = _unpackLabel(data, pos + 3)
+                    dumps[(group << 5) | index] = (name, training, status, value)
+            count = data[pos] - 1
+            pos += 1
+            if self.getGrammarsCount() != count:
+                return False
+            grammars = {}
+            for grammar in range(count):
+                words = data[pos]
+                flags = data[pos + 1]
+                pos += 2
+                labels = []
+                for i in range(words):
+                    (label, pos) = _unpackLabel(data, pos)
+                    labels.append(label)
+                grammars[grammar] = (words, flags, labels)
+            count = (data[pos] << 8) | data[pos + 1]
+            (name, pos) = _unpackLabel(data, pos + 2)
+            sums = {}
+            if pos < len(data):
+                n = (data[pos] << 8) | data[pos + 1]
+                pos += 2
+                for i in range(n):
+                    sums[(data[pos] << 8) | data[pos + 1]] = (data[pos + 2] << 8) | data[pos + 3]
+                    pos += 4
+        except IndexError:
+            self.invalidateCache()
+            return False
+        self._cdump = dumps
+        self._csum = sums
+        self._cgrammar = grammars
+        self._csounds = (name, count)
+        return True
+
+    def saveInventoryFile(self, path):
+        """
+.. method:: saveInventoryFile(path)
+
+        Writes the inventory snapshot returned by :meth:`saveInventory()` to a file.
+
+        :param path: the file name
+        """
+        data = self.saveInventory()
+        f = open(path, "wb")
+        try:
+            f.write(data)
+        finally:
+            f.close()
+
+    def loadInventoryFile(self, path):
+        """
+.. method:: loadInventoryFile(path)
+
+        Restores the inventory from a file written by :meth:`saveInventoryFile()` \
+        (see :meth:`loadInventory()`).
+
+        :param path: the file name
+
+        :return: *True* if the snapshot has been loaded, *False* if it is missing, \
+        invalid or out of date
+        """
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return False
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        return self.loadInventory(data)
+
     def isAwakened(self):
         """
 .. method:: isAwakened()
@@ -976,7 +2051,7 @@ class EasyVR():
         self._sendArg(lang)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setTimeout(self, seconds):
         """
@@ -991,7 +2066,7 @@ class EasyVR():
         self._sendArg(seconds)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setMicDistance(self, dist):
         """
@@ -1009,7 +2084,7 @@ class EasyVR():
         self._sendArg(dist)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setKnob(self, knob):
         """
@@ -1023,7 +2098,7 @@ class EasyVR():
         self._sendArg(knob)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setTrailingSilence(self,dur):
         """
@@ -1038,7 +2113,7 @@ class EasyVR():
         self._sendArg(dur)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setLevel(self,level):
         """
@@ -1052,7 +2127,7 @@ class EasyVR():
         self._sendArg(level)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setCommandLatency(self,mode):
         """
@@ -1069,7 +2144,7 @@ class EasyVR():
         self._sendArg(mode)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def setDelay(self,millis):
         """
@@ -1082,23 +2157,31 @@ class EasyVR():
         """
         self._sendCmd(_CMD_DELAY)
         if millis <= 10:
+            millis = int(millis)
             self._sendArg(millis)
         elif millis <= 100:
-            self._sendArg(int(millis / 10 + 9))
+            millis = int(millis / 10)
+            self._sendArg(millis + 9)
+            millis *= 10
         elif millis <= 1000:
-            self._sendArg(int(millis / 100 + 18))
+            millis = int(millis / 100)
+            self._sendArg(millis + 18)
+            millis *= 100
         else:
             raise ValueError
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
+            # frames are paced by the actual (rounded) delay of the module
+            self._txdelay = millis
             return
-        raise ValueError
+        raise self._invalid()
 
     def changeBaudrate(self, baud):
         """
 .. method:: changeBaudrate(baud)
 
         Sets the new communication speed. You need to modify the baudrate of the \
-        underlying Stream object accordingly, after the function returns successfully.
+        underlying Stream object accordingly, after the function returns successfully \
+        (see :meth:`connect()` to do both automatically).
         
         :param baud: is one of values in #Baudrate
         """
@@ -1106,7 +2189,7 @@ class EasyVR():
         self._sendArg(baud)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def addCommand(self, group, index):
         """
@@ -1117,16 +2200,25 @@ class EasyVR():
         :param group: (0-16) is the target group, or one of the values in #Groups
         :param index: (0-31) is the index of the command within the selected group
         """
+        # following commands move up by one
+        self._uncacheCommands(group, index)
+        count = self._ccount.get(group)
+        mask = self._cmask
+        self._uncacheGroup(group)
         self._sendCmd(_CMD_GROUP_SD)
         self._sendGroup(group)
         self._sendArg(index)
         rx = self._recv(EasyVR.STORAGE_TIMEOUT)
         if rx == _STS_SUCCESS:
+            if count is not None:
+                self._ccount[group] = count + 1
+            if mask is not None:
+                self._cmask = mask | (1 << group)
             return
         self._status = 0
         if rx == _STS_OUT_OF_MEM:
             self._status |= EasyVR._is_memfull
-        raise ValueError
+        raise self._invalid()
 
     def removeCommand(self, group, index):
         """
@@ -1137,12 +2229,24 @@ class EasyVR():
         :param group: (0-16) is the target group, or one of the values in #Groups
         :param index: (0-31) is the index of the command within the selected group
         """
+        # following commands move down by one
+        self._uncacheCommands(group, index)
+        count = self._ccount.get(group)
+        mask = self._cmask
+        self._uncacheGroup(group)
         self._sendCmd(_CMD_UNGROUP_SD)
         self._sendGroup(group)
         self._sendArg(index)
         if self._recv(EasyVR.STORAGE_TIMEOUT) == _STS_SUCCESS:
+            if count is not None:
+                count -= 1
+                self._ccount[group] = count
+                if mask is not None:
+                    if count == 0:
+                        mask &= ~(1 << group)
+                    self._cmask = mask
             return
-        raise ValueError
+        raise self._invalid()
 
     def setCommandLabel(self, group, index, name):
         """
@@ -1155,6 +2259,8 @@ class EasyVR():
         :param name: is a string containing the label to be assigned to the \
         specified command
         """
+        key = (group << 5) | index
+        cached = self._cdump.pop(key, None)
         self._sendCmd(_CMD_NAME_SD)
         self._sendGroup(group)
         self._sendArg(index)
@@ -1170,20 +2276,25 @@ class EasyVR():
             if length == 31:
                 break
         self._sendArg(length)
+        label = ''
         for i in range(0,name_end):
             c = name[i]
             #if c.isdigit():
             if c >= '0' and c <= '9':
-                self._send(b'^')
+                self._sendChar('^')
                 self._sendArg(ord(c) - ord('0'))
             #elif c.isalpha():
             elif c >= 'A' and c <= 'Z':
-                self._send(bytes(c))
+                self._sendChar(c)
             else:
-                self._send(b'_')
+                c = '_'
+                self._sendChar(c)
+            label += c
         if self._recv(EasyVR.STORAGE_TIMEOUT) == _STS_SUCCESS:
+            if cached is not None:
+                self._cdump[key] = (label,) + cached[1:]
             return
-        raise ValueError
+        raise self._invalid()
 
     def eraseCommand(self, group, index):
         """
@@ -1194,12 +2305,14 @@ class EasyVR():
         :param group: (0-16) is the target group, or one of the values in #Groups
         :param index: (0-31) is the index of the command within the selected group
         """
+        self._cdump.pop((group << 5) | index, None)
+        self._csum.pop((group << 5) | index, None)
         self._sendCmd(_CMD_ERASE_SD)
         self._sendGroup(group)
         self._sendArg(index)
         if self._recv(EasyVR.STORAGE_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def getGroupMask(self):
         """
@@ -1209,16 +2322,20 @@ class EasyVR():
         
         :return mask: the group mask when the function returns normally
         """
+        if self._cmask is not None:
+            return self._cmask
         self._sendCmd(_CMD_MASK_SD)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_MASK:
+            data = self._recvArgs(8)
             mask = 0
             for i in range(0,4):
-                rx = self._recvArg()
+                rx = data[i * 2] - _ARG_ZERO
                 mask |= (rx & 0x0F) << (i * 8)
-                rx = self._recvArg()
+                rx = data[i * 2 + 1] - _ARG_ZERO
                 mask |= ((rx << 4) & 0xF0) << (i * 8)
+            self._cmask = mask
             return mask
-        raise ValueError
+        raise self._invalid()
 
     def getCommandCount(self, group):
         """
@@ -1230,12 +2347,16 @@ class EasyVR():
         
         :return: integer is the count of commands (negative in case of errors)
         """
+        count = self._ccount.get(group)
+        if count is not None:
+            return count
         self._sendCmd(_CMD_COUNT_SD)
         self._sendArg(group)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_COUNT:
             rx = self._recvArg()
             if rx == -1:
-                return 32
+                rx = 32
+            self._ccount[group] = rx
             return rx
         return -1
 
@@ -1259,12 +2380,18 @@ class EasyVR():
         Additional information about training is available \
         through the functions :meth:`isConflict()` and :meth:`getWord()` or :meth:`getCommand()`
         """
+        key = (group << 5) | index
+        cached = self._cdump.get(key)
+        if cached is not None:
+            (name, training, self._status, self._value) = cached
+            return(name,training)
         self._sendCmd(_CMD_DUMP_SD)
         self._sendGroup(group)
         self._sendArg(index)
         if self._recv(EasyVR.DEF_TIMEOUT) != _STS_DATA:
-            raise ValueError
-        rx = self._recvArg()
+            raise self._invalid()
+        data = self._recvArgs(3)
+        rx = data[0] - _ARG_ZERO
         training = rx & 0x07
         if rx == -1 or training == 7:
             training = 0
@@ -1273,21 +2400,11 @@ class EasyVR():
             self._status |= EasyVR._is_conflict
             self._status |= EasyVR._is_command
             self._status |= EasyVR._is_builtin
-        rx = self._recvArg()
-        _value = rx
-        rx = self._recvArg()
+        self._value = data[1] - _ARG_ZERO
+        rx = data[2] - _ARG_ZERO
         length = 32 if rx == -1 else rx
-        name = ''
-        i = 0
-        while i < length:
-            rx = self._recvArg()
-            i += 1
-            if rx == ord('^') - _ARG_ZERO:
-                rx = self._recvArg()
-                i += 1
-                name += chr(ord('0') + rx)
-            else:
-                name += chr(_ARG_ZERO + rx)
+        name = self._recvLabel(length)
+        self._cdump[key] = (name, training, self._status, self._value)
         return(name,training)
 
     def getGrammarsCount(self):
@@ -1298,12 +2415,15 @@ class EasyVR():
         
         :return: integer is the count of grammars (negative in case of errors)
         """
+        if self._cgcount is not None:
+            return self._cgcount
         self._sendCmd(_CMD_DUMP_SI)
         self._sendArg(-1)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_COUNT:
             rx = self._recvArg()
             if rx == -1:
-                return 32
+                rx = 32
+            self._cgcount = rx
             return rx
         return -1
 
@@ -1324,17 +2444,31 @@ class EasyVR():
         **count**
             is an integer that holds the number of words in the grammar
         """
-        self._sendCmd(_CMD_DUMP_SI)
-        self._sendArg(grammar)
-        if self._recv(EasyVR.DEF_TIMEOUT) != _STS_GRAMMAR:
-            raise ValueError
-        rx = self._recvArg()
-        if rx == -1:
-            flags = 32
-        else:
-            flags = rx
-        rx = self._recvArg()
-        return(rx,flags)
+        cached = self._cgrammar.get(grammar)
+        if cached is None:
+            self._sendCmd(_CMD_DUMP_SI)
+            self._sendArg(grammar)
+            if self._recv(EasyVR.DEF_TIMEOUT) != _STS_GRAMMAR:
+                raise self._invalid()
+            data = self._recvArgs(2)
+            rx = data[0] - _ARG_ZERO
+            if rx == -1:
+                flags = 32
+            else:
+                flags = rx
+            count = data[1] - _ARG_ZERO
+            # all the labels are read at once
+            words = []
+            for i in range(count):
+                length = self._recvArg()
+                if length == -1:
+                    length = 32
+                words.append(self._recvLabel(length))
+            cached = (count, flags, words)
+            self._cgrammar[grammar] = cached
+        self._cwords = cached[2]
+        self._cwordpos = 0
+        return(cached[0],cached[1])
 
     def getNextWordLabel(self):
         """
@@ -1345,21 +2479,11 @@ class EasyVR():
         
         :return: a string that holds the command label (max length 32)
         """
-        count = self._recvArg()
-        if count == -1:
-            count = 32
-        name = ''
-        i = 0
-        while i < count:
-            rx = self._recvArg()
-            i += 1
-            if rx == ord('^') - _ARG_ZERO:
-                rx = self._recvArg()
-                i += 1
-                name += chr(ord('0') + rx)
-            else:
-                name += chr(_ARG_ZERO + rx)
-        return name
+        words = self._cwords
+        if words is None or self._cwordpos >= len(words):
+            raise ValueError
+        self._cwordpos += 1
+        return words[self._cwordpos - 1]
 
     def trainCommand(self, group, index):
         """
@@ -1374,9 +2498,12 @@ class EasyVR():
         :note: The module is busy until training completes and it cannot \
         accept other commands. You can interrupt training with :meth:`stop()`.
         """
+        self._cdump.pop((group << 5) | index, None)
+        self._csum.pop((group << 5) | index, None)
         self._sendCmd(_CMD_TRAIN_SD)
         self._sendGroup(group)
         self._sendArg(index)
+        self._sendAsync()
 
     def recognizeCommand(self, group):
         """
@@ -1392,6 +2519,7 @@ class EasyVR():
         """
         self._sendCmd(_CMD_RECOG_SD)
         self._sendArg(group)
+        self._sendAsync()
 
     def recognizeWord(self, wordset):
         """
@@ -1408,6 +2536,83 @@ class EasyVR():
           """
         self._sendCmd(_CMD_RECOG_SI)
         self._sendArg(wordset)
+        self._sendAsync()
+
+    def _playThenListen(self, index, volume, cmd, arg):
+        # the listening frame is ready before playback starts, so that it is
+        # written as soon as the playback status is read (here or by the
+        # background reader, see _readResultStatus)
+        frame = bytearray(cmd)
+        frame.append(arg + _ARG_ZERO)
+        self._latency = -1
+        self._sendCmd(_CMD_PLAY_SX)
+        self._sendArg((index >> 5) & 0x1F)
+        self._sendArg(index & 0x1F)
+        self._sendArg(volume)
+        self._chain = (cmd, frame)
+        self._rxidle = _millis()
+        self._sendAsync()
+        deadline = self._deadline(EasyVR.PLAY_TIMEOUT)
+        if self._reading:
+            while self._chain is not None:
+                if _ticks_diff(deadline, _millis()) <= 0:
+                    self._chain = None
+                    raise self._timeout()
+                _delay(1)
+        else:
+            if not self._waitData(deadline):
+                self._chain = None
+                raise self._timeout()
+            self._pending = None
+            self._readResultStatus(self._poll())
+        if self._latency < 0:
+            # playback failed, recognition has not started
+            raise self._invalid()
+
+    def playAndRecognizeCommand(self, index, volume, group):
+        """
+.. method:: playAndRecognizeCommand(index, volume, group)
+
+        Plays a sound from the sound table and starts recognition of a custom command \
+        the moment playback ends, so that a quick answer to the prompt is not cut off. \
+        Waits for the end of playback like :meth:`playSound()`, then results are \
+        available after :meth:`hasFinished()` returns true (or delivered by the \
+        background reader, if running, that also starts recognition). The time between the end \
+        of playback and the start of recognition is returned by :meth:`getListenLatency()`.
+
+        :param index: is the index of the target sound in the sound table
+        :param volume: (0-31) may be one of the values in #SoundVolume
+        :param group: (0-16) is the target group, or one of the values in #Groups
+        """
+        self._playThenListen(index, volume, _CMD_RECOG_SD, group)
+
+    def playAndRecognizeWord(self, index, volume, wordset):
+        """
+.. method:: playAndRecognizeWord(index, volume, wordset)
+
+        Plays a sound from the sound table and starts recognition of a built-in word \
+        the moment playback ends (see :meth:`playAndRecognizeCommand()`).
+
+        :param index: is the index of the target sound in the sound table
+        :param volume: (0-31) may be one of the values in #SoundVolume
+        :param wordset: (0-3) is the target word set, or one of the values in \
+        #Wordset, (4-31) is the target custom grammar, if present
+        """
+        self._playThenListen(index, volume, _CMD_RECOG_SI, wordset)
+
+    def getListenLatency(self):
+        """
+.. method:: getListenLatency()
+
+        Gets the time between the end of the prompt and the start of recognition \
+        measured by the last :meth:`playAndRecognizeCommand()` or :meth:`playAndRecognizeWord()`, \
+        from the arrival of the playback status (estimated from the time of the last \
+        check that found no data) until the recognition command has been shifted out \
+        to the module.
+
+        :return: the latency in milliseconds, or (-1) if not available
+        """
+        return self._latency
 
     def setPinOutput(self, pin, config):
         """
@@ -1424,7 +2629,7 @@ class EasyVR():
         self._sendArg(config)
         if self._recv(EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def getPinInput(self, pin, config):
         """
@@ -1467,7 +2672,27 @@ class EasyVR():
             duration = duration * 40
         if self._recv(duration + EasyVR.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
+
+    def playPhoneToneAsync(self, tone, duration):
+        """
+.. method:: playPhoneToneAsync(tone, duration)
+
+        Starts playback of a phone tone. Manually check for completion with :meth:`hasFinished()`.
+        
+        :param tone: is the index of the tone (0-9 for digits, 10 for '*' key, 11 \
+        for '#' key and 12-15 for extra keys 'A' to 'D', -1 for the dial tone)
+        :param duration: (1-32) is the tone duration in 40 milliseconds units, or \
+        in seconds for the dial tone
+        
+        :note: The module is busy until playback completes and it cannot \
+        accept other commands. You can interrupt playback with :meth:`stop()`.
+        """
+        self._sendCmd(_CMD_PLAY_DTMF)
+        self._sendArg(-1)  #distinguish DTMF from SX
+        self._sendArg(tone)
+        self._sendArg(duration - 1)
+        self._sendAsync()
 
     def playSound(self, index, volume):
         """
@@ -1487,7 +2712,7 @@ class EasyVR():
         self._sendArg(volume)
         if self._recv(EasyVR.PLAY_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def playSoundAsync(self, index, volume):
         """
@@ -1506,6 +2731,7 @@ class EasyVR():
         self._sendArg((index >> 5) & 0x1F)
         self._sendArg(index & 0x1F)
         self._sendArg(volume)
+        self._sendAsync()
 
     def detectToken(self, bits, rejection, timeout):
         """
@@ -1530,6 +2756,7 @@ class EasyVR():
             timeout = int((timeout * 2 + 53)/ 55) # approx / 27.46 - err < 0.15%
         self._sendArg((timeout >> 5) & 0x1F)
         self._sendArg(timeout & 0x1F)
+        self._sendAsync()
 
     def sendToken(self, bits, token):
         """
@@ -1553,7 +2780,7 @@ class EasyVR():
         self._sendArg(0)
         if self._recv(EasyVR.TOKEN_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def sendTokenAsync(self, bits, token):
         """
@@ -1571,6 +2798,7 @@ class EasyVR():
         self._sendArg(token & 0x1F)
         self._sendArg(0)
         self._sendArg(0)
+        self._sendAsync()
 
     def embedToken(self, bits, token, delay):
         """
@@ -1598,7 +2826,7 @@ class EasyVR():
         self._sendArg(delay & 0x1F)
         if self._recv(self.DEF_TIMEOUT) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def dumpSoundTable(self):
         """
@@ -1611,24 +2839,15 @@ class EasyVR():
         :param count: is a variable that holds the number of sounds when the \
         function returns
         """
+        if self._csounds is not None:
+            return self._csounds
         self._sendCmd(_CMD_DUMP_SX)
         if self._recv(EasyVR.DEF_TIMEOUT) != _STS_TABLE_SX:
-            raise ValueError
-        rx = self._recvArg()
-        count = rx << 5
-        rx = self._recvArg()
-        count |= rx
-        rx = self._recvArg()
-        len = rx
-        name = ''
-        for i in range(len):
-            rx = self._recvArg()
-            if rx == ord('^') - _ARG_ZERO:
-                rx = self._recvArg()
-                i += 1
-                name += chr(ord('0') + rx)
-            else:
-                name += chr(_ARG_ZERO + rx)
+            raise self._invalid()
+        data = self._recvArgs(3)
+        count = ((data[0] - _ARG_ZERO) << 5) | (data[1] - _ARG_ZERO)
+        name = self._recvLabel(data[2] - _ARG_ZERO)
+        self._csounds = (name,count)
         return(name,count)
 
     def resetAll(self, wait):
@@ -1646,16 +2865,15 @@ class EasyVR():
         timeout = 40 # seconds
         if self.getID() >= EasyVR.EASYVR3:
             timeout = 5
+        self._uncacheAll()
         self._sendCmd(_CMD_RESETALL)
         self._sendArg(ord('R') - _ARG_ZERO)
         if not wait:
+            self._sendAsync()
             return
-        while timeout != 0 and _available(self._s) == 0:
-            _delay(1000)
-            --timeout
-        if self._s.read() == _STS_SUCCESS:
+        if self._recv(timeout * 1000) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def resetCommands(self, wait):
         """
@@ -1671,17 +2889,16 @@ class EasyVR():
         """
         if self.getID() >= EasyVR.EASYVR3_1:
             return self.resetAll(wait) # map to reset all for older firmwares
+        self._uncacheAll()
         self._sendCmd(_CMD_RESET_SD)
         self._sendArg(ord('D') - _ARG_ZERO)
         if not wait:
+            self._sendAsync()
             return
         timeout = 5 # seconds
-        while timeout != 0 and _available(self._s) == 0:
-            _delay(1000)
-            --timeout
-        if self._s.read() == _STS_SUCCESS:
+        if self._recv(timeout * 1000) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def resetMessages(self, wait):
         """
@@ -1698,14 +2915,12 @@ class EasyVR():
         self._sendCmd(_CMD_RESET_RP)
         self._sendArg(ord('M') - _ARG_ZERO)
         if not wait:
+            self._sendAsync()
             return
         timeout = 15 # seconds
-        while timeout != 0 and _available(self._s) == 0:
-            _delay(1000)
-        --timeout
-        if self._s.read() == _STS_SUCCESS:
+        if self._recv(timeout * 1000) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def checkMessages(self):
         """
@@ -1743,14 +2958,12 @@ class EasyVR():
         self._sendArg(-1)
         self._sendArg(1)
         if not wait:
+            self._sendAsync()
             return
         timeout = 25 # seconds
-        while timeout != 0 and _available(self._s) == 0:
-            _delay(1000)
-            --timeout
-        if self._s.read() == _STS_SUCCESS:
+        if self._recv(timeout * 1000) == _STS_SUCCESS:
             return
-        raise ValueError
+        raise self._invalid()
 
     def recordMessageAsync(self, index, bits, timeout):
         """
@@ -1770,6 +2983,7 @@ class EasyVR():
         self._sendArg(index)
         self._sendArg(bits)
         self._sendArg(timeout)
+        self._sendAsync()
 
     def playMessageAsync(self, index, speed, atten):
         """
@@ -1788,6 +3002,7 @@ class EasyVR():
         self._sendArg(-1)
         self._sendArg(index)
         self._sendArg((speed << 2) | (atten & 3))
+        self._sendAsync()
 
     def eraseMessageAsync(self, index):
         """
@@ -1800,6 +3015,7 @@ class EasyVR():
         self._sendCmd(_CMD_ERASE_RP)
         self._sendArg(-1)
         self._sendArg(index)
+        self._sendAsync()
 
     def dumpMessage(self, index):
         """
@@ -1826,18 +3042,19 @@ class EasyVR():
         sts = self._recv(EasyVR.STORAGE_TIMEOUT)        
         if sts != _STS_MESSAGE:
             self._readStatus(sts)
-            raise ValueError
+            raise self._invalid()
         #if communication should fail
         self._status = 0
         self._status |= EasyVR._is_error
         msgType = self._recvArg()        
         if msgType == 0:
             return # skip reading if empty
+        data = self._recvArgs(6)
         length = 0
         for i in range(3):            
-            rx = self._recvArg()            
+            rx = data[i * 2] - _ARG_ZERO
             length |= (rx & 0x0F) << (i * 8)
-            rx = self._recvArg()            
+            rx = data[i * 2 + 1] - _ARG_ZERO
             length |= ((rx << 4) & 0xF0) << (i * 8)            
         self._status = 0
         return (msgType, length)
@@ -1864,7 +3081,7 @@ class EasyVR():
         sts = self._recv(EasyVR.DEF_TIMEOUT)
         if sts != _STS_LIPSYNC:
             self._readStatus(sts)
-            raise ValueError
+            raise self._invalid()
 
     def fetchMouthPosition(self):
         """
@@ -1876,23 +3093,28 @@ class EasyVR():
         (-1) if lip-sync has finished
         """
         self._send(_ARG_ACK)
+        if self._stats is not None:
+            self._statrow[_ST_ACKS] += 1
         rx = self._recv(EasyVR.DEF_TIMEOUT)[0]
         if rx >= _ARG_MIN and rx <= _ARG_MAX:
             return rx - _ARG_ZERO            
         # check if finished
         if rx != _STS_SUCCESS:
             self.readStatus(rx)
-            raise ValueError
+            raise self._invalid()
         return -1
 
-    def exportCommand(self, group, index):
+    def exportCommand(self, group, index, data = None):
         """
-.. method:: exportCommand(group, index)
+.. method:: exportCommand(group, index, data)
 
         Retrieves all internal data associated to a custom command.
         
         :param group: (0-16) is the target group, or one of the values in #Groups
         :param index: (0-31) is the index of the command within the selected group
+        :param data: a writable buffer of 258 bytes to fill (such as a reused \
+        bytearray or a record of a :class:`templates.TemplateArchive`), or *None* \
+        to allocate a new one
 
         :return: an array of 258 bytes that holds the command raw data
         """
@@ -1900,19 +3122,19 @@ class EasyVR():
         self._sendArg(ord(_SVC_EXPORT_SD) - _ARG_ZERO)
         self._sendGroup(group)
         self._sendArg(index)
-        data = bytearray(258)
         if self._recv(EasyVR.STORAGE_TIMEOUT) != _STS_SERVICE:
-            raise ValueError
-        rx = self._recvArg()
-        if rx != ord(_SVC_DUMP_SD) - _ARG_ZERO:
-            raise ValueError
+            raise self._invalid()
+        raw = self._recvArgs(1 + 258 * 2)
+        if raw[0] != ord(_SVC_DUMP_SD):
+            raise self._invalid()
+        if data is None:
+            data = bytearray(258)
         for i in range(258):
-            d = 0
-            rx = self._recvArg()
-            d = (rx << 4) & 0xF0
-            rx = self._recvArg()
-            d |= (rx & 0x0F)
+            d = ((raw[i * 2 + 1] - _ARG_ZERO) << 4) & 0xF0
+            d |= (raw[i * 2 + 2] - _ARG_ZERO) & 0x0F
             data[i] = d
+        # the reply ends with the checksum of the template
+        self._csum[(group << 5) | index] = (data[256] << 8) | data[257]
         return data
 
     def importCommand(self, group, index, data):
@@ -1927,6 +3149,9 @@ class EasyVR():
         :param index: (0-31) is the index of the command within the selected group
         :param data: an array of 258 bytes that holds the command raw data
         """
+        key = (group << 5) | index
+        self._cdump.pop(key, None)
+        self._csum.pop(key, None)
         self._sendCmd(_CMD_SERVICE)
         self._sendArg(ord(_SVC_IMPORT_SD) - _ARG_ZERO)
         self._sendGroup(group)
@@ -1937,7 +3162,27 @@ class EasyVR():
             tx = data[i] & 0x0F
             self._sendArg(tx)
         if self._recv(EasyVR.STORAGE_TIMEOUT) != _STS_SUCCESS:
-            raise ValueError
+            raise self._invalid()
+        self._csum[key] = (data[256] << 8) | data[257]
+
+    def getCommandChecksum(self, group, index):
+        """
+.. method:: getCommandChecksum(group, index)
+
+        Gets the checksum of the internal data of a custom command, as reported \
+        at the end of :meth:`exportCommand()`. It is cached with the inventory (see \
+        :meth:`invalidateCache()`), also for commands written with :meth:`importCommand()`, \
+        so the data is only exported the first time.
+
+        :param group: (0-16) is the target group, or one of the values in #Groups
+        :param index: (0-31) is the index of the command within the selected group
+
+        :return: integer is the checksum (0-65535)
+        """
+        key = (group << 5) | index
+        if key not in self._csum:
+            self.exportCommand(group, index)
+        return self._csum[key]
 
     def verifyCommand(self, group, index):
         """
@@ -1950,10 +3195,12 @@ class EasyVR():
         :param group: (0-16) is the target group, or one of the values in #Groups
         :param index: (0-31) is the index of the command within the selected group
         """
+        self._cdump.pop((group << 5) | index, None)
         self._sendCmd(_CMD_SERVICE)
         self._sendArg(ord(_SVC_VERIFY_SD) - _ARG_ZERO)
         self._sendGroup(group)
         self._sendArg(index)
+        self._sendAsync()
 
     # bridge mode implementation
 
@@ -0,0 +1,236 @@
+"""
+.. module:: fleet
+
+*************************
+EasyVR Fleet Provisioning
+*************************
+
+    Provisions many EasyVR modules from one host (CPython only), each serial port
+    driven by its own worker thread, so that the total time is close to the one of
+    the slowest module rather than the sum of all of them.
+
+    Each module is connected at the fastest speed it supports (see
+    :meth:`easyvr.EasyVR.connect()`), then its custom commands are brought to the
+    contents of a :class:`templates.TemplateArchive` by a
+    :class:`templates.TemplateSync` (optionally after erasing them all), retrying
+    operations that fail with a *TimeoutError* or a *ValueError*::
+
+        python -m fortebit.easyvr.fleet --archive panel.eva /dev/ttyUSB0 /dev/ttyUSB1
+
+    Progress is printed to *stderr* as operations complete; the final report is
+    printed (or saved) as a JSON document, with one record per module.
+
+    Serial ports are opened with *pyserial* if installed, otherwise as raw
+    terminal devices (enough for pseudo-terminals). ``--simulate N`` provisions
+    N simulated modules instead (see :mod:`simulator`).
+
+    """
+
+import json
+import os
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.templates import TemplateArchive, TemplateSync
+
+
+def open_port(port, baudrate = 9600):
+    """
+.. function:: open_port(port, baudrate)
+
+    Opens a serial port for :class:`easyvr.EasyVR`, with *pyserial* if available.
+
+    :return: the stream object
+    """
+    try:
+        import serial
+    except ImportError:
+        from fortebit.easyvr.simulator import open_device
+        return open_device(port, baudrate)
+    return serial.Serial(port, baudrate, timeout=0)
+
+
+def load_desired(archive):
+    """
+.. function:: load_desired(archive)
+
+    Reads the desired contents of the groups from a template archive (see \
+    :meth:`templates.TemplateArchive.getGroups()`), copied so that they can be \
+    shared by the workers.
+
+    :param archive: a :class:`templates.TemplateArchive`
+
+    :return: a dictionary of command lists, by group
+    """
+    return archive.getGroups()
+
+
+def _retry(fn, retries):
+    failures = 0
+    while True:
+        try:
+            return fn()
+        except (TimeoutError, ValueError):
+            if failures >= retries:
+                raise
+            failures += 1
+
+
+def provision(port, desired, baudrate = 9600, reset = False, retries = 2, progress = None, opener = open_port):
+    """
+.. function:: provision(port, desired, baudrate, reset, retries, progress, opener)
+
+    Provisions a single module.
+
+    :param port: the serial port
+    :param desired: the contents of the groups (see :func:`load_desired()`)
+    :param baudrate: the speed the module is expected at
+    :param reset: *True* to erase all the custom commands first (see \
+    :meth:`easyvr.EasyVR.resetCommands()`), otherwise only the differences are written
+    :param retries: how many times a failed operation is tried again
+    :param progress: a function called with the port, the operations done and \
+    the operations planned, or *None*
+    :param opener: a function called with the port and the baudrate, returning the stream
+
+    :return: a dictionary with the outcome: ``ok``, ``error``, ``baudrate``, \
+    ``planned`` and ``operations`` (commands changed), ``seconds`` and \
+    ``ops_per_s``, plus the bytes exchanged if the stream counts them
+    """
+    report = {"port": str(port), "ok": False, "error": None, "baudrate": 0, "planned": 0, "operations": 0}
+    start = time.perf_counter()
+    stream = None
+    try:
+        stream = opener(port, baudrate)
+        evr = EasyVR(stream)
+        report["baudrate"] = evr.connect(baudrate)
+        if not report["baudrate"]:
+            raise TimeoutError("module not detected")
+        stream = evr._s
+        if reset:
+            _retry(lambda: evr.resetCommands(True), retries)
+        sync = TemplateSync(evr)
+        for group in desired:
+            sync.setGroup(group, desired[group])
+        report["planned"] = len(_retry(sync.plan, retries))
+        if progress is not None:
+            progress(port, 0, report["planned"])
+        def step(op):
+            report["operations"] += 1
+            if progress is not None:
+                progress(port, report["operations"], report["planned"])
+        sync.apply(step, retries)
+        report["ok"] = True
+    except Exception as e:
+        report["error"] = "%s: %s" % (type(e).__name__, e)
+    finally:
+        if stream is not None:
+            stream.close()
+    seconds = time.perf_counter() - start
+    report["seconds"] = round(seconds, 3)
+    report["ops_per_s"] = round(report["operations"] / seconds, 2)
+    if hasattr(stream, "bytesWritten"):
+        report["bytes_sent"] = stream.bytesWritten
+        report["bytes_received"] = stream.bytesRead
+    return report
+
+
+def run(ports, desired, jobs = None, progress = None, **options):
+    """
+.. function:: run(ports, desired, jobs, progress, **options)
+
+    Provisions several modules concurrently.
+
+    :param ports: the list of serial ports
+    :param desired: the contents of the groups (see :func:`load_desired()`)
+    :param jobs: the number of worker threads (default one per port)
+    :param progress: see :func:`provision()`
+    :param options: other arguments passed to :func:`provision()`
+
+    :return: a dictionary with the reports of the modules (``modules``), the \
+    total ``operations``, ``failed`` modules, ``seconds`` and ``ops_per_s``
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs or max(1, len(ports))) as pool:
+        futures = [pool.submit(provision, port, desired, progress=progress, **options) for port in ports]
+        modules = [f.result() for f in futures]
+    seconds = time.perf_counter() - start
+    operations = sum(m["operations"] for m in modules)
+    return {
+        "modules": modules,
+        "operations": operations,
+        "failed": len([m for m in modules if not m["ok"]]),
+        "seconds": round(seconds, 3),
+        "ops_per_s": round(operations / seconds, 2),
+        # time of the slowest module and of all the modules one after the other
+        "slowest_s": max([m["seconds"] for m in modules] or [0]),
+        "serial_s": round(sum(m["seconds"] for m in modules), 3),
+    }
+
+
+def _printer():
+    lock = threading.Lock()
+    def progress(port, done, total):
+        with lock:
+            sys.stderr.write("%s: %d/%d\n" % (port, done, total))
+    return progress
+
+
+def _simulated(count, **latency):
+    # empty modules on in-memory links, named by number
+    from fortebit.easyvr.simulator import EasyVRSimulator, open_loopback
+    sims = [EasyVRSimulator(**latency) for i in range(count)]
+    def opener(port, baudrate):
+        return open_loopback(sims[port], baudrate)
+    return (list(range(count)), opener)
+
+
+def main(argv = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="fortebit.easyvr.fleet", description="EasyVR fleet provisioning")
+    parser.add_argument("ports", nargs="*", help="serial ports or pseudo-terminals")
+    parser.add_argument("--archive", required=True, help="template archive with the desired commands (must exist)")
+    parser.add_argument("--baud", type=int, default=9600, help="current speed of the modules")
+    parser.add_argument("--reset", action="store_true", help="erase all the commands first")
+    parser.add_argument("--retries", type=int, default=2, help="retries of each failed operation")
+    parser.add_argument("--jobs", type=int, default=None, help="worker threads (default one per module)")
+    parser.add_argument("--simulate", type=int, default=0, help="provision simulated modules instead")
+    parser.add_argument("--quiet", action="store_true", help="do not print progress")
+    parser.add_argument("--output", default=None, help="JSON report file (default stdout)")
+    args = parser.parse_args(argv)
+
+    # a mistyped path must not erase the modules (the archive would be created empty)
+    if not os.path.isfile(args.archive):
+        parser.error("archive not found: %s" % args.archive)
+    try:
+        archive = TemplateArchive(args.archive)
+    except ValueError:
+        parser.error("not a template archive: %s" % args.archive)
+    try:
+        desired = load_desired(archive)
+    finally:
+        archive.close()
+    if not desired:
+        parser.error("archive is empty: %s" % args.archive)
+    ports = args.ports
+    opener = open_port
+    if args.simulate:
+        (ports, opener) = _simulated(args.simulate)
+    progress = None if args.quiet else _printer()
+    doc = run(ports, desired, args.jobs, progress, baudrate=args.baud, reset=args.reset,
+        retries=args.retries, opener=opener)
+    doc["python"] = sys.version.split()[0]
+    if args.output is None:
+        json.dump(doc, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=1)
+    return 1 if doc["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+.. module:: prompts
+
+*******************
+EasyVR Prompt Queue
+*******************
+
+    Plays audio prompts without blocking the caller.
+
+    A :class:`PromptQueue` turns sound table entries, DTMF tone sequences and
+    recorded messages into tasks of a :class:`session.Session`, played back to back
+    by the session worker (the next item starts as soon as the module reports the end
+    of the previous one)::
+
+        prompts = PromptQueue(session)
+        prompts.playSound(SND_Hello)
+        prompts.playTones("1234#", callback=dialed)
+
+        # a new prompt that makes the queued ones obsolete
+        prompts.playSound(SND_Access_denied, replace=True)
+
+    Prompts run with the priority of user interface jobs, so they interrupt a
+    recognition in progress (see :meth:`session.Session.submitTask()`).
+
+    """
+
+from fortebit.easyvr.easyvr import EasyVR, _Lock
+from fortebit.easyvr.session import PRIORITY_UI
+
+
+# DTMF keys and the corresponding tone indices
+_KEYS = "0123456789*#ABCD"
+
+def _tone(tone, duration):
+    return lambda evr: evr.playPhoneToneAsync(tone, duration)
+
+
+class Prompt():
+    """
+.. class:: Prompt
+
+    A prompt queued in a :class:`PromptQueue`, made of one or more items \
+    played in sequence.
+    """
+
+    def __init__(self, queue, callback, count):
+        self._queue = queue
+        self._callback = callback
+        self._count = count
+        self._jobs = []
+        self._results = []
+        self._next = 0
+        self._done = False
+        self._cancelled = False
+        self._error = None
+
+    def _jobDone(self, job):
+        # called on the session worker, in order, for each item
+        if self._done:
+            return
+        self._next += 1
+        if job.getError() is not None:
+            self._error = job.getError()
+        elif job.isCancelled() or job.isPreempted():
+            self._cancelled = True
+        else:
+            self._results.append(job.getResult())
+            if self._next < self._count:
+                return
+        self._finish()
+
+    def _finish(self):
+        self._done = True
+        # skip the rest of the sequence
+        for job in self._jobs[self._next:]:
+            job.cancel()
+        self._queue._remove(self)
+        if self._callback is not None:
+            try:
+                self._callback(self)
+            except Exception:
+                pass
+
+    def isDone(self):
+        """
+.. method:: isDone()
+
+        :return: *True* if the prompt has been played, cancelled or has failed
+        """
+        return self._done
+
+    def isCancelled(self):
+        """
+.. method:: isCancelled()
+
+        :return: *True* if the prompt has been cancelled or interrupted
+        """
+        return self._cancelled
+
+    def getError(self):
+        """
+.. method:: getError()
+
+        :return: the exception raised while playing the prompt, or *None*
+        """
+        return self._error
+
+    def getResults(self):
+        """
+.. method:: getResults()
+
+        :return: the list of :class:`easyvr.Result` records of the items played so far \
+        (check them for playback errors)
+        """
+        return self._results
+
+    def cancel(self):
+        """
+.. method:: cancel()
+
+        Removes the prompt from the queue, stopping it if it is playing.
+        """
+        for job in self._jobs:
+            job.cancel()
+
+
+class PromptQueue():
+    """
+.. class:: PromptQueue
+
+    Queue of audio prompts played by a :class:`session.Session`.
+
+    :param session: the running :class:`session.Session`
+    :param priority: the priority of the prompts in the session
+    """
+
+    def __init__(self, session, priority = PRIORITY_UI):
+        self._session = session
+        self._priority = priority
+        self._prompts = []
+        self._mutex = _Lock()
+
+    def _remove(self, prompt):
+        self._mutex.acquire()
+        if prompt in self._prompts:
+            self._prompts.remove(prompt)
+        self._mutex.release()
+
+    def _add(self, fns, callback, replace):
+        if replace:
+            self.cancel()
+        prompt = Prompt(self, callback, len(fns))
+        self._mutex.acquire()
+        self._prompts.append(prompt)
+        # all the items are queued together, so that they play back to back
+        for fn in fns:
+            prompt._jobs.append(self._session.submitTask(fn, self._priority, prompt._jobDone))
+        self._mutex.release()
+        if prompt._done:
+            # failed before all the items were queued
+            prompt.cancel()
+        return prompt
+
+    def pending(self):
+        """
+.. method:: pending()
+
+        :return: the number of prompts playing or waiting
+        """
+        return len(self._prompts)
+
+    def cancel(self):
+        """
+.. method:: cancel()
+
+        Cancels all the prompts, stopping the one being played.
+        """
+        self._mutex.acquire()
+        prompts = list(self._prompts)
+        self._mutex.release()
+        for prompt in prompts:
+            prompt.cancel()
+
+    def playSound(self, index, volume = EasyVR.VOL_FULL, callback = None, replace = False):
+        """
+.. method:: playSound(index, volume, callback, replace)
+
+        Queues a sound from the sound table (see :meth:`easyvr.EasyVR.playSoundAsync()`).
+
+        :param index: is the index of the target sound in the sound table
+        :param volume: (0-31) may be one of the values in #SoundVolume
+        :param callback: a function called with the :class:`Prompt` when it is done \
+        (on the session worker), or *None*
+        :param replace: *True* to cancel all the other prompts first
+
+        :return: the :class:`Prompt` object
+        """
+        return self._add((lambda evr: evr.playSoundAsync(index, volume),), callback, replace)
+
+    def playTones(self, keys, duration = 3, callback = None, replace = False):
+        """
+.. method:: playTones(keys, duration, callback, replace)
+
+        Queues a sequence of DTMF tones (see :meth:`easyvr.EasyVR.playPhoneToneAsync()`).
+
+        :param keys: a string of keys (``0-9``, ``*``, ``#`` and ``A-D``) or a list \
+        of tone indices
+        :param duration: (1-32) is the duration of each tone in 40 milliseconds units
+        :param callback: a function called with the :class:`Prompt` when it is done \
+        (on the session worker), or *None*
+        :param replace: *True* to cancel all the other prompts first
+
+        :return: the :class:`Prompt` object
+        """
+        fns = []
+        for key in keys:
+            if isinstance(key, str):
+                tone = _KEYS.find(key.upper())
+                if tone < 0:
+                    raise ValueError
+            else:
+                tone = key
+            fns.append(_tone(tone, duration))
+        return self._add(fns, callback, replace)
+
+    def playMessage(self, index, speed = EasyVR.SPEED_NORMAL, atten = EasyVR.ATTEN_NONE, callback = None, replace = False):
+        """
+.. method:: playMessage(index, speed, atten, callback, replace)
+
+        Queues a recorded message (see :meth:`easyvr.EasyVR.playMessageAsync()`).
+
+        :param index: (0-31) is the index of the target message slot
+        :param speed: (0-1) may be one of the values in #MessageSpeed
+        :param atten: (0-3) may be one of the values in #MessageAttenuation
+        :param callback: a function called with the :class:`Prompt` when it is done \
+        (on the session worker), or *None*
+        :param replace: *True* to cancel all the other prompts first
+
+        :return: the :class:`Prompt` object
+        """
+        return self._add((lambda evr: evr.playMessageAsync(index, speed, atten),), callback, replace)
@@ -0,0 +1,379 @@
+"""
+.. module:: session
+
+**************
+EasyVR Session
+**************
+
+    Serializes the transactions of several threads on a single EasyVR module.
+
+    A :class:`Session` owns the :class:`easyvr.EasyVR` object: all the other threads
+    submit jobs (functions of the EasyVR object) that a worker thread runs one at a
+    time, in order of priority, so the bytes of different commands never interleave
+    on the serial link. Lower numbers mean higher priority::
+
+        session = Session(evr)
+        session.start()
+
+        # from a touch callback, does not block
+        session.submit(lambda evr: evr.playSound(1, evr.VOL_FULL), PRIORITY_UI)
+
+        # from the main loop, waits for the recognition result
+        result = session.submitTask(lambda evr: evr.recognizeWord(evr.TRIGGER_SET)).wait()
+
+    Long operations (recognition, training, asynchronous playback) are submitted as
+    tasks: while waiting for their result the worker interrupts them with
+    :meth:`easyvr.EasyVR.stop()` as soon as a job with a higher priority arrives.
+
+    Requires thread support (it cannot be used together with the background reader
+    of :meth:`easyvr.EasyVR.startReader()`).
+
+    """
+
+from fortebit.easyvr.easyvr import Result, _threads, _start_thread, _Lock, _millis
+
+
+PRIORITY_UI         = 0     #: User interface prompts and feedback
+PRIORITY_NORMAL     = 1     #: Recognition and application logic (default)
+PRIORITY_BACKGROUND = 2     #: Inventory, statistics and maintenance
+
+# how often a pending task checks for preemption (ms)
+_SLICE = 20
+
+
+class _Signal():
+    # binary semaphore built on a lock (an event without timeout)
+
+    def __init__(self):
+        self._lock = _Lock()
+        self._lock.acquire()
+        self._mutex = _Lock()
+        self._set = False
+
+    def set(self):
+        self._mutex.acquire()
+        if not self._set:
+            self._set = True
+            self._lock.release()
+        self._mutex.release()
+
+    def wait(self):
+        self._lock.acquire()
+        self._mutex.acquire()
+        self._set = False
+        self._mutex.release()
+
+
+class Job():
+    """
+.. class:: Job
+
+    A transaction submitted to a :class:`Session`.
+    """
+
+    def __init__(self, fn, priority, callback, task, listener = None):
+        self._fn = fn
+        self._priority = priority
+        self._callback = callback
+        self._task = task
+        self._listener = listener
+        self._value = None
+        self._error = None
+        self._cancelled = False
+        self._preempted = False
+        self._done = False
+        self._signal = _Signal()
+
+    def _finish(self):
+        self._done = True
+        self._signal.set()
+        if self._callback is not None:
+            try:
+                self._callback(self)
+            except Exception:
+                pass # keep the worker alive
+
+    def getPriority(self):
+        """
+.. method:: getPriority()
+
+        :return: the priority of the job
+        """
+        return self._priority
+
+    def isDone(self):
+        """
+.. method:: isDone()
+
+        :return: *True* if the job has completed, has been cancelled or preempted
+        """
+        return self._done
+
+    def isCancelled(self):
+        """
+.. method:: isCancelled()
+
+        :return: *True* if the job has been cancelled with :meth:`cancel()`
+        """
+        return self._cancelled
+
+    def isPreempted(self):
+        """
+.. method:: isPreempted()
+
+        :return: *True* if the task has been interrupted by a job with higher priority
+        """
+        return self._preempted
+
+    def getResult(self):
+        """
+.. method:: getResult()
+
+        :return: the return value of the job function, or a :class:`easyvr.Result` \
+        record for tasks (*None* if not completed)
+        """
+        return self._value
+
+    def getError(self):
+        """
+.. method:: getError()
+
+        :return: the exception raised by the job, or *None*
+        """
+        return self._error
+
+    def cancel(self):
+        """
+.. method:: cancel()
+
+        Removes the job from the queue, or interrupts it if it is a running task.
+        Jobs that are already running a command complete normally.
+        """
+        self._cancelled = True
+
+    def wait(self):
+        """
+.. method:: wait()
+
+        Waits for the job to complete. Must not be called from a job callback.
+
+        :return: the result of the job (see :meth:`getResult()`), or raises the \
+        exception raised by the job
+        """
+        if not self._done:
+            self._signal.wait()
+            self._signal.set() # wake other waiters
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class Session():
+    """
+.. class:: Session
+
+    Runs all the transactions with an EasyVR module on one worker thread.
+
+    :param evr: the :class:`easyvr.EasyVR` object, not to be used directly while \
+    the session is running
+    """
+
+    def __init__(self, evr):
+        self._evr = evr
+        self._queue = []
+        self._mutex = _Lock()
+        self._signal = _Signal()
+        self._current = None
+        self._running = False
+
+    def start(self):
+        """
+.. method:: start()
+
+        Starts the worker thread.
+        """
+        if not _threads:
+            raise RuntimeError
+        if self._running:
+            return
+        self._running = True
+        _start_thread(self._run)
+
+    def close(self):
+        """
+.. method:: close()
+
+        Stops the worker thread after the current job. A running task is interrupted \
+        and jobs still in the queue are cancelled.
+        """
+        self._running = False
+        self._signal.set()
+
+    def getCurrent(self):
+        """
+.. method:: getCurrent()
+
+        :return: the :class:`Job` being run, or *None*
+        """
+        return self._current
+
+    def pending(self):
+        """
+.. method:: pending()
+
+        :return: the number of jobs waiting in the queue
+        """
+        return len(self._queue)
+
+    def _put(self, job):
+        self._mutex.acquire()
+        # after the queued jobs with the same or higher priority
+        i = len(self._queue)
+        while i > 0 and self._queue[i - 1]._priority > job._priority:
+            i -= 1
+        self._queue.insert(i, job)
+        self._mutex.release()
+        self._signal.set()
+        return job
+
+    def _next(self):
+        while True:
+            self._mutex.acquire()
+            job = self._queue.pop(0) if self._queue else None
+            self._mutex.release()
+            if job is None or not job._cancelled:
+                return job
+            job._finish()
+
+    def _preempts(self, job):
+        # a job with higher priority is waiting
+        self._mutex.acquire()
+        queue = self._queue
+        preempts = len(queue) > 0 and queue[0]._priority < job._priority
+        self._mutex.release()
+        return preempts
+
+    def submit(self, fn, priority = PRIORITY_NORMAL, callback = None):
+        """
+.. method:: submit(fn, priority, callback)
+
+        Queues a transaction, returning immediately.
+
+        :param fn: a function called with the EasyVR object as argument
+        :param priority: the priority of the job (lower numbers run first)
+        :param callback: a function called with the :class:`Job` when it completes \
+        (on the worker thread), or *None*
+
+        :return: the :class:`Job` object
+        """
+        return self._put(Job(fn, priority, callback, False))
+
+    def submitTask(self, fn, priority = PRIORITY_NORMAL, callback = None):
+        """
+.. method:: submitTask(fn, priority, callback)
+
+        Queues a long operation, returning immediately. The function must start an \
+        asynchronous operation, such as :meth:`easyvr.EasyVR.recognizeCommand()`, \
+        :meth:`easyvr.EasyVR.trainCommand()` or :meth:`easyvr.EasyVR.playSoundAsync()`, \
+        and the job completes with its :class:`easyvr.Result`. The operation is \
+        stopped if the job is cancelled or preempted by a job with higher priority.
+
+        :param fn: a function called with the EasyVR object as argument
+        :param priority: the priority of the job (lower numbers run first)
+        :param callback: a function called with the :class:`Job` when it completes \
+        (on the worker thread), or *None*
+
+        :return: the :class:`Job` object
+        """
+        return self._put(Job(fn, priority, callback, True))
+
+    def submitListen(self, fn, listener, priority = PRIORITY_NORMAL, callback = None):
+        """
+.. method:: submitListen(fn, listener, priority, callback)
+
+        Queues a continuous recognition, returning immediately. The function must \
+        start it with :meth:`easyvr.EasyVR.listenCommands()` or \
+        :meth:`easyvr.EasyVR.listenWords()`, and the job runs until *listener* \
+        returns *True* or the module replies with an invalid or error result (also \
+        passed to *listener*), completing with the last :class:`easyvr.Result`. Recognition \
+        is stopped if the job is cancelled or preempted by a job with higher priority.
+
+        :param fn: a function called with the EasyVR object as argument
+        :param listener: a function called with each :class:`easyvr.Result` (on the \
+        worker thread), returns *True* to end the job
+        :param priority: the priority of the job (lower numbers run first)
+        :param callback: a function called with the :class:`Job` when it completes \
+        (on the worker thread), or *None*
+
+        :return: the :class:`Job` object
+        """
+        return self._put(Job(fn, priority, callback, True, listener))
+
+    def call(self, fn, priority = PRIORITY_UI):
+        """
+.. method:: call(fn, priority)
+
+        Runs a transaction and waits for it to complete. Must not be called from \
+        a job callback.
+
+        :param fn: a function called with the EasyVR object as argument
+        :param priority: the priority of the job (lower numbers run first)
+
+        :return: the return value of *fn*, or raises the exception raised by it
+        """
+        return self.submit(fn, priority).wait()
+
+    def _runTask(self, job):
+        evr = self._evr
+        job._fn(evr)
+        request = evr._pending
+        while True:
+            if evr.waitResult(_SLICE):
+                job._value = Result(request, evr._status, evr._value, _millis())
+                if job._listener is None:
+                    return
+                try:
+                    done = job._listener(job._value)
+                except Exception:
+                    evr.stopListening()
+                    raise
+                if not evr.isListening():
+                    return # ended by an invalid or error result
+                if done:
+                    evr.stopListening()
+                    return
+                # already listening again, unless the job must give way
+            if job._cancelled or not self._running or self._preempts(job):
+                job._preempted = not job._cancelled
+                try:
+                    if job._listener is None:
+                        evr.stop()
+                    else:
+                        evr.stopListening()
+                except (TimeoutError, ValueError):
+                    pass # the result was already on its way
+                return
+
+    def _run(self):
+        while self._running:
+            job = self._next()
+            if job is None:
+                self._signal.wait()
+                continue
+            self._current = job
+            try:
+                if job._task:
+                    self._runTask(job)
+                else:
+                    job._value = job._fn(self._evr)
+            except Exception as e:
+                job._error = e
+            self._current = None
+            job._finish()
+        # the session is closed
+        while True:
+            job = self._next()
+            if job is None:
+                break
+            job._cancelled = True
+            job._finish()
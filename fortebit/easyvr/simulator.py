@@ -0,0 +1,1020 @@
+"""
+.. module:: simulator
+
+****************
+EasyVR Simulator
+****************
+
+    A simulated EasyVR module implementing the serial protocol spoken by the
+    :mod:`easyvr` library, to run tests and benchmarks on a plain Linux box
+    without hardware (CPython only).
+
+    The simulator keeps groups, commands, labels, training data, grammars, the
+    sound table and recorded messages in memory, and answers with the same
+    status codes and argument encoding as a real module. Per-byte (baudrate) and
+    per-operation latencies are configurable, and the outcome of recognition,
+    training, verification and token detection can be scripted::
+
+        sim = EasyVRSimulator(baudrate=115200, recognition=0.05)
+        sim.addCommand(EasyVR.PASSWORD, 0, "JOHN", training=2)
+        sim.script(('command', 0))
+        evr = EasyVR(open_loopback(sim))
+        evr.recognizeCommand(EasyVR.PASSWORD)
+        evr.waitResult()    # evr.getCommand() == 0
+
+    The module can be reached through an in-memory stream (:func:`open_loopback()`)
+    or through a Linux pseudo-terminal (:func:`open_pty()`), usable by any serial
+    port library.
+
+    """
+
+import os
+import fcntl
+import heapq
+import select
+import socket
+import termios
+import threading
+import time
+import tty
+from collections import deque
+
+from fortebit.easyvr.easyvr import EasyVR, _ARG_MIN, _ARG_MAX, _ARG_ZERO, \
+    _STS_MASK, _STS_COUNT, _STS_AWAKEN, _STS_DATA, _STS_ERROR, _STS_INVALID, \
+    _STS_TIMEOUT, _STS_LIPSYNC, _STS_INTERR, _STS_SUCCESS, _STS_RESULT, _STS_SIMILAR, \
+    _STS_OUT_OF_MEM, _STS_ID, _STS_PIN, _STS_TABLE_SX, _STS_GRAMMAR, _STS_TOKEN, \
+    _STS_MESSAGE, _STS_SERVICE
+
+
+_ACK = 0x20
+
+_BAUDRATES = {
+    EasyVR.B115200: 115200,
+    EasyVR.B57600: 57600,
+    EasyVR.B38400: 38400,
+    EasyVR.B19200: 19200,
+    EasyVR.B9600: 9600,
+}
+
+_MAX_COMMANDS = 32
+_TEMPLATE_SIZE = 256
+
+_BUILTIN_GRAMMARS = [
+    (EasyVR.GF_TRIGGER, ["ROBOT"]),
+    (0, ["ACTION", "MOVE", "TURN", "RUN", "LOOK", "ATTACK", "STOP", "HELLO"]),
+    (0, ["LEFT", "RIGHT", "UP", "DOWN", "FORWARD", "BACKWARD"]),
+    (0, ["ZERO", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "TEN"]),
+]
+
+
+def checksum(data):
+    """
+.. function:: checksum(data)
+
+    Computes the checksum that the simulator appends to the 256 bytes of an \
+    exported command (the last two bytes of the 258 bytes blob).
+    """
+    s = 0
+    for b in data[:_TEMPLATE_SIZE]:
+        s = (s + b) & 0xFFFF
+    return s
+
+
+def _template(label, training):
+    # deterministic pseudo template data for a trained command
+    data = bytearray(_TEMPLATE_SIZE)
+    data[0] = training
+    seed = 0x5A
+    for c in label:
+        seed = (seed * 31 + ord(c)) & 0xFF
+    for i in range(1, _TEMPLATE_SIZE):
+        seed = (seed * 73 + 41 + i) & 0xFF
+        data[i] = seed
+    return data
+
+
+def _garble(data):
+    # bytes sent at the wrong baudrate
+    return bytes([(b ^ 0xA5) | 0x80 for b in data])
+
+
+class _Invalid(Exception):
+    pass
+
+
+class SimCommand():
+    """
+.. class:: SimCommand
+
+    A custom command stored in the simulated module: *label*, *training* count (0-6), \
+    *conflict* flags (0x08 for a command, 0x10 for a built-in word), *similar* index \
+    and raw template *data* (256 bytes).
+    """
+
+    def __init__(self, label = "", training = 0):
+        self.label = label
+        self.training = training
+        self.conflict = 0
+        self.similar = 0
+        self.data = _template(label, training) if training > 0 else bytearray(_TEMPLATE_SIZE)
+
+    def export(self):
+        """
+.. method:: export()
+
+        :return: the 258 bytes blob returned by :meth:`easyvr.EasyVR.exportCommand()`
+        """
+        blob = bytearray(self.data)
+        s = checksum(blob)
+        blob.append(s >> 8)
+        blob.append(s & 0xFF)
+        return blob
+
+
+class EasyVRSimulator():
+    """
+.. class:: EasyVRSimulator
+
+    Protocol model of an EasyVR module, driven by a virtual clock in seconds: \
+    :meth:`receive()` feeds bytes sent by the host and :meth:`transmit()` returns the \
+    bytes due to the host. The transports returned by :func:`open_loopback()` and \
+    :func:`open_pty()` run it against real time.
+
+    Latencies (in seconds) can be passed as keyword arguments:
+
+        * ``reply`` processing time before each reply (plus the delay set with *setDelay*)
+        * ``cache`` time to cache a group (host bytes are held meanwhile)
+        * ``storage`` time to write command data (add, remove, label, erase, import)
+        * ``recognition`` time to produce a recognition result
+        * ``train`` time to complete training or verification
+        * ``play`` duration of a sound table entry or recorded message
+        * ``token`` time to send or detect a SonicNet token
+        * ``record`` duration of a message recording
+        * ``reset`` time to reset the memory
+    """
+
+    LATENCY = {
+        'reply': 0.0002,
+        'cache': 0.010,
+        'storage': 0.005,
+        'recognition': 0.2,
+        'train': 0.3,
+        'play': 0.3,
+        'token': 0.1,
+        'record': 0.5,
+        'reset': 0.5,
+    }
+
+    def __init__(self, id = EasyVR.EASYVR3PLUS, baudrate = 9600, **latency):
+        self.id = id
+        self.baudrate = baudrate
+        self.latency = dict(EasyVRSimulator.LATENCY)
+        for k in latency:
+            if k not in self.latency:
+                raise ValueError("unknown latency: %s" % k)
+            self.latency[k] = latency[k]
+        self.groups = [[] for g in range(EasyVR.PASSWORD + 1)]
+        self.grammars = [(f, list(w)) for (f, w) in _BUILTIN_GRAMMARS]
+        self.soundTable = ("SND_TABLE", 8)
+        self.messages = [(EasyVR.MSG_EMPTY, 0) for i in range(32)]
+        self.pins = {}
+        self.settings = {}
+        self.log = []
+        self._script = deque()
+        self._group = -1
+        self._delay = 0
+        self._sleeping = False
+        self._task = None
+        self._lipsync = None
+        self._args = deque()
+        self._t = 0.0
+        self._held = 0.0
+        self._txfree = 0.0
+        self._rx = deque()
+        self._tx = deque()
+        self._timers = []
+        self._seq = 0
+        self._parser = self._session()
+        next(self._parser)
+
+    # configuration
+
+    def addCommand(self, group, index, label, training = 0):
+        """
+.. method:: addCommand(group, index, label, training)
+
+        Preloads a custom command.
+
+        :return: the :class:`SimCommand` object
+        """
+        cmd = SimCommand(label.upper(), training)
+        self.groups[group].insert(index, cmd)
+        return cmd
+
+    def addGrammar(self, words, flags = 0):
+        """
+.. method:: addGrammar(words, flags)
+
+        Adds a custom grammar with the given list of words.
+
+        :return: the index of the grammar
+        """
+        self.grammars.append((flags, [w.upper() for w in words]))
+        return len(self.grammars) - 1
+
+    def script(self, *results):
+        """
+.. method:: script(*results)
+
+        Queues the outcome of the next recognition, training, verification or \
+        token detection tasks, one per task, as tuples of the form \
+        ``(kind, value, delay)`` (*value* and *delay* are optional):
+
+            * ``('command', index)`` recognised custom command (or training similar to it)
+            * ``('word', index)`` recognised built-in word (or training similar to it)
+            * ``('token', index)`` received SonicNet token
+            * ``('timeout',)`` nothing heard before the timeout
+            * ``('error', code)`` error code (see ErrorCode)
+            * ``('success',)`` task completed with no errors
+
+        *delay* overrides the task latency. Without a scripted outcome recognition \
+        and token detection time out, training and verification succeed.
+        """
+        for r in results:
+            self._script.append(r)
+
+    # clock driven interface
+
+    def byteTime(self):
+        """
+.. method:: byteTime()
+
+        :return: the time to transfer one byte at the current baudrate (10 bits)
+        """
+        return 10.0 / self.baudrate
+
+    def receive(self, data, now, baudrate = None):
+        """
+.. method:: receive(data, now, baudrate)
+
+        Feeds bytes written by the host at time *now*. Bytes sent at a *baudrate* \
+        different from the module one are garbled.
+        """
+        if baudrate is not None and baudrate != self.baudrate:
+            data = _garble(data)
+        t = now
+        if self._rx and self._rx[-1][0] > t:
+            t = self._rx[-1][0]
+        bt = self.byteTime()
+        for b in data:
+            t += bt
+            self._rx.append((t, b))
+        self._advance(now)
+
+    def transmit(self, now, baudrate = None):
+        """
+.. method:: transmit(now, baudrate)
+
+        :return: the bytes due to the host up to time *now*, garbled if the host \
+        *baudrate* differs from the one they were sent with
+        """
+        self._advance(now)
+        out = bytearray()
+        while self._tx and self._tx[0][0] <= now:
+            (t, b, baud) = self._tx.popleft()
+            if baudrate is not None and baudrate != baud:
+                b = _garble((b,))[0]
+            out.append(b)
+        return bytes(out)
+
+    def nextEvent(self):
+        """
+.. method:: nextEvent()
+
+        :return: the time of the next scheduled event, *None* if idle
+        """
+        t = None
+        if self._rx:
+            t = max(self._rx[0][0], self._held)
+        if self._timers and (t is None or self._timers[0][0] < t):
+            t = self._timers[0][0]
+        if self._tx and (t is None or self._tx[0][0] < t):
+            t = self._tx[0][0]
+        return t
+
+    def _advance(self, now):
+        while True:
+            tr = None
+            if self._rx:
+                tr = max(self._rx[0][0], self._held)
+            tt = self._timers[0][0] if self._timers else None
+            if tt is not None and tt <= now and (tr is None or tt <= tr):
+                due, seq, fn = heapq.heappop(self._timers)
+                self._t = due
+                fn()
+                continue
+            if tr is not None and tr <= now:
+                b = self._rx.popleft()[1]
+                self._t = tr
+                self._byte(b)
+                continue
+            break
+
+    # output
+
+    def _emit(self, data, delay = None):
+        t = self._t + (self.latency['reply'] + self._delay * 0.001 if delay is None else delay)
+        if t < self._txfree:
+            t = self._txfree
+        bt = self.byteTime()
+        for b in data:
+            t += bt
+            self._tx.append((t, b, self.baudrate))
+        self._txfree = t
+
+    def _reply(self, status, args = ()):
+        self._args = deque(a + _ARG_ZERO for a in args)
+        self._emit(status)
+
+    def _replyRaw(self, status, raw):
+        # arguments already encoded (labels)
+        self._args = deque(raw)
+        self._emit(status)
+
+    def _after(self, delay, fn):
+        self._seq += 1
+        heapq.heappush(self._timers, (self._t + delay, self._seq, fn))
+        return self._seq
+
+    def _cancel(self, seq):
+        self._timers = [e for e in self._timers if e[1] != seq]
+        heapq.heapify(self._timers)
+
+    # input
+
+    def _byte(self, b):
+        self.log.append(b)
+        if self._sleeping:
+            self._sleeping = False
+            self._reply(_STS_AWAKEN)
+            return
+        if self._task is not None:
+            # busy: only a break is accepted
+            if b == ord('b'):
+                self._cancel(self._task)
+                self._task = None
+                self._reply(_STS_INTERR)
+            return
+        if self._lipsync is not None:
+            if b == _ACK:
+                self._lipsyncNext()
+                return
+            if b == ord('b'):
+                self._lipsync = None
+                self._reply(_STS_INTERR)
+                return
+        if b == _ACK and self._args:
+            self._emit(bytes([self._args.popleft()]), 0)
+            return
+        self._args.clear()
+        try:
+            self._parser.send(b)
+        except _Invalid:
+            self._parser = self._session()
+            next(self._parser)
+            self._reply(_STS_INVALID)
+
+    def _arg(self):
+        b = yield
+        if b < _ARG_MIN or b > _ARG_MAX:
+            raise _Invalid
+        return b - _ARG_ZERO
+
+    def _groupArg(self):
+        g = yield from self._arg()
+        self._useGroup(g)
+        return g
+
+    def _useGroup(self, g):
+        if g < 0 or g > EasyVR.PASSWORD:
+            raise _Invalid
+        if g != self._group:
+            self._group = g
+            # input is held while the group is cached
+            self._held = self._t + self.latency['cache']
+
+    def _session(self):
+        while True:
+            c = yield
+            handler = None
+            if c == ord('~'):
+                handler = self._cmd_service
+            elif ord('a') <= c <= ord('z'):
+                handler = getattr(self, '_cmd_' + chr(c), None)
+            if handler is None:
+                raise _Invalid
+            yield from handler()
+
+    # tasks
+
+    def _start(self, delay, fn):
+        def done():
+            self._task = None
+            fn()
+        self._task = self._after(delay, done)
+
+    def _scripted(self, default):
+        if self._script:
+            r = self._script.popleft()
+        else:
+            r = default
+        kind = r[0]
+        value = r[1] if len(r) > 1 else None
+        delay = r[2] if len(r) > 2 else None
+        return kind, value, delay
+
+    def _replyResult(self, kind, value):
+        if kind == 'command':
+            self._reply(_STS_RESULT, (value,))
+        elif kind == 'word':
+            self._reply(_STS_SIMILAR, (value,))
+        elif kind == 'token':
+            self._reply(_STS_TOKEN, ((value >> 5) & 0x1F, value & 0x1F))
+        elif kind == 'timeout':
+            self._reply(_STS_TIMEOUT)
+        elif kind == 'error':
+            self._reply(_STS_ERROR, ((value >> 4) & 0x0F, value & 0x0F))
+        else:
+            self._reply(_STS_SUCCESS)
+
+    def _recognize(self, default = ('timeout',), latency = 'recognition', before = None):
+        kind, value, delay = self._scripted(default)
+        if delay is None:
+            delay = self.latency[latency]
+        def done():
+            if before is not None:
+                before(kind, value)
+            self._replyResult(kind, value)
+        self._start(delay, done)
+
+    def _store(self, status = _STS_SUCCESS, args = ()):
+        self._emit_after(self.latency['storage'], status, args)
+
+    def _emit_after(self, delay, status, args = ()):
+        saved = self._t
+        self._t += delay
+        self._reply(status, args)
+        self._t = saved
+
+    def _lipsyncNext(self):
+        until, n = self._lipsync
+        if self._t >= until:
+            self._lipsync = None
+            self._reply(_STS_SUCCESS)
+            return
+        self._lipsync = (until, n + 1)
+        self._emit(bytes([(n * 7) % 32 + _ARG_ZERO]), 0)
+
+    def _command(self, g, i):
+        cmds = self.groups[g]
+        if i < 0 or i >= len(cmds):
+            raise _Invalid
+        return cmds[i]
+
+    # label encoding
+
+    def _encodeLabel(self, label):
+        raw = []
+        for c in label:
+            if '0' <= c <= '9':
+                raw.append(ord('^'))
+                raw.append(ord(c) - ord('0') + _ARG_ZERO)
+            elif 'A' <= c <= 'Z':
+                raw.append(ord(c))
+            else:
+                raw.append(ord('_'))
+        return raw[:32]
+
+    def _countArg(self, n):
+        return -1 if n == 32 else n
+
+    # protocol commands (one generator per command letter)
+
+    def _cmd_b(self):
+        self._reply(_STS_SUCCESS)
+        return
+        yield
+
+    def _cmd_s(self):
+        mode = yield from self._arg()
+        self.settings['sleep'] = mode
+        self._reply(_STS_SUCCESS)
+        self._sleeping = True
+
+    def _cmd_k(self):
+        a = yield from self._arg()
+        if a == -1:
+            self.settings['distance'] = yield from self._arg()
+        else:
+            self.settings['knob'] = a
+        self._reply(_STS_SUCCESS)
+
+    def _cmd_v(self):
+        a = yield from self._arg()
+        if a == -1:
+            flags = yield from self._arg()
+            if flags == 0:
+                self._reply(_STS_SUCCESS)
+            else:
+                self._emit_after(self.latency['reset'], _STS_SUCCESS)
+        else:
+            self.settings['level'] = a
+            self._reply(_STS_SUCCESS)
+
+    def _cmd_l(self):
+        a = yield from self._arg()
+        if a == -1:
+            args = []
+            for i in range(4):
+                x = yield from self._arg()
+                args.append(x)
+            timeout = (args[2] << 4) | args[3]
+            self._lipsync = (self._t + (timeout if timeout > 0 else 2), 0)
+            self._reply(_STS_LIPSYNC)
+        else:
+            self.settings['language'] = a
+            self._reply(_STS_SUCCESS)
+
+    def _cmd_o(self):
+        self.settings['timeout'] = yield from self._arg()
+        self._reply(_STS_SUCCESS)
+
+    def _cmd_i(self):
+        ws = yield from self._arg()
+        if ws < 0 or ws >= len(self.grammars):
+            self._reply(_STS_INVALID)
+            return
+        self._recognize()
+
+    def _cmd_t(self):
+        a = yield from self._arg()
+        if a == -1:
+            self.settings['trailing'] = yield from self._arg()
+            self._reply(_STS_SUCCESS)
+            return
+        self._useGroup(a)
+        i = yield from self._arg()
+        cmd = self._command(a, i)
+        def trained(kind, value):
+            if kind in ('success', 'command', 'word'):
+                cmd.training = min(cmd.training + 1, 6)
+                cmd.data = _template(cmd.label, cmd.training)
+                cmd.conflict = 0x08 if kind == 'command' else 0x10 if kind == 'word' else 0
+                cmd.similar = value or 0
+        self._recognize(('success',), 'train', trained)
+
+    def _cmd_g(self):
+        g = yield from self._groupArg()
+        i = yield from self._arg()
+        cmds = self.groups[g]
+        if len(cmds) >= _MAX_COMMANDS:
+            self._store(_STS_OUT_OF_MEM)
+            return
+        cmds.insert(min(max(i, 0), len(cmds)), SimCommand())
+        self._store()
+
+    def _cmd_u(self):
+        g = yield from self._groupArg()
+        i = yield from self._arg()
+        self._command(g, i)
+        del self.groups[g][i]
+        self._store()
+
+    def _cmd_d(self):
+        a = yield from self._arg()
+        if a == -1:
+            i = yield from self._arg()
+            (kind, length) = self.messages[i]
+            if kind == EasyVR.MSG_EMPTY:
+                self._reply(_STS_MESSAGE, (0,))
+                return
+            args = [kind]
+            for k in range(3):
+                b = (length >> (k * 8)) & 0xFF
+                args.append(b & 0x0F)
+                args.append(b >> 4)
+            self._reply(_STS_MESSAGE, args)
+            return
+        if a < 0 or a > EasyVR.PASSWORD:
+            raise _Invalid
+        self._recognize()
+
+    def _cmd_e(self):
+        a = yield from self._arg()
+        if a == -1:
+            i = yield from self._arg()
+            self.messages[i] = (EasyVR.MSG_EMPTY, 0)
+            self._start(self.latency['storage'], lambda: self._reply(_STS_SUCCESS))
+            return
+        self._useGroup(a)
+        i = yield from self._arg()
+        cmd = self._command(a, i)
+        cmd.training = 0
+        cmd.conflict = 0
+        cmd.data = bytearray(_TEMPLATE_SIZE)
+        self._store()
+
+    def _cmd_n(self):
+        g = yield from self._groupArg()
+        i = yield from self._arg()
+        length = yield from self._arg()
+        label = ''
+        k = 0
+        while k < length:
+            b = yield
+            k += 1
+            if b == ord('^'):
+                d = yield from self._arg()
+                k += 1
+                label += chr(ord('0') + d)
+            else:
+                label += chr(b)
+        self._command(g, i).label = label
+        self._store()
+
+    def _cmd_c(self):
+        g = yield from self._arg()
+        if g < 0 or g > EasyVR.PASSWORD:
+            raise _Invalid
+        self._reply(_STS_COUNT, (self._countArg(len(self.groups[g])),))
+
+    def _cmd_p(self):
+        a = yield from self._arg()
+        if a == -1:
+            i = yield from self._arg()
+            yield from self._arg() # speed and attenuation flags, no effect on timing
+            if self.messages[i][0] == EasyVR.MSG_EMPTY:
+                self._reply(_STS_ERROR, (EasyVR.ERR_RP_NO_MSG >> 4, EasyVR.ERR_RP_NO_MSG & 0x0F))
+                return
+            self._start(self.latency['play'], lambda: self._reply(_STS_SUCCESS))
+            return
+        self._useGroup(a)
+        i = yield from self._arg()
+        cmd = self._command(a, i)
+        raw = self._encodeLabel(cmd.label)
+        args = [(cmd.training | cmd.conflict) + _ARG_ZERO, cmd.similar + _ARG_ZERO,
+                self._countArg(len(raw)) + _ARG_ZERO]
+        self._replyRaw(_STS_DATA, args + raw)
+
+    def _cmd_m(self):
+        mask = 0
+        for g in range(len(self.groups)):
+            if self.groups[g]:
+                mask |= 1 << g
+        args = []
+        for k in range(4):
+            b = (mask >> (k * 8)) & 0xFF
+            args.append(b & 0x0F)
+            args.append(b >> 4)
+        self._reply(_STS_MASK, args)
+        return
+        yield
+
+    def _cmd_r(self):
+        a = yield from self._arg()
+        if a == -1:
+            i = yield from self._arg()
+            bits = yield from self._arg()
+            timeout = yield from self._arg()
+            # the message ends at the timeout (in seconds, 0 for none) if earlier
+            length = self.latency['record']
+            if timeout > 0 and timeout < length:
+                length = timeout
+            def recorded():
+                self.messages[i] = (bits, 8000 * int(length + 1))
+                self._reply(_STS_SUCCESS)
+            self._start(length, recorded)
+            return
+        what = chr(a + _ARG_ZERO)
+        def reset():
+            if what in 'RD':
+                self.groups = [[] for g in range(EasyVR.PASSWORD + 1)]
+            if what in 'RM':
+                self.messages = [(EasyVR.MSG_EMPTY, 0) for i in range(32)]
+            self._reply(_STS_SUCCESS)
+        if what not in 'RDM':
+            raise _Invalid
+        self._start(self.latency['reset'], reset)
+
+    def _cmd_x(self):
+        self._reply(_STS_ID, (self.id,))
+        return
+        yield
+
+    def _cmd_y(self):
+        d = yield from self._arg()
+        if d <= 10:
+            self._delay = d
+        elif d <= 19:
+            self._delay = (d - 9) * 10
+        else:
+            self._delay = (d - 18) * 100
+        self._reply(_STS_SUCCESS)
+
+    def _cmd_a(self):
+        b = yield from self._arg()
+        if b not in _BAUDRATES:
+            raise _Invalid
+        self._reply(_STS_SUCCESS)
+        self.baudrate = _BAUDRATES[b]
+
+    def _cmd_q(self):
+        pin = yield from self._arg()
+        config = yield from self._arg()
+        if config in (EasyVR.OUTPUT_LOW, EasyVR.OUTPUT_HIGH):
+            self.pins[pin] = config
+            self._reply(_STS_SUCCESS)
+        else:
+            self._reply(_STS_PIN, (self.pins.get(pin, 1),))
+
+    def _cmd_w(self):
+        a = yield from self._arg()
+        if a == -1:
+            tone = yield from self._arg()
+            duration = (yield from self._arg()) + 1
+            t = duration if tone < 0 else duration * 0.040
+            self._emit_after(t, _STS_SUCCESS)
+            return
+        lo = yield from self._arg()
+        yield from self._arg() # volume, no effect on timing
+        index = (a << 5) | lo
+        if index > self.soundTable[1]:
+            self._reply(_STS_ERROR, (EasyVR.ERR_SYNTH_BAD_MSG >> 4, EasyVR.ERR_SYNTH_BAD_MSG & 0x0F))
+            return
+        self._start(self.latency['play'], lambda: self._reply(_STS_SUCCESS))
+
+    def _cmd_h(self):
+        (name, count) = self.soundTable
+        raw = self._encodeLabel(name)
+        args = [((count >> 5) & 0x1F) + _ARG_ZERO, (count & 0x1F) + _ARG_ZERO, len(raw) + _ARG_ZERO]
+        self._replyRaw(_STS_TABLE_SX, args + raw)
+        return
+        yield
+
+    def _cmd_z(self):
+        a = yield from self._arg()
+        if a == -1:
+            self._reply(_STS_COUNT, (self._countArg(len(self.grammars)),))
+            return
+        if a < 0 or a >= len(self.grammars):
+            self._reply(_STS_INVALID)
+            return
+        (flags, words) = self.grammars[a]
+        raw = [flags + _ARG_ZERO, len(words) + _ARG_ZERO]
+        for w in words:
+            label = self._encodeLabel(w)
+            raw.append(len(label) + _ARG_ZERO)
+            raw.extend(label)
+        self._replyRaw(_STS_GRAMMAR, raw)
+
+    def _cmd_j(self):
+        args = []
+        for i in range(5):
+            x = yield from self._arg()
+            args.append(x)
+        if args[3] == 0 and args[4] == 0:
+            self._emit_after(self.latency['token'], _STS_SUCCESS)
+        else:
+            self._reply(_STS_SUCCESS)
+
+    def _cmd_f(self):
+        a = yield from self._arg()
+        if a == -1:
+            self.settings['fast'] = yield from self._arg()
+            self._reply(_STS_SUCCESS)
+            return
+        for i in range(3):
+            yield from self._arg()
+        self._recognize(('timeout',), 'token')
+
+    def _cmd_service(self):
+        svc = chr((yield from self._arg()) + _ARG_ZERO)
+        g = yield from self._groupArg()
+        i = yield from self._arg()
+        if svc == 'X':
+            cmd = self._command(g, i)
+            args = [ord('D')]
+            for b in cmd.export():
+                args.append((b >> 4) + _ARG_ZERO)
+                args.append((b & 0x0F) + _ARG_ZERO)
+            self._emit_after(self.latency['storage'], _STS_SERVICE)
+            self._args = deque(args)
+        elif svc == 'I':
+            blob = bytearray(258)
+            for k in range(258):
+                hi = yield from self._arg()
+                lo = yield from self._arg()
+                blob[k] = ((hi << 4) & 0xF0) | (lo & 0x0F)
+            cmd = self._command(g, i)
+            cmd.data = blob[:_TEMPLATE_SIZE]
+            cmd.training = blob[0] & 0x07
+            cmd.conflict = 0
+            self._store()
+        elif svc == 'V':
+            self._command(g, i)
+            self._recognize(('success',), 'train')
+        else:
+            raise _Invalid
+
+
+
+# transports
+
+
+class _Link(threading.Thread):
+    # runs a simulator against real time on a file descriptor
+
+    def __init__(self, sim, fd, hostBaudrate = None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.sim = sim
+        self.fd = fd
+        self.hostBaudrate = hostBaudrate
+        self.lock = threading.Lock()
+        self.running = True
+
+    def _baudrate(self):
+        return None if self.hostBaudrate is None else self.hostBaudrate()
+
+    def run(self):
+        t0 = time.monotonic()
+        while self.running:
+            with self.lock:
+                t = self.sim.nextEvent()
+            timeout = 0.05 if t is None else max(0.0, t - (time.monotonic() - t0))
+            try:
+                r = select.select((self.fd,), (), (), min(timeout, 0.05))[0]
+            except (OSError, ValueError):
+                return
+            now = time.monotonic() - t0
+            if r:
+                try:
+                    data = os.read(self.fd, 4096)
+                except OSError:
+                    return
+                if not data:
+                    return
+                with self.lock:
+                    self.sim.receive(data, now, self._baudrate())
+            with self.lock:
+                out = self.sim.transmit(now, self._baudrate())
+            if out:
+                try:
+                    os.write(self.fd, out)
+                except OSError:
+                    return
+
+    def stop(self):
+        self.running = False
+
+
+class FdStream():
+    """
+.. class:: FdStream
+
+    Host side of a simulated link, with the subset of the *pyserial* interface \
+    used by the :mod:`easyvr` library (``write()``, ``read()``, ``in_waiting``, \
+    ``fileno()``, ``baudrate``, ``close()``). It also counts the traffic: \
+    ``bytesWritten``, ``bytesRead``, ``writes`` and ``reads``.
+    """
+
+    def __init__(self, fd, baudrate = 9600, link = None):
+        self._fd = fd
+        self._link = link
+        self.baudrate = baudrate
+        self.timeout = None
+        self.resetCounters()
+
+    def resetCounters(self):
+        """
+.. method:: resetCounters()
+
+        Clears the traffic counters.
+        """
+        self.bytesWritten = 0
+        self.bytesRead = 0
+        self.writes = 0
+        self.reads = 0
+
+    def fileno(self):
+        return self._fd
+
+    @property
+    def in_waiting(self):
+        buf = bytearray(4)
+        fcntl.ioctl(self._fd, termios.FIONREAD, buf)
+        return int.from_bytes(buf, 'little')
+
+    def write(self, data):
+        data = bytes(data)
+        self.writes += 1
+        self.bytesWritten += len(data)
+        view = memoryview(data)
+        while view:
+            n = os.write(self._fd, view)
+            view = view[n:]
+        return len(data)
+
+    def read(self, size = 1):
+        out = bytearray()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while len(out) < size:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not select.select((self._fd,), (), (), wait)[0]:
+                break
+            data = os.read(self._fd, size - len(out))
+            if not data:
+                break
+            out.extend(data)
+        self.reads += 1
+        self.bytesRead += len(out)
+        return bytes(out)
+
+    def close(self):
+        if self._link is not None:
+            self._link.stop()
+        os.close(self._fd)
+
+
+def open_loopback(sim, baudrate = None):
+    """
+.. function:: open_loopback(sim, baudrate)
+
+    Connects a simulator to an in-memory stream (a socket pair served by a \
+    background thread).
+
+    :param sim: the :class:`EasyVRSimulator` object
+    :param baudrate: the host side baudrate (defaults to the simulator one), \
+    when it differs from the module baudrate all the bytes are garbled
+
+    :return: a :class:`FdStream` object to pass to :class:`easyvr.EasyVR`
+    """
+    host, module = socket.socketpair()
+    hfd = host.detach()
+    mfd = module.detach()
+    stream = FdStream(hfd, sim.baudrate if baudrate is None else baudrate)
+    link = _Link(sim, mfd, lambda: stream.baudrate)
+    stream._link = link
+    link.start()
+    return stream
+
+
+def open_socket(sim):
+    """
+.. function:: open_socket(sim)
+
+    Connects a simulator to a socket, for clients that need a real socket \
+    (such as :func:`aio.open_socket()`).
+
+    :return: the host side *socket* object
+    """
+    host, module = socket.socketpair()
+    _Link(sim, module.detach()).start()
+    return host
+
+
+def open_pty(sim):
+    """
+.. function:: open_pty(sim)
+
+    Connects a simulator to a Linux pseudo-terminal.
+
+    :param sim: the :class:`EasyVRSimulator` object
+
+    :return: a tuple (**path**, **stop**) with the path of the terminal device, \
+    to open with any serial library (or with :func:`open_device()`), and a \
+    function that stops the simulator
+    """
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    link = _Link(sim, master)
+    link.start()
+    def stop():
+        link.stop()
+        os.close(slave)
+    return path, stop
+
+
+def open_device(path, baudrate = 9600):
+    """
+.. function:: open_device(path, baudrate)
+
+    Opens a terminal device in raw mode without external libraries.
+
+    :return: a :class:`FdStream` object
+    """
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    return FdStream(fd, baudrate)
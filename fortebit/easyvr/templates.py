@@ -0,0 +1,866 @@
+"""
+.. module:: templates
+
+****************
+EasyVR Templates
+****************
+
+    Supports more voice users than the module can store.
+
+    A group holds at most 32 custom commands, so the voice passwords of all the
+    users are kept on the host, as the raw data returned by
+    :meth:`easyvr.EasyVR.exportCommand()`, in a :class:`TemplateLibrary`. A
+    :class:`TemplateCache` uses the slots of the password group as a cache of that
+    library: :meth:`TemplateCache.load()` returns the slot holding the template of a
+    user, importing it first (in place of the least recently used one) only if it
+    is not already resident::
+
+        library = TemplateLibrary()
+        library.loadFile("users.evt")
+        users = TemplateCache(evr, library)
+
+        # when the user enters the PIN
+        slot = users.load(pin)
+        evr.recognizeCommand(EasyVR.PASSWORD)
+        ...
+        if evr.getCommand() == slot:
+            # access granted
+
+    Each slot is labeled with its user, so residency survives reboots. Labels are
+    written only after the imported template has been verified.
+
+    For large numbers of users a :class:`TemplateArchive` keeps the templates in a
+    file of fixed-size records instead of memory: a lookup reads (or maps) a single
+    record, that is passed to :meth:`easyvr.EasyVR.importCommand()` as it is.
+
+    A :class:`TemplateSync` provisions whole groups from a desired state instead,
+    writing only the commands that differ::
+
+        sync = TemplateSync(evr)
+        sync.setArchive(archive)
+        sync.apply()
+        evr.saveInventoryFile("inventory.evi") # keeps the checksums for the next sync
+
+    """
+
+from fortebit.easyvr.easyvr import EasyVR, _packLabel, _unpackLabel
+
+try:
+    import mmap
+except:
+    mmap = None
+
+
+# template library file header (see TemplateLibrary.save)
+_LIB_MAGIC      = b'EVT1'
+_TEMPLATE_SIZE  = 258
+
+# template archive layout (see TemplateArchive)
+_ARC_MAGIC      = b'EVA1'
+_ARC_HEADER     = 16
+_REC_KEY        = 36    # flags, group, index, label (length and 31 characters), padding
+_REC_SIZE       = _REC_KEY + _TEMPLATE_SIZE + 2
+_REC_LIVE       = 0x01
+
+# time allowed to verify an imported template (ms)
+_VERIFY_TIMEOUT = 5000
+
+
+def _label(user):
+    # the user label as stored by EasyVR.setCommandLabel (digits count as two)
+    label = ''
+    length = 0
+    for c in str(user).upper():
+        length += 2 if c >= '0' and c <= '9' else 1
+        if length > 31:
+            break
+        if not (c >= '0' and c <= '9') and not (c >= 'A' and c <= 'Z'):
+            c = '_'
+        label += c
+    return label
+
+def _checksum(data):
+    # as reported by the module at the end of the exported data
+    return (data[256] << 8) | data[257]
+
+def _import(evr, group, index, data):
+    evr.importCommand(group, index, data)
+    evr.verifyCommand(group, index)
+    if not evr.waitResult(_VERIFY_TIMEOUT):
+        evr.stop()
+        raise TimeoutError
+    if evr.isInvalid() or evr.getError() >= 0:
+        # rejected template, the command is left untrained
+        evr.eraseCommand(group, index)
+        raise ValueError
+
+
+class TemplateLibrary():
+    """
+.. class:: TemplateLibrary
+
+    The voice templates of all the users, kept in memory and indexed by user \
+    name (see :meth:`easyvr.EasyVR.exportCommand()`).
+    """
+
+    def __init__(self):
+        self._templates = {}
+
+    def get(self, user):
+        """
+.. method:: get(user)
+
+        :param user: the user name (see :meth:`TemplateCache.load()`)
+
+        :return: the 258 bytes template of the user, or *None*
+        """
+        return self._templates.get(_label(user))
+
+    def put(self, user, data, group = EasyVR.PASSWORD, index = -1):
+        """
+.. method:: put(user, data, group, index)
+
+        Adds or replaces the template of a user.
+
+        :param user: the user name
+        :param data: an array of 258 bytes, as returned by :meth:`easyvr.EasyVR.exportCommand()`
+        :param group: the group the template was exported from (only kept by \
+        :class:`TemplateArchive`)
+        :param index: the index the template was exported from, or (-1)
+        """
+        if len(data) != _TEMPLATE_SIZE:
+            raise ValueError
+        self._templates[_label(user)] = bytes(data)
+
+    def remove(self, user):
+        """
+.. method:: remove(user)
+
+        Removes the template of a user.
+
+        :param user: the user name
+
+        :return: *True* if the user was in the library
+        """
+        return self._templates.pop(_label(user), None) is not None
+
+    def users(self):
+        """
+.. method:: users()
+
+        :return: the list of user labels in the library
+        """
+        return list(self._templates)
+
+    def save(self):
+        """
+.. method:: save()
+
+        Serializes the library.
+
+        :return: a bytearray to be restored with :meth:`load()`
+        """
+        buf = bytearray(_LIB_MAGIC)
+        for label in self._templates:
+            _packLabel(buf, label)
+            buf.extend(self._templates[label])
+        return buf
+
+    def load(self, data):
+        """
+.. method:: load(data)
+
+        Replaces the library with one returned by :meth:`save()`.
+
+        :param data: the serialized library
+
+        :return: *True* if the data is valid
+        """
+        if data[:4] != _LIB_MAGIC:
+            return False
+        templates = {}
+        pos = 4
+        try:
+            while pos < len(data):
+                (label, pos) = _unpackLabel(data, pos)
+                end = pos + _TEMPLATE_SIZE
+                if end > len(data):
+                    return False
+                templates[label] = bytes(data[pos:end])
+                pos = end
+        except IndexError:
+            return False
+        self._templates = templates
+        return True
+
+    def saveFile(self, path):
+        """
+.. method:: saveFile(path)
+
+        Writes the library to a file (see :meth:`save()`).
+
+        :param path: the file name
+        """
+        data = self.save()
+        f = open(path, "wb")
+        try:
+            f.write(data)
+        finally:
+            f.close()
+
+    def loadFile(self, path):
+        """
+.. method:: loadFile(path)
+
+        Reads the library from a file written by :meth:`saveFile()`.
+
+        :param path: the file name
+
+        :return: *True* if the library has been loaded, *False* if the file is \
+        missing or invalid
+        """
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return False
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        return self.load(data)
+
+
+class TemplateArchive():
+    """
+.. class:: TemplateArchive
+
+    A file of voice templates, with the same interface as :class:`TemplateLibrary`.
+
+    The file starts with a 16 bytes header (``EVA1``, the record size and the \
+    number of records) followed by fixed-size records, each one with a key \
+    (group, index and label of the exported command) and the 258 bytes of the \
+    template. Only the keys are read when the archive is opened; templates are \
+    read one at a time, or mapped in memory where *mmap* is available (so \
+    :meth:`get()` returns a read-only view of the file, without copies).
+
+    New templates are appended; replaced or removed ones are only marked as \
+    deleted until :meth:`compact()` is called.
+
+    :param path: the file name, created if missing
+    """
+
+    def __init__(self, path):
+        self._map = None
+        try:
+            self._f = open(path, "r+b")
+        except OSError:
+            self._f = open(path, "w+b")
+            self._f.write(self._header(0))
+            self._f.flush()
+        self._scan()
+
+    def _header(self, count):
+        buf = bytearray(_ARC_MAGIC)
+        buf.append(_REC_SIZE & 0xFF)
+        buf.append(_REC_SIZE >> 8)
+        buf.append(0)
+        buf.append(0)
+        for i in range(4):
+            buf.append((count >> (i * 8)) & 0xFF)
+        while len(buf) < _ARC_HEADER:
+            buf.append(0)
+        return buf
+
+    def _scan(self):
+        f = self._f
+        f.seek(0)
+        head = f.read(_ARC_HEADER)
+        if len(head) < _ARC_HEADER or head[:4] != _ARC_MAGIC or head[4] | (head[5] << 8) != _REC_SIZE:
+            raise ValueError
+        count = 0
+        for i in range(4):
+            count |= head[8 + i] << (i * 8)
+        self._count = count
+        self._keys = {}
+        self._labels = {}
+        for n in range(count):
+            f.seek(_ARC_HEADER + n * _REC_SIZE)
+            rec = f.read(_REC_KEY)
+            if len(rec) < _REC_KEY:
+                # truncated by an interrupted append
+                self._count = n
+                break
+            if rec[0] & _REC_LIVE:
+                self._index(rec, n)
+
+    def _index(self, rec, n):
+        (label, pos) = _unpackLabel(rec, 3)
+        index = rec[2] if rec[2] != 0xFF else -1
+        self._keys[(rec[1], index, label)] = n
+        self._labels[label] = n
+
+    def _unmap(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass # views still in use, released with them
+            self._map = None
+
+    def _read(self, n):
+        pos = _ARC_HEADER + n * _REC_SIZE + _REC_KEY
+        if mmap is not None:
+            if self._map is None:
+                self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self._map)[pos:pos + _TEMPLATE_SIZE]
+        self._f.seek(pos)
+        return self._f.read(_TEMPLATE_SIZE)
+
+    def _kill(self, n):
+        self._f.seek(_ARC_HEADER + n * _REC_SIZE)
+        self._f.write(b'\x00')
+
+    def _forget(self, key):
+        # drops a key from the index, the label falls back to its other records
+        n = self._keys.pop(key)
+        label = key[2]
+        if self._labels.get(label) == n:
+            del self._labels[label]
+            for k in self._keys:
+                if k[2] == label and self._keys[k] > self._labels.get(label, -1):
+                    self._labels[label] = self._keys[k]
+        return n
+
+    def keys(self, group = None, index = None, label = None):
+        """
+.. method:: keys(group, index, label)
+
+        Lists the templates in the archive, optionally filtered.
+
+        :param group: the group to match, or *None* for any
+        :param index: the index to match, or *None* for any
+        :param label: the label to match, or *None* for any
+
+        :return: a list of (**group**, **index**, **label**) tuples
+        """
+        if label is not None:
+            label = _label(label)
+        found = []
+        for key in self._keys:
+            if (group is None or key[0] == group) and (index is None or key[1] == index) \
+                    and (label is None or key[2] == label):
+                found.append(key)
+        return found
+
+    def lookup(self, group, index, label):
+        """
+.. method:: lookup(group, index, label)
+
+        :return: the template stored with the given key (see :meth:`get()`), or *None*
+        """
+        n = self._keys.get((group, index, _label(label)))
+        if n is None:
+            return None
+        return self._read(n)
+
+    def getGroups(self, group = None):
+        """
+.. method:: getGroups(group)
+
+        Collects the commands of the groups found in the archive, from the \
+        position each template was exported from (templates stored without an \
+        index are skipped), as expected by :meth:`TemplateSync.setGroup()`.
+
+        :param group: the only group to take, or *None* for all
+
+        :return: a dictionary of lists of (**label**, **data**) tuples, by group, \
+        with copies of the templates (still valid after the archive is closed)
+        """
+        groups = {}
+        for (g, index, label) in self.keys(group):
+            if index < 0:
+                continue
+            if g not in groups:
+                groups[g] = {}
+            if index in groups[g]:
+                raise ValueError # two templates for the same command
+            groups[g][index] = (label, bytes(self.lookup(g, index, label)))
+        for g in groups:
+            commands = []
+            for index in range(len(groups[g])):
+                if index not in groups[g]:
+                    raise ValueError # groups have no holes
+                commands.append(groups[g][index])
+            groups[g] = commands
+        return groups
+
+    def get(self, user):
+        """
+.. method:: get(user)
+
+        :param user: the user name (label)
+
+        :return: the latest template stored for the user, as a read-only buffer \
+        of 258 bytes valid until the archive is changed, or *None*
+        """
+        n = self._labels.get(_label(user))
+        if n is None:
+            return None
+        return self._read(n)
+
+    def put(self, user, data, group = EasyVR.PASSWORD, index = -1):
+        """
+.. method:: put(user, data, group, index)
+
+        Appends a template, replacing the one with the same key.
+
+        :param user: the user name (label)
+        :param data: an array of 258 bytes, as returned by :meth:`easyvr.EasyVR.exportCommand()`
+        :param group: (0-16) the group the template was exported from
+        :param index: (0-31) the index the template was exported from, or (-1)
+        """
+        if len(data) != _TEMPLATE_SIZE:
+            raise ValueError
+        rec = bytearray(_REC_SIZE)
+        rec[0] = _REC_LIVE
+        rec[1] = group
+        rec[2] = index & 0xFF
+        label = bytearray()
+        _packLabel(label, _label(user))
+        rec[3:3 + len(label)] = label
+        rec[_REC_KEY:_REC_KEY + _TEMPLATE_SIZE] = data
+        self._unmap()
+        f = self._f
+        n = self._count
+        f.seek(_ARC_HEADER + n * _REC_SIZE)
+        f.write(rec)
+        # the record counts once the header is updated, then the old one is deleted
+        f.seek(0)
+        f.write(self._header(n + 1))
+        self._count = n + 1
+        key = (group, -1 if index < 0 else index, _label(user))
+        if key in self._keys:
+            self._kill(self._forget(key))
+        f.flush()
+        self._index(rec, n)
+
+    def remove(self, user):
+        """
+.. method:: remove(user)
+
+        Deletes all the templates of a user.
+
+        :param user: the user name (label)
+
+        :return: *True* if the user was in the archive
+        """
+        keys = self.keys(label = user)
+        self._unmap()
+        for key in keys:
+            self._kill(self._forget(key))
+        self._f.flush()
+        return len(keys) > 0
+
+    def users(self):
+        """
+.. method:: users()
+
+        :return: the list of user labels in the archive
+        """
+        return list(self._labels)
+
+    def getSize(self):
+        """
+.. method:: getSize()
+
+        :return: a tuple of the form (**live**, **records**), with the number of \
+        templates and of records in the file (including deleted ones)
+        """
+        return (len(self._keys), self._count)
+
+    def compact(self):
+        """
+.. method:: compact()
+
+        Moves the live records over the deleted ones and shrinks the file.
+
+        :return: the number of records reclaimed
+        """
+        self._unmap()
+        f = self._f
+        live = list(self._keys.values())
+        live.sort()
+        for k in range(len(live)):
+            n = live[k]
+            if n == k:
+                continue
+            f.seek(_ARC_HEADER + n * _REC_SIZE)
+            rec = f.read(_REC_SIZE)
+            f.seek(_ARC_HEADER + k * _REC_SIZE)
+            f.write(rec)
+        reclaimed = self._count - len(live)
+        f.seek(0)
+        f.write(self._header(len(live)))
+        try:
+            f.truncate(_ARC_HEADER + len(live) * _REC_SIZE)
+        except:
+            pass # records past the count are ignored
+        f.flush()
+        self._scan()
+        return reclaimed
+
+    def close(self):
+        """
+.. method:: close()
+
+        Closes the archive file.
+        """
+        self._unmap()
+        self._f.close()
+
+
+class TemplateCache():
+    """
+.. class:: TemplateCache
+
+    Keeps the templates of the most recent users in the slots of a group.
+
+    :param evr: the :class:`easyvr.EasyVR` object (use the cache from the \
+    :class:`session.Session` worker if there is one)
+    :param library: the :class:`TemplateLibrary` with the templates of all the users
+    :param group: the group used as cache: commands labeled with a user of the \
+    library are taken over and untrained or unlabeled ones are reused, while the \
+    other commands are reserved (never changed)
+    :param slots: (1-32) the maximum number of commands in the group
+    :param callback: a function called with the cache after each change to the \
+    group, such as saving the inventory snapshot (see \
+    :meth:`easyvr.EasyVR.saveInventoryFile()`), or *None*
+    """
+
+    def __init__(self, evr, library, group = EasyVR.PASSWORD, slots = 32, callback = None):
+        self._evr = evr
+        self._library = library
+        self._group = group
+        self._slots = slots
+        self._callback = callback
+        self._hits = 0
+        self._misses = 0
+        self.sync()
+
+    def sync(self):
+        """
+.. method:: sync()
+
+        Reads the labels of the group to find the resident users (done when the \
+        cache is created; call it again if the group is changed by other means).
+        """
+        evr = self._evr
+        self._resident = {}
+        self._spare = []
+        # least recently used first
+        self._order = []
+        count = evr.getCommandCount(self._group)
+        for index in range(count):
+            (name, training) = evr.dumpCommand(self._group, index)
+            if name == "" or training == 0 or name in self._resident:
+                self._spare.append(index)
+            elif self._library.get(name) is not None:
+                self._resident[name] = index
+                self._order.append(name)
+            # else reserved, not a user of the library
+
+    def _changed(self):
+        if self._callback is not None:
+            self._callback(self)
+
+    def isResident(self, user):
+        """
+.. method:: isResident(user)
+
+        :param user: the user name
+
+        :return: the index of the command holding the template of the user, \
+        or (-1) if not resident
+        """
+        return self._resident.get(_label(user), -1)
+
+    def _touch(self, label):
+        self._order.remove(label)
+        self._order.append(label)
+
+    def _slot(self):
+        # a free command: spare, added to the group or taken from the LRU user
+        if self._spare:
+            return self._spare.pop(0)
+        evr = self._evr
+        count = evr.getCommandCount(self._group)
+        if count < self._slots:
+            try:
+                evr.addCommand(self._group, count)
+                return count
+            except ValueError:
+                if not evr.isMemoryFull() or not self._order:
+                    raise
+        if not self._order:
+            raise ValueError
+        return self._resident.pop(self._order.pop(0))
+
+    def load(self, user):
+        """
+.. method:: load(user)
+
+        Makes the template of a user resident, importing and verifying it if needed \
+        (see :meth:`easyvr.EasyVR.importCommand()`). A template rejected by the \
+        verification raises *ValueError*, its command is erased and reused later.
+
+        :param user: the user name (a string, stored as a command label: digits \
+        count as two characters, other symbols become underscores)
+
+        :return: the index of the command in the group (compare it with \
+        :meth:`easyvr.EasyVR.getCommand()` after recognition), or (-1) if the user \
+        is not in the library
+        """
+        label = _label(user)
+        index = self._resident.get(label)
+        if index is not None:
+            self._hits += 1
+            self._touch(label)
+            return index
+        data = self._library.get(label)
+        if data is None:
+            return -1
+        self._misses += 1
+        evr = self._evr
+        index = self._slot()
+        try:
+            # unlabeled until verified, so a failure never leaves a wrong owner
+            evr.setCommandLabel(self._group, index, "")
+            self._changed()
+            _import(evr, self._group, index, data)
+            evr.setCommandLabel(self._group, index, label)
+        except Exception:
+            self._spare.append(index)
+            self._changed()
+            raise
+        self._resident[label] = index
+        self._order.append(label)
+        self._changed()
+        return index
+
+    def store(self, user, index):
+        """
+.. method:: store(user, index)
+
+        Adds the template of a command trained in the group to the library, \
+        labeling the command with the user name (enrollment).
+
+        :param user: the user name
+        :param index: (0-31) is the index of the trained command in the group
+        """
+        evr = self._evr
+        label = _label(user)
+        self._library.put(label, evr.exportCommand(self._group, index), self._group, index)
+        self.evict(label)
+        if index in self._spare:
+            self._spare.remove(index)
+        for other in self._order:
+            if self._resident[other] == index:
+                del self._resident[other]
+                self._order.remove(other)
+                break
+        evr.setCommandLabel(self._group, index, label)
+        self._resident[label] = index
+        self._order.append(label)
+        self._changed()
+
+    def evict(self, user):
+        """
+.. method:: evict(user)
+
+        Releases the command holding the template of a user, if resident (the \
+        template stays in the library).
+
+        :param user: the user name
+        """
+        label = _label(user)
+        index = self._resident.pop(label, None)
+        if index is None:
+            return
+        self._order.remove(label)
+        self._spare.append(index)
+        self._evr.setCommandLabel(self._group, index, "")
+        self._changed()
+
+    def getStats(self):
+        """
+.. method:: getStats()
+
+        :return: a tuple of the form (**resident**, **hits**, **misses**), with the \
+        number of resident users and of :meth:`load()` calls that found the user \
+        resident or imported it
+        """
+        return (len(self._resident), self._hits, self._misses)
+
+
+class TemplateSync():
+    """
+.. class:: TemplateSync
+
+    Brings the custom commands of a module to a desired state with the fewest \
+    operations.
+
+    The desired state lists the commands of some groups in order, each one as a \
+    label and a template (or *None* for a command without training). Commands on \
+    the module are compared by label, training and checksum (see \
+    :meth:`easyvr.EasyVR.getCommandChecksum()`): commands past the end of a group are \
+    removed, missing ones are added, then templates that differ are imported and \
+    verified, training is erased and labels are changed where needed. Groups are \
+    processed one at a time, starting from the one the module has in memory, so \
+    each group is selected once.
+
+    The module is read through the inventory cache, so with an inventory snapshot \
+    saved after the previous sync (see :meth:`easyvr.EasyVR.saveInventory()`) a \
+    small change costs a few operations; otherwise each trained command is exported \
+    once to get its checksum.
+
+    :param evr: the :class:`easyvr.EasyVR` object
+    """
+
+    def __init__(self, evr):
+        self._evr = evr
+        self._groups = {}
+
+    def setGroup(self, group, commands):
+        """
+.. method:: setGroup(group, commands)
+
+        Sets the desired contents of a group (other groups are left untouched).
+
+        :param group: (0-16) is the target group, or one of the values in #Groups
+        :param commands: a list of (**label**, **data**) tuples, where **data** is \
+        the 258 bytes template (see :meth:`easyvr.EasyVR.exportCommand()`) or *None* \
+        for an untrained command; an empty list removes all the commands
+        """
+        if len(commands) > 32:
+            raise ValueError
+        self._groups[group] = list(commands)
+
+    def setArchive(self, archive, group = None):
+        """
+.. method:: setArchive(archive, group)
+
+        Sets the desired contents of the groups found in a :class:`TemplateArchive` \
+        (see :meth:`TemplateArchive.getGroups()`).
+
+        :param archive: the :class:`TemplateArchive`
+        :param group: the only group to take, or *None* for all
+        """
+        groups = archive.getGroups(group)
+        for g in groups:
+            self.setGroup(g, groups[g])
+
+    def _order(self):
+        groups = list(self._groups)
+        groups.sort()
+        # the group already in the module memory first
+        current = self._evr._group
+        if current in groups:
+            groups.remove(current)
+            groups.insert(0, current)
+        return groups
+
+    def _diff(self, group):
+        evr = self._evr
+        commands = self._groups[group]
+        count = evr.getCommandCount(group)
+        if count < 0:
+            raise ValueError
+        ops = []
+        # from the end, so that no command moves
+        for index in range(count - 1, len(commands) - 1, -1):
+            ops.append(("remove", group, index))
+        for index in range(count, len(commands)):
+            ops.append(("add", group, index))
+        for index in range(len(commands)):
+            (label, data) = commands[index]
+            if index < count:
+                (name, training) = evr.dumpCommand(group, index)
+            else:
+                (name, training) = ("", 0)
+            if data is None:
+                if training > 0:
+                    ops.append(("erase", group, index))
+            elif training == 0 or evr.getCommandChecksum(group, index) != _checksum(data):
+                ops.append(("import", group, index))
+            if name != _label(label):
+                ops.append(("label", group, index))
+        return ops
+
+    def plan(self):
+        """
+.. method:: plan()
+
+        Compares the module with the desired state, without changing it.
+
+        :return: the list of operations :meth:`apply()` would run, as tuples of the \
+        form (**operation**, **group**, **index**), where **operation** is one of \
+        ``"remove"``, ``"add"``, ``"import"``, ``"erase"`` and ``"label"``
+        """
+        ops = []
+        for group in self._order():
+            ops.extend(self._diff(group))
+        return ops
+
+    def _run(self, op):
+        evr = self._evr
+        (name, group, index) = op
+        if name == "remove":
+            evr.removeCommand(group, index)
+        elif name == "add":
+            evr.addCommand(group, index)
+        elif name == "import":
+            _import(evr, group, index, self._groups[group][index][1])
+        elif name == "erase":
+            evr.eraseCommand(group, index)
+        else:
+            evr.setCommandLabel(group, index, self._groups[group][index][0])
+
+    def apply(self, callback = None, retries = 0):
+        """
+.. method:: apply(callback, retries)
+
+        Writes the differences between the module and the desired state, one group \
+        at a time.
+
+        :param callback: a function called with each operation after it has been \
+        run (see :meth:`plan()`), or *None*
+        :param retries: how many times a failed operation (*TimeoutError* or \
+        *ValueError*) is tried again; since its outcome is unknown, the group is \
+        read again from the module and only the remaining differences are written
+
+        :return: the list of operations run
+        """
+        done = []
+        for group in self._order():
+            ops = None
+            failures = 0
+            while True:
+                try:
+                    if ops is None:
+                        ops = self._diff(group)
+                    if not ops:
+                        break
+                    self._run(ops[0])
+                except (TimeoutError, ValueError):
+                    if failures >= retries:
+                        raise
+                    failures += 1
+                    self._evr.invalidateCache()
+                    ops = None
+                    continue
+                failures = 0
+                op = ops.pop(0)
+                done.append(op)
+                if callback is not None:
+                    callback(op)
+        return done
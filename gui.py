@@ -2,42 +2,374 @@
 from riverdi.displays.bt81x import ctp50
 from bridgetek.bt81x import bt81x
 
+# bitmap parameters of the images, generated by tools/imgprep.py
+from assets import IMAGES
+
+
+# what the frame on screen shows, a new display list is built only when it changes
+_frame = None
+_skipped = 0
+
+def _changed(frame):
+    global _frame, _skipped
+    if frame == _frame:
+        _skipped += 1
+        return False
+    _frame = frame
+    return True
+
+
+# features that need functions missing from the bt81x driver are disabled (the
+# screens are drawn the plain way) and listed here, see getUnsupported
+_unsupported = []
+
+
+# static parts of the screens are built once by the coprocessor, copied from the
+# display list to RAM_G and appended to the following frames (a few bytes of SPI
+# traffic instead of the whole widgets); they are kept below the top 42K of RAM_G,
+# used by the coprocessor to decode PNG images. Retention is best effort: if the
+# coprocessor faults or hangs, it is reset and the frame is drawn directly
+_RAM_DL         = 0x300000
+_REG_CPURESET   = 0x302020
+_REG_CMD_READ   = 0x3020f8
+_REG_CMD_WRITE  = 0x3020fc
+_REG_CMD_DL     = 0x302100
+_CMD_FAULT      = 0xfff
+_SEG_END        = 0x100000 - 42 * 1024
+_SEG_START      = _SEG_END - 32 * 1024
+
+_segments = {}
+_segnext = _SEG_START
+_direct = False         # drawing a frame again after a fault, without retention
+_faults = 0
+
+try:
+    _rd32 = bt81x.rd32
+    _wr32 = bt81x.wr32
+    _memcpy = bt81x.memcpy
+    _append = bt81x.append
+    _retained = True
+except AttributeError:
+    _retained = False
+    _unsupported.append("retained display lists (bt81x.rd32, wr32, memcpy, append)")
+
+def _cmdIdle(timeout):
+    # waits for the coprocessor to execute all the queued commands (timeout in ms)
+    while True:
+        read = _rd32(_REG_CMD_READ)
+        if read == _CMD_FAULT:
+            # the coprocessor must be reset, nothing it builds can be trusted
+            raise RuntimeError
+        if read == _rd32(_REG_CMD_WRITE):
+            return
+        if timeout <= 0:
+            raise TimeoutError
+        sleep(1)
+        timeout -= 1
+
+def _cmdReset():
+    # restarts the coprocessor with an empty command FIFO (the display list being
+    # built is lost, the segments already in RAM_G are not)
+    _wr32(_REG_CPURESET, 1)
+    _wr32(_REG_CMD_READ, 0)
+    _wr32(_REG_CMD_WRITE, 0)
+    _wr32(_REG_CMD_DL, 0)
+    _wr32(_REG_CPURESET, 0)
+
+def _dlOffset():
+    # where the next display list command goes, once the coprocessor is idle
+    _cmdIdle(1000)
+    return _rd32(_REG_CMD_DL)
+
+def _static(name, draw, arg=None):
+    global _segnext
+    if _direct or not _retained:
+        draw(arg)
+        return
+    segment = _segments.get(name)
+    if segment != None:
+        _append(segment[0], segment[1])
+        return
+    start = _dlOffset()
+    draw(arg)
+    size = _dlOffset() - start
+    if _segnext + size > _SEG_END:
+        # no room left, drawn every time
+        return
+    _memcpy(_segnext, _RAM_DL + start, size)
+    _segments[name] = (_segnext, size)
+    _segnext += size
+
+def _draw(frame, arg=None):
+    # builds a frame; a segment that faults while being retained is not kept,
+    # and the frame is drawn again from scratch
+    global _direct, _faults
+    try:
+        frame(arg)
+    except (RuntimeError, TimeoutError):
+        _faults += 1
+        _cmdReset()
+        _direct = True
+        try:
+            frame(arg)
+        finally:
+            _direct = False
+
+
+# images resident in RAM_G (below the segments), loaded once and evicted least
+# recently used first when there is no room or no free bitmap handle
+_ASSET_END      = _SEG_START
+
+_assets = {}            # name: (address, size, handle, width, height, format, stride)
+_lru = []               # names, least recently used first
+_handles = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14]
+_decoded = 0
+
+# bitmaps converted by tools/imgprep.py are copied (or inflated) to RAM_G as they
+# are, otherwise the PNG images are decoded by the coprocessor (as ARGB4)
+try:
+    _inflate = bt81x.inflate
+    _memwrite = bt81x.memwrite
+    _copy = True
+except AttributeError:
+    _copy = False
+    _unsupported.append("offline images, decoding PNG instead (bt81x.inflate, memwrite)")
+
+def _evict(name):
+    asset = _assets.pop(name)
+    _lru.remove(name)
+    _handles.append(asset[2])
+
+def _alloc(size):
+    # first fit between the resident images
+    while True:
+        regions = []
+        for name in _assets:
+            regions.append((_assets[name][0], _assets[name][1]))
+        regions.sort()
+        address = 0
+        for region in regions:
+            if region[0] - address >= size:
+                return address
+            address = region[0] + region[1]
+        if _ASSET_END - address >= size:
+            return address
+        if len(_lru) == 0:
+            raise MemoryError
+        _evict(_lru[0])
+
+def _resource(file):
+    # resources are found by the name they are registered with (the file name,
+    # see new_resource in main.py), not by their path in the project
+    f = open("resource://" + file.split("/")[-1])
+    data = f.read()
+    f.close()
+    return data
+
+
+# images programmed in the flash attached to the BT81x (see useFlash), copied to
+# RAM_G with one flash read: a 4K index after the flash blob, then the bitmaps as
+# they are in RAM_G, each one at a 4K boundary
+_REG_FLASH_STATUS = 0x3025f0
+_FLASH_FULL     = 3
+_FLASH_INDEX    = 4096
+_FLASH_MAGIC    = 0x41455645    # "EVEA"
+_FLASH_VERSION  = 1
+_FLASH_TIMEOUT  = 30000         # to erase and program the largest image (ms)
+
+_flash = {}             # name: offset
+
+try:
+    _rd32 = bt81x.rd32
+    _flashAttach = bt81x.flash_attach
+    _flashFast = bt81x.flash_fast
+    _flashRead = bt81x.flash_read
+    _flashUpdate = bt81x.flash_update
+    _flashUsable = _copy
+except AttributeError:
+    _flashUsable = False
+    _unsupported.append("display flash (bt81x.rd32, flash_attach, flash_fast, flash_read, flash_update)")
+
+def _sector(n):
+    return (n + 4095) & ~4095
+
+def _flashLayout():
+    # index entries (hash, offset, size) of the images, in name order
+    names = list(IMAGES)
+    names.sort()
+    layout = []
+    offset = _FLASH_INDEX + 4096
+    for name in names:
+        info = IMAGES[name]
+        layout.append((name, int(info[8][:8], 16), offset, info[5]))
+        offset += _sector(info[5])
+    return layout
+
+def _words(address, words):
+    data = bytearray()
+    for w in words:
+        data.append(w & 0xff)
+        data.append((w >> 8) & 0xff)
+        data.append((w >> 16) & 0xff)
+        data.append((w >> 24) & 0xff)
+    _memwrite(address, data)
 
 #
-# loadImage
+# useFlash
 #
-def loadImage(image):
-    bt81x.load_image(0, 0, image)
+def useFlash():
+    # loads the images from the display flash, programming the ones that changed
+    # since the last boot; returns the number of images programmed, -1 without
+    # flash, or None if the bt81x driver has no flash functions (see getUnsupported)
+    global _flash
+    if not _flashUsable:
+        return None
+    # registers are read only after the coprocessor has executed the commands
+    _flashAttach()
+    _flashFast()
+    _cmdIdle(_FLASH_TIMEOUT)
+    if _rd32(_REG_FLASH_STATUS) != _FLASH_FULL:
+        return -1
+    layout = _flashLayout()
+    # the index is read and staged in the top of RAM_G (PNG scratch, unused here)
+    scratch = _SEG_END
+    _flashRead(scratch, _FLASH_INDEX, 12 + 12 * len(layout))
+    _cmdIdle(_FLASH_TIMEOUT)
+    index = []
+    count = 0
+    if _rd32(scratch) == _FLASH_MAGIC and _rd32(scratch + 4) == _FLASH_VERSION:
+        count = _rd32(scratch + 8)
+        for i in range(min(count, len(layout))):
+            entry = scratch + 12 + 12 * i
+            index.append((_rd32(entry), _rd32(entry + 4), _rd32(entry + 8)))
+    programmed = 0
+    words = [_FLASH_MAGIC, _FLASH_VERSION, len(layout)]
+    _flash = {}
+    for i in range(len(layout)):
+        (name, digest, offset, size) = layout[i]
+        if i >= len(index) or index[i] != (digest, offset, size):
+            # copied from RAM_G as loaded from the resources
+            asset = _asset(name)
+            _flashUpdate(offset, asset[0], _sector(size))
+            programmed += 1
+        _flash[name] = offset
+        words.append(digest)
+        words.append(offset)
+        words.append(size)
+    if programmed > 0 or count != len(layout):
+        _words(scratch, words)
+        _flashUpdate(_FLASH_INDEX, scratch, 4096)
+        _cmdIdle(_FLASH_TIMEOUT)
+    return programmed
+
+def _asset(name):
+    global _decoded
+    asset = _assets.get(name)
+    if asset != None:
+        _lru.remove(name)
+        _lru.append(name)
+        return asset
+    # file, width, height, format, stride, size, packed size, compressed, sha1
+    info = IMAGES[name]
+    (width, height) = (info[1], info[2])
+    if _copy:
+        (format, stride, size) = (info[3], info[4], info[5])
+    else:
+        (format, stride, size) = (bt81x.ARGB4, width * 2, width * 2 * height)
+    if len(_handles) == 0:
+        _evict(_lru[0])
+    address = _alloc((size + 3) & ~3)
+    if name in _flash:
+        _flashRead(address, _flash[name], (size + 3) & ~3)
+    elif not _copy:
+        bt81x.load_image(address, 0, name)
+        _decoded += 1
+    elif info[7]:
+        _inflate(address, _resource(info[0]))
+    else:
+        _memwrite(address, _resource(info[0]))
+    asset = (address, (size + 3) & ~3, _handles.pop(0), width, height, format, stride)
+    _assets[name] = asset
+    _lru.append(name)
+    return asset
+
+def _bitmap(asset):
+    (address, size, handle, width, height, format, stride) = asset
+    return bt81x.Bitmap(handle, address, (format, stride), (bt81x.BILINEAR, bt81x.BORDER, bt81x.BORDER, width, height))
 
 #
-# showLogo
+# getResidentImages
 #
-def showLogo():
+def getResidentImages():
+    # names of the images in RAM_G (least recently used first) and number of PNG decodes so far
+    return (list(_lru), _decoded)
 
-    # start
-    bt81x.dl_start()
+#
+# getUnsupported
+#
+def getUnsupported():
+    # features disabled because the bt81x driver lacks the functions they need
+    return list(_unsupported)
+
+#
+# invalidate
+#
+def invalidate():
+    # the next screen is drawn anyway (call it after drawing with bt81x directly)
+    global _frame
+    _frame = None
+
+#
+# getSkippedFrames
+#
+def getSkippedFrames():
+    # number of calls that found the same frame already on screen
+    return _skipped
+
+#
+# getFaults
+#
+def getFaults():
+    # number of frames drawn again after a fault of the coprocessor
+    return _faults
+
+#
+# loadImage
+#
+def loadImage(image):
+    # makes an image resident in RAM_G, decoded only the first time
+    _asset(image)
+
+def _logoStatic(asset):
     bt81x.clear_color(rgb=(0xff, 0xff, 0xff))
     bt81x.clear(1, 1, 1)
     
     # image
-    image = bt81x.Bitmap(1, 0, (bt81x.ARGB4, 642 * 2), (bt81x.BILINEAR, bt81x.BORDER, bt81x.BORDER, 642, 144))
+    image = _bitmap(asset)
     image.prepare_draw()
-    image.draw(((bt81x.display_conf.width - 642)//2, (bt81x.display_conf.height - 144)//2), vertex_fmt=0)
-
-    # display
-    bt81x.display()
-    bt81x.swap_and_empty()
+    image.draw(((bt81x.display_conf.width - asset[3])//2, (bt81x.display_conf.height - asset[4])//2), vertex_fmt=0)
 
 #
-# pinScreen
+# showLogo
 #
-def pinScreen(pin):
-    
-    pin_masked = "****"
-    pin_length = len(pin)
-    
+def showLogo(name="gui_riverdi_logo.png"):
+
+    if not _changed(("logo", name)):
+        return
+    _draw(_logoFrame, (name, _asset(name)))
+
+def _logoFrame(arg):
+    (name, asset) = arg
+
     # start
     bt81x.dl_start()
+    _static(("logo", name, asset[0], asset[2]), _logoStatic, asset)
+
+    # display
+    bt81x.display()
+    bt81x.swap_and_empty()
+
+def _pinStatic(arg):
     bt81x.clear(1, 1, 1)
     
     #text
@@ -45,25 +377,47 @@ def pinScreen(pin):
     txt = bt81x.Text(200, 150, 31, bt81x.OPT_CENTERX | bt81x.OPT_CENTERY, "Enter Pin:", )
     bt81x.add_text(txt)
 
-    #drawing user pin
-    txt.text = pin_masked[:pin_length]
-    txt.x = 200
-    txt.y = 200
-    txt.font = 31
-    bt81x.add_text(txt)
-        
+def _keysStatic(key):
     # keys
     bt81x.track(430, 50, 350, 70, 0)
-    bt81x.add_keys(430, 50, 350, 70, 30, 0, "123")
-    bt81x.add_keys(430, 130, 350, 70, 30, 0, "456")
-    bt81x.add_keys(430, 210, 350, 70, 30, 0, "789")
-    bt81x.add_keys(430, 290, 350, 70, 30, 0, ".0C")
+    # key is the code of the key drawn pressed (0 for none)
+    bt81x.add_keys(430, 50, 350, 70, 30, key, "123")
+    bt81x.add_keys(430, 130, 350, 70, 30, key, "456")
+    bt81x.add_keys(430, 210, 350, 70, 30, key, "789")
+    bt81x.add_keys(430, 290, 350, 70, 30, key, ".0C")
     
     # connect button
     btn = bt81x.Button(430, 370, 350, 70, 30, 0, "Connect")
     bt81x.tag(1)
     bt81x.add_button(btn)
 
+#
+# pinScreen
+#
+def pinScreen(pin, key=0):
+    
+    pin_masked = "****"
+    pin_length = len(pin)
+
+    # only the number of digits is visible
+    if not _changed(("pin", pin_length, key)):
+        return
+    _draw(_pinFrame, (pin_masked[:pin_length], key))
+
+def _pinFrame(arg):
+    (pin_masked, key) = arg
+    
+    # start
+    bt81x.dl_start()
+    _static("pin", _pinStatic)
+
+    #drawing user pin
+    txt = bt81x.Text(200, 200, 31, bt81x.OPT_CENTERX | bt81x.OPT_CENTERY, pin_masked, )
+    bt81x.add_text(txt)
+
+    # keys and connect button (tagged, after the untagged text)
+    _static(("keys", key), _keysStatic, key)
+
     # display
     bt81x.display()
     bt81x.swap_and_empty()
@@ -73,6 +427,9 @@ def pinScreen(pin):
 #
 def showMessage(text):
     
+    if not _changed(("message", text)):
+        return
+
     # start
     bt81x.dl_start()
     bt81x.clear(1, 1, 1)
@@ -85,20 +442,29 @@ def showMessage(text):
     bt81x.display()
     bt81x.swap_and_empty()
     
+def _screensaverStatic(asset):
+    bt81x.clear_color(rgb=(0x00, 0x00, 0x00))
+    bt81x.clear(1, 1, 1)
+    _bitmap(asset).prepare_draw()
+
 #
 # showScreensaver
 #
-def showScreensaver(x,y):
+def showScreensaver(x,y,name="screensaver.png"):
     
+    if not _changed(("screensaver", name, x, y)):
+        return
+    _draw(_screensaverFrame, (name, _asset(name), x, y))
+
+def _screensaverFrame(arg):
+    (name, asset, x, y) = arg
+
     # start
     bt81x.dl_start()
-    bt81x.clear_color(rgb=(0x00, 0x00, 0x00))
-    bt81x.clear(1, 1, 1)
-    
-    # image
-    image = bt81x.Bitmap(1, 0, (bt81x.ARGB4, (300) * 2), (bt81x.BILINEAR, bt81x.BORDER, bt81x.BORDER, 300, 75))
-    image.prepare_draw()
-    image.draw((x, y), vertex_fmt=0)
+    _static(("screensaver", name, asset[0], asset[2]), _screensaverStatic, asset)
+
+    # image (set up in the static part)
+    _bitmap(asset).draw((x, y), vertex_fmt=0)
     
     # display
     bt81x.display()
@@ -2,6 +2,9 @@
 from riverdi.displays.bt81x import ctp50
 from bridgetek.bt81x import bt81x
 from fortebit.easyvr import easyvr
+from fortebit.easyvr import session
+from fortebit.easyvr import prompts
+from fortebit.easyvr import templates
 
 import streams
 import gui
@@ -21,6 +24,12 @@ screenLayout = 0        #window currently used
 wait = False
 counter = 0
 user2 = False
+user_pin = ""           #pin of the user asked for the voice password
+key = 0                 #tag of the key being touched, drawn pressed
+key_frames = 0          #pin screen loops left to draw it pressed
+evr_stats = False       #print EasyVR protocol statistics after each access cycle
+evr_inventory = None    #file to keep the EasyVR inventory across reboots (needs a file system)
+evr_templates = None    #file with the voice passwords of all the users, by PIN (needs a file system)
 
 #serial communication
 pc = streams.serial() 
@@ -28,6 +37,22 @@ ser = streams.serial(SERIAL1, baud=9600,set_default=False)
 
 evr = easyvr.EasyVR(ser)
 
+#reopen the EasyVR serial port at a new speed (used by connect)
+def evr_reopen(baud):
+    global ser
+    ser.close()
+    ser = streams.serial(SERIAL1, baud=baud, set_default=False)
+    return ser
+if evr_stats:
+    evr.enableStats()
+
+#a pin is valid if it is one of the built-in ones, or if its user has a voice
+#password in the library (when there is one)
+def pin_valid(pin):
+    if evr_library is None:
+        return pin == valid_pin or pin == valid_pin2
+    return evr_library.get(pin) is not None
+
 #buttons handler
 def pressed(tag, tracked, tp):
     
@@ -36,6 +61,9 @@ def pressed(tag, tracked, tp):
     global wait
     global counter
     global user2
+    global user_pin
+    global key
+    global key_frames
     
     #if we are in pinscreen
     if (screenLayout == 2):
@@ -43,6 +71,11 @@ def pressed(tag, tracked, tp):
         counter = 0
         user2 = False
         
+        #keys are tagged with their character (the connect button with 1)
+        if tag != 1:
+            key = tag
+            key_frames = 10
+        
         #if we don't click c or connect button and length of pin is no longer than 4 characters
         if ((tag != 67) and (tag !=1)):
             if  (len(pin) >= 4):
@@ -54,9 +87,10 @@ def pressed(tag, tracked, tp):
             pin = pin[:-1]
         
         #if we click connect and the pin is valid
-        elif ((tag == 1) and ((pin == valid_pin) or (pin == valid_pin2))):
+        elif ((tag == 1) and pin_valid(pin)):
             if pin == valid_pin2:
                 user2 = True
+            user_pin = pin
             screenLayout = 4
             
         #if we click connect and the pin is invalid but user have to write something
@@ -65,13 +99,16 @@ def pressed(tag, tracked, tp):
             pin = ""
             #[3]access denied
             gui.showMessage("Access Denied")
-            #go to screensaver
-            evr.playSound(SND_Access_denied, evr.VOL_FULL)
+            #go to screensaver (the prompt plays in background)
+            evr_prompts.playSound(SND_Access_denied, evr.VOL_FULL, replace=True)
             
            
 #image resources
 new_resource('images/gui_riverdi_logo.png')
 new_resource('images/screensaver.png')
+#bitmaps converted by tools/imgprep.py (see assets.py)
+new_resource('images/build/gui_riverdi_logo.argb4.z')
+new_resource('images/build/screensaver.argb4.z')
 
 
 #command definition
@@ -89,7 +126,25 @@ pinMode(D23, OUTPUT)
 
 # init display
 bt81x.init(SPI0, D4, D33, D34)
+for feature in gui.getUnsupported():
+    print("GUI: %s not available with this bt81x driver" % feature)
+
+#images are copied from the display flash (programmed only when they change),
+#if the driver supports it (listed above otherwise)
+programmed = gui.useFlash()
+if programmed is not None:
+    if programmed >= 0:
+        print("Display flash: %d images programmed" % programmed)
+    else:
+        print("Display flash: not detected")
  
+#checking if module is connected (at the fastest speed)
+baud = evr.connect(9600, evr_reopen)
+while not baud:
+    print("EasyVR not detected!")
+    baud = evr.connect(9600, evr_reopen)
+print("EasyVR detected at %d bps" % baud)
+
 #config EasyVR
 evr.setLevel(2)
 evr.setLanguage(evr.ENGLISH)
@@ -97,15 +152,15 @@ evr.setKnob(evr.STRICTER)
 evr.setCommandLatency(evr.MODE_FAST)
 evr.setTimeout(6)
 
-
-#checking if module is connected
-while not evr.detect():
-    print("EasyVR not detected!")
-print("EasyVR detected")
 id = evr.getID()
 print("EasyVR version id: %s" % id)
 
 
+#restore the inventory saved at the last boot (if still valid)
+inventory_loaded = False
+if evr_inventory != None:
+    inventory_loaded = evr.loadInventoryFile(evr_inventory)
+
 #show all uploaded sounds
 mask = evr.getGroupMask()
 if mask != None:
@@ -132,6 +187,28 @@ if mask != None:
                         print("%d %s Trained  %d times, Similar to Command %d" % (idx,name,train,confl))
         mask >>= 1
 
+if evr_inventory != None and not inventory_loaded:
+    evr.saveInventoryFile(evr_inventory)
+
+#keep the inventory snapshot in step with the password group
+def evr_save_inventory(cache):
+    if evr_inventory != None:
+        evr.saveInventoryFile(evr_inventory)
+
+#voice passwords of the users not resident in the password group are imported on demand
+#(the commands of the group not labeled with a user of the library are left alone)
+evr_library = None
+evr_users = None
+if evr_templates != None:
+    evr_library = templates.TemplateLibrary()
+    evr_library.loadFile(evr_templates)
+    evr_users = templates.TemplateCache(evr, evr_library, callback=evr_save_inventory)
+
+
+#from now on all EasyVR commands go through the session worker
+evr_session = session.Session(evr)
+evr_session.start()
+evr_prompts = prompts.PromptQueue(evr_session)
 
 # one callback for all tags
 bt81x.touch_loop(((-1, pressed), ))
@@ -157,6 +234,7 @@ bt81x.clear_color(rgb=(0x00, 0x00, 0x00))
 bt81x.clear(1, 1, 1)
 bt81x.display()
 bt81x.swap_and_empty()
+gui.invalidate()
 screenLayout = 1
 
 ###########################################################
@@ -171,18 +249,26 @@ while 1:
         #screensaver logo parameters
         screensaver_logo_width = 300
         screensaver_logo_height = 75
-        evr.recognizeWord(4)
+        #keep listening until the first word of the grammar is heard
+        wake = lambda evr: evr.listenWords(4)
+        heard = lambda result: result.getWord() == 0
+        listen = evr_session.submitListen(wake, heard)
         cnt = 0
 
     while screenLayout == 1:
-        if evr.hasFinished():
-            if evr.getWord() == 0:
+        if listen.isDone():
+            result = listen.getResult()
+            if listen.getError() == None and result != None and heard(result):
                 screenLayout = 2
                 break
-            evr.recognizeWord(4)
+            if result != None and result.isInvalid():
+                #the grammar is missing, do not flood the module
+                sleep(1000)
+            #interrupted by a prompt or failed, listen again
+            listen = evr_session.submitListen(wake, heard)
         else:
-            cnt += 1
             sleep(100)
+            cnt += 1
             if (cnt == 20):
                 x = random(1,bt81x.display_conf.width - screensaver_logo_width)
                 y = random(1,bt81x.display_conf.height - screensaver_logo_height)
@@ -197,7 +283,12 @@ while 1:
         if (wait == True):
             wait = False
             sleep(2000)
-        gui.pinScreen(pin)
+        gui.pinScreen(pin, key)
+        #the key is drawn pressed for a while after each touch
+        if key_frames > 0:
+            key_frames -= 1
+        else:
+            key = 0
         #wait after wrong password
         if counter == 500:
             screenLayout = 1
@@ -210,32 +301,53 @@ while 1:
     if screenLayout == 4:
         #[4] enter voice password
         gui.showMessage("Enter Voice Password")
-        evr.playSound(SND_Please_say_your_password, evr.VOL_FULL)
+        #the command expected for the user of the PIN
+        if evr_users != None:
+            #only the users of the library have a voice password
+            try:
+                expected = evr_session.call(lambda evr: evr_users.load(user_pin))
+            except (TimeoutError, ValueError):
+                expected = -1
+            if expected < 0:
+                #template missing or rejected by the module
+                gui.showMessage("Access Denied")
+                evr_prompts.playSound(SND_Access_denied, evr.VOL_FULL)
+                sleep(1000)
+                screenLayout = 2
+                continue
+        else:
+            #hard-wired passwords of the built-in users
+            expected = 2 if user2 else 5
+        #listening starts the moment the prompt ends
+        listen = lambda evr: evr.playAndRecognizeCommand(SND_Please_say_your_password, evr.VOL_FULL, 16)
 
         #checking if user said correct Password
         
         while screenLayout == 4:
-            evr.recognizeCommand(16)
-            while not evr.hasFinished():
-                sleep(100)
+            result = evr_session.submitTask(listen).wait()
+            listen = lambda evr: evr.recognizeCommand(16)
+            if result == None:
+                #interrupted by a prompt, listen again
+                continue
+            command = result.getCommand()
             #if user say sth but can't recognize what 
-            if ((evr.getCommand() == -1) and (not evr.isTimeout())):
+            if ((command == -1) and (not result.isTimeout())):
                 #[3]access denied
                 gui.showMessage("Access Denied")
-                evr.playSound(SND_Access_denied, evr.VOL_FULL)
+                evr_prompts.playSound(SND_Access_denied, evr.VOL_FULL)
                 sleep(1000)
                 break
             #if user say not his voice Password
-            if ((user2 and (evr.getCommand() != 2) and (evr.getCommand() != -1)) or ((not user2) and  ((evr.getCommand() != 5) and (evr.getCommand() != -1)))):
+            if ((command != expected) and (command != -1)):
                 gui.showMessage("Access Denied")
-                evr.playSound(SND_Access_denied, evr.VOL_FULL)
+                evr_prompts.playSound(SND_Access_denied, evr.VOL_FULL)
                 sleep(1000)
                 break
-            if evr.isTimeout():
+            if result.isTimeout():
                 #if time out go to pin screen
                 screenLayout = 2
                 break
-            elif (evr.getCommand() == 2 and user2) or (evr.getCommand() == 5 and (not user2)):
+            elif command == expected:
                 #if command recognized and correct according to entered pin, go further
                 screenLayout = 5
                 break
@@ -246,7 +358,7 @@ while 1:
     if screenLayout == 5:
         #[5] access granted
         gui.showMessage("Access Granted")
-        evr.playSound(SND_Access_granted, evr.VOL_FULL)
+        evr_prompts.playSound(SND_Access_granted, evr.VOL_FULL)
         sleep(1000)
 
         relay_on()
@@ -256,4 +368,13 @@ while 1:
             sleep(1000)
         relay_off()
         screenLayout = 1
+
+        if evr_stats:
+            stats = evr_session.call(lambda evr: evr.getStats(), session.PRIORITY_BACKGROUND)
+            for cmd in stats:
+                s = stats[cmd]
+                print("%s: %d calls, %d ms total, %d ms max, %d ms delays, %d bytes, %d timeouts, %d errors" %
+                    (cmd, s["calls"], s["total"], s["max"], s["delay"], s["sent"] + s["received"], s["timeouts"], s["errors"]))
+            evr_session.submit(lambda evr: evr.resetStats(), session.PRIORITY_BACKGROUND)
+            print("GUI: %d frames skipped (unchanged), %d redrawn after a coprocessor fault" % (gui.getSkippedFrames(), gui.getFaults()))
 #ser.close()
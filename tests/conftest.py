@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+
+import pytest
+
+# the library is used from the source tree (there is no package to install)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fortebit.easyvr import easyvr
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.simulator import EasyVRSimulator, open_loopback
+
+
+# latencies short enough to keep the suite fast, long enough to be reliable
+FAST = dict(storage=0.001, cache=0.001, train=0.02, recognition=0.05, play=0.05, token=0.02, reset=0.01)
+
+
+class ScriptedStream():
+    """
+    A stream replying to each write with the bytes returned by a function of
+    the written data, to reproduce exact reply sequences.
+    """
+
+    def __init__(self, reply = None):
+        self.reply = reply
+        self.input = bytearray()
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        return len(self.input)
+
+    def read(self, size = 1):
+        data = bytes(self.input[:size])
+        del self.input[:size]
+        return data
+
+    def write(self, data):
+        data = bytes(data)
+        self.written.append(data)
+        if self.reply is not None:
+            self.input.extend(self.reply(data))
+        return len(data)
+
+
+class VirtualStream():
+    """
+    A link to the simulator on its virtual clock: the library waits by moving
+    the clock forward (to the next simulator event, if earlier), so timings are
+    exact and independent of the load of the machine. Use it through the
+    *virtual* fixture, that also gives the library the virtual clock.
+    """
+
+    def __init__(self, sim, baudrate = None):
+        self.sim = sim
+        self.baudrate = sim.baudrate if baudrate is None else baudrate
+        self.now = 0.0
+        self.input = bytearray()
+
+    def millis(self):
+        return self.now * 1000
+
+    def wait(self, ms):
+        t = self.now + ms * 0.001
+        event = self.sim.nextEvent()
+        if event is not None and self.now < event < t:
+            t = event
+        self.now = t
+
+    def delay(self, ms):
+        self.now += ms * 0.001
+
+    @property
+    def in_waiting(self):
+        self.input.extend(self.sim.transmit(self.now, self.baudrate))
+        return len(self.input)
+
+    def read(self, size = 1):
+        self.in_waiting
+        data = bytes(self.input[:size])
+        del self.input[:size]
+        return data
+
+    def write(self, data):
+        self.sim.receive(bytes(data), self.now, self.baudrate)
+        return len(data)
+
+
+def until(condition, timeout = 2.0):
+    # polls a condition set by another thread, failing after the timeout (s)
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def sim():
+    return EasyVRSimulator(**FAST)
+
+
+@pytest.fixture
+def evr(sim):
+    # on a loopback link to the simulator (a new EasyVR object on the same
+    # stream stands for a host reboot)
+    stream = open_loopback(sim)
+    yield EasyVR(stream)
+    stream.close()
+
+
+@pytest.fixture
+def virtual(monkeypatch):
+    # returns a function connecting the library to a simulator on a virtual clock
+    streams = []
+    def connect(sim):
+        stream = VirtualStream(sim)
+        streams.append(stream)
+        monkeypatch.setattr(easyvr, "_millis", stream.millis)
+        monkeypatch.setattr(easyvr, "_wait", lambda s, ms: stream.wait(ms))
+        monkeypatch.setattr(easyvr, "_delay", stream.delay)
+        return stream
+    return connect
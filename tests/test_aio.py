@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from fortebit.easyvr import aio
+from fortebit.easyvr.easyvr import EasyVR, _ARG_ZERO
+from fortebit.easyvr.simulator import EasyVRSimulator, open_socket
+
+from conftest import FAST, until
+
+
+class ScriptedSerial(aio.AsyncSerial):
+    # replies to each write with the bytes returned by a function of the data
+
+    def __init__(self, reply):
+        aio.AsyncSerial.__init__(self)
+        self.reply = reply
+        self.written = bytearray()
+
+    def write(self, data):
+        self.written.extend(data)
+        self.data_received(self.reply(bytes(data)))
+
+
+def _run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+async def _connect(sim):
+    return aio.AsyncEasyVR(await aio.open_socket(open_socket(sim)))
+
+
+def test_modules_on_one_loop():
+    sims = [EasyVRSimulator(**FAST) for i in range(3)]
+    for i in range(3):
+        sims[i].script(('word', i))
+    async def listen(sim):
+        evr = await _connect(sim)
+        assert await evr.detect()
+        assert await evr.getID() == EasyVR.EASYVR3PLUS
+        result = await evr.recognizeWord(1)
+        return result.getWord()
+    async def main():
+        return await asyncio.gather(*[listen(sim) for sim in sims])
+    assert _run(main()) == [0, 1, 2]
+
+
+def test_cancel_interrupts_the_module(sim):
+    sim.script(('word', 1, 5.0))
+    async def main():
+        evr = await _connect(sim)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(evr.recognizeWord(1), 0.1)
+        assert await evr.getID() == EasyVR.EASYVR3PLUS
+    _run(main())
+    assert bytes(sim.log) == b'iBbx '
+
+
+def test_cancel_completes_a_split_frame(sim):
+    sim.addCommand(3, 0, "LAMP")
+    async def main():
+        evr = await _connect(sim)
+        task = evr.trainCommand(3, 0)
+        # during the pause after the group
+        await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    _run(main())
+    until(lambda: len(sim.log) >= 4)
+    assert bytes(sim.log) == b'tDAb'
+
+
+def test_break_after_a_result_crossed_it():
+    # the task completes just before the break: result, then the break reply
+    def reply(tx):
+        if tx == b'b':
+            return b'ro'
+        if tx == b'x':
+            return b'x'
+        if tx == b' ':
+            return bytes([_ARG_ZERO + EasyVR.EASYVR3PLUS])
+        return b''
+    io = ScriptedSerial(reply)
+    evr = aio.AsyncEasyVR(io)
+    async def main():
+        task = evr.recognizeCommand(1)
+        await asyncio.sleep(0)
+        await evr.stop()
+        assert task.cancelled()
+        assert len(io._buf) == 0
+        assert await evr.getID() == EasyVR.EASYVR3PLUS
+    _run(main())
+
+
+def test_break_reads_a_result_already_received():
+    io = ScriptedSerial(lambda tx: b'o' if tx == b'b' else b'')
+    evr = aio.AsyncEasyVR(io)
+    async def main():
+        io.data_received(b'r')
+        await evr._break(True)
+        assert len(io._buf) == 0
+    _run(main())
+
+
+def test_results_and_errors(sim):
+    sim.addCommand(EasyVR.PASSWORD, 0, "ANNA", training=2)
+    sim.script(('command', 0), ('error', 0x11))
+    async def main():
+        evr = await _connect(sim)
+        result = await evr.recognizeCommand(EasyVR.PASSWORD)
+        assert result.getCommand() == 0
+        result = await evr.recognizeCommand(EasyVR.PASSWORD)
+        assert result.getError() == 0x11
+        result = await evr.recognizeWord(1)
+        assert result.isTimeout()
+    _run(main())
@@ -0,0 +1,56 @@
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.simulator import EasyVRSimulator, open_loopback
+
+from conftest import FAST
+
+
+def _connect(module, host = 9600, **options):
+    # a module left at some speed, reached by a host starting at another one
+    sim = EasyVRSimulator(baudrate=module, **FAST)
+    stream = open_loopback(sim, host)
+    evr = EasyVR(stream)
+    return (sim, evr, evr.connect(host, **options))
+
+
+def test_upgrade_to_the_fastest_speed():
+    (sim, evr, baud) = _connect(9600)
+    assert baud == 115200
+    assert sim.baudrate == 115200 and evr._s.baudrate == 115200
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+    evr._s.close()
+
+
+def test_module_left_at_another_speed():
+    (sim, evr, baud) = _connect(38400)
+    assert baud == 115200
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+    evr._s.close()
+
+
+def test_host_rates():
+    (sim, evr, baud) = _connect(9600, rates=[19200, 9600])
+    assert baud == 19200 and sim.baudrate == 19200
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+    evr._s.close()
+
+
+def test_reopen():
+    opened = []
+    def reopen(baud):
+        opened.append(baud)
+        stream.baudrate = baud
+    sim = EasyVRSimulator(**FAST)
+    stream = open_loopback(sim, 9600)
+    evr = EasyVR(stream)
+    assert evr.connect(9600, reopen) == 115200
+    assert opened == [115200]
+    stream.close()
+
+
+def test_module_not_found():
+    (sim, evr, baud) = _connect(57600, rates=[19200, 9600])
+    assert baud == 0
+    # back to the speed it started with
+    assert evr._s.baudrate == 9600
+    assert sim.baudrate == 57600
+    evr._s.close()
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from fortebit.easyvr import fleet
+from fortebit.easyvr.simulator import EasyVRSimulator, SimCommand, open_loopback
+from fortebit.easyvr.templates import TemplateArchive
+
+from conftest import FAST
+
+
+def _template(label):
+    return bytes(SimCommand(label, 3).export())
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / "panel.eva")
+    archive = TemplateArchive(path)
+    archive.put("on", _template("ON"), 1, 0)
+    archive.put("off", _template("OFF"), 1, 1)
+    archive.put("anna", _template("ANNA"))     # no position, not provisioned
+    archive.close()
+    return path
+
+
+def _desired(path):
+    archive = TemplateArchive(path)
+    try:
+        return fleet.load_desired(archive)
+    finally:
+        archive.close()
+
+
+def test_load_desired(archive):
+    desired = _desired(archive)
+    assert list(desired) == [1]
+    assert desired[1] == [("ON", _template("ON")), ("OFF", _template("OFF"))]
+
+
+def test_holes_are_rejected(tmp_path):
+    archive = TemplateArchive(str(tmp_path / "holes.eva"))
+    archive.put("on", _template("ON"), 1, 1)
+    with pytest.raises(ValueError):
+        archive.getGroups()
+    archive.close()
+
+
+def test_provision_modules(archive):
+    desired = _desired(archive)
+    sims = [EasyVRSimulator(**FAST) for i in range(3)]
+    sims[1].addCommand(1, 0, "ON", training=3)
+    sims[2].baudrate = 38400
+    progress = []
+    def opener(port, baudrate):
+        return open_loopback(sims[port], baudrate)
+    doc = fleet.run([0, 1, 2], desired, progress=lambda *p: progress.append(p), opener=opener)
+    assert doc["failed"] == 0
+    for sim in sims:
+        assert [(c.label, c.training) for c in sim.groups[1]] == [("ON", 3), ("OFF", 3)]
+        assert bytes(sim.groups[1][1].export()) == _template("OFF")
+    planned = [m["planned"] for m in doc["modules"]]
+    assert planned[1] < planned[0] == planned[2]
+    assert doc["operations"] == sum(planned)
+    assert (0, planned[0], planned[0]) in progress
+    # nothing left to do
+    report = fleet.provision(0, desired, opener=opener)
+    assert report["ok"] and report["planned"] == 0
+
+
+def test_failed_module(archive):
+    def opener(port, baudrate):
+        raise OSError("no such port")
+    doc = fleet.run(["/dev/none"], _desired(archive), opener=opener)
+    assert doc["failed"] == 1
+    assert doc["modules"][0]["error"] == "OSError: no such port"
+
+
+def test_main_simulated(archive, tmp_path, capsys):
+    output = str(tmp_path / "report.json")
+    assert fleet.main(["--archive", archive, "--simulate", "2", "--quiet", "--output", output]) == 0
+    with open(output) as f:
+        doc = json.load(f)
+    assert doc["failed"] == 0 and len(doc["modules"]) == 2
+    assert all(m["baudrate"] == 115200 for m in doc["modules"])
+
+
+@pytest.mark.parametrize("content", [None, b"", b"not an archive"])
+def test_main_refuses_bad_archives(tmp_path, content, capsys):
+    path = tmp_path / "panel.eva"
+    if content is not None:
+        path.write_bytes(content)
+    with pytest.raises(SystemExit) as e:
+        fleet.main(["--archive", str(path), "--simulate", "1"])
+    assert e.value.code == 2
+    assert content is not None or not path.exists()
+
+
+def test_main_refuses_an_empty_archive(tmp_path, capsys):
+    path = str(tmp_path / "empty.eva")
+    TemplateArchive(path).close()
+    with pytest.raises(SystemExit) as e:
+        fleet.main(["--archive", path, "--simulate", "1"])
+    assert e.value.code == 2
@@ -0,0 +1,31 @@
+import struct
+import zlib
+
+from tools import imgprep
+
+
+def _png(path, width, height, rgba):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\x00" + bytes(rgba) * width for y in range(height))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw)))
+        f.write(chunk(b"IEND", b""))
+
+
+def test_paths_do_not_depend_on_the_current_directory(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    (project / "images").mkdir(parents=True)
+    _png(str(project / "images" / "dot.png"), 2, 2, (0xff, 0x80, 0x00, 0xff))
+    manifests = []
+    for cwd in (project, tmp_path):
+        monkeypatch.chdir(cwd)
+        assert imgprep.main(["--src", str(project / "images"), "--dst", str(project / "images" / "build"),
+            "--manifest", str(project / "assets.py")]) == 0
+        manifests.append((project / "assets.py").read_text())
+    assert manifests[0] == manifests[1]
+    assert "'images/build/dot.argb4.z'" in manifests[0]
+    data = (project / "images" / "build" / "dot.argb4.z").read_bytes()
+    assert zlib.decompress(data) == bytes([0x80, 0xff]) * 4     # ARGB4 0xff80, little endian
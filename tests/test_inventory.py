@@ -0,0 +1,73 @@
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.simulator import checksum
+
+
+def _populate(sim):
+    sim.addCommand(1, 0, "ON", training=2)
+    sim.addCommand(1, 1, "OFF", training=1)
+    sim.addCommand(EasyVR.PASSWORD, 0, "ADMIN", training=2)
+
+
+def test_inventory_is_cached(evr, sim):
+    _populate(sim)
+    assert evr.getCommandCount(1) == 2
+    assert evr.dumpCommand(1, 1) == ("OFF", 1)
+    assert evr.getGroupMask() == (1 << 1) | (1 << EasyVR.PASSWORD)
+    writes = evr._s.writes
+    assert evr.getGroupMask() == (1 << 1) | (1 << EasyVR.PASSWORD)
+    assert evr.getCommandCount(1) == 2
+    assert evr.dumpCommand(1, 1) == ("OFF", 1)
+    assert evr._s.writes == writes
+
+
+def test_changes_invalidate_only_what_they_touch(evr, sim):
+    _populate(sim)
+    assert evr.getCommandCount(1) == 2
+    assert evr.dumpCommand(1, 0) == ("ON", 2)
+    evr.addCommand(1, 2)
+    evr.setCommandLabel(1, 2, "DIM")
+    assert evr.getCommandCount(1) == 3
+    assert evr.dumpCommand(1, 2) == ("DIM", 0)
+    writes = evr._s.writes
+    assert evr.dumpCommand(1, 0) == ("ON", 2)
+    assert evr._s.writes == writes
+    evr.removeCommand(1, 0)
+    assert evr.getCommandCount(1) == 2
+    assert evr.dumpCommand(1, 0) == ("OFF", 1)
+
+
+def test_snapshot_skips_enumeration(evr, sim):
+    _populate(sim)
+    assert evr.getCommandChecksum(1, 0) == checksum(sim.groups[1][0].data)
+    snapshot = evr.saveInventory()
+
+    evr = EasyVR(evr._s)
+    assert evr.loadInventory(snapshot)
+    writes = evr._s.writes
+    assert evr.getCommandCount(EasyVR.PASSWORD) == 1
+    assert evr.dumpCommand(EasyVR.PASSWORD, 0) == ("ADMIN", 2)
+    assert evr.getCommandChecksum(1, 0) == checksum(sim.groups[1][0].data)
+    assert evr._s.writes == writes
+
+
+def test_snapshot_of_another_module_is_rejected(evr, sim):
+    _populate(sim)
+    snapshot = evr.saveInventory()
+    sim.addCommand(2, 0, "NEW")
+    evr = EasyVR(evr._s)
+    assert not evr.loadInventory(snapshot)
+    assert evr.getCommandCount(2) == 1
+
+
+def test_snapshot_rejects_garbage(evr):
+    assert not evr.loadInventory(b'garbage')
+    assert not evr.loadInventory(b'')
+
+
+def test_snapshot_file(evr, sim, tmp_path):
+    _populate(sim)
+    path = str(tmp_path / "inventory.bin")
+    evr.saveInventoryFile(path)
+    evr = EasyVR(evr._s)
+    assert evr.loadInventoryFile(path)
+    assert not evr.loadInventoryFile(str(tmp_path / "missing.bin"))
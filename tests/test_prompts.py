@@ -0,0 +1,68 @@
+import pytest
+
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.prompts import PromptQueue
+from fortebit.easyvr.session import Session
+
+from conftest import until
+
+
+@pytest.fixture
+def session(evr):
+    session = Session(evr)
+    session.start()
+    yield session
+    session.close()
+
+
+def test_prompts_play_in_order(session, sim):
+    prompts = PromptQueue(session)
+    done = []
+    first = prompts.playSound(1, callback=done.append)
+    second = prompts.playSound(2, callback=done.append)
+    until(second.isDone)
+    assert done == [first, second]
+    assert len(first.getResults()) == 1 and first.getResults()[0].getError() < 0
+    assert prompts.pending() == 0
+    assert bytes(sim.log).count(b'w') == 2
+
+
+def test_tones(session, sim):
+    prompts = PromptQueue(session)
+    prompt = prompts.playTones("1#", duration=1)
+    until(prompt.isDone)
+    assert not prompt.isCancelled() and prompt.getError() is None
+    assert len(prompt.getResults()) == 2
+    with pytest.raises(ValueError):
+        prompts.playTones("1X")
+
+
+def test_missing_message(session, sim):
+    prompts = PromptQueue(session)
+    prompt = prompts.playMessage(0)
+    until(prompt.isDone)
+    assert prompt.getResults()[0].getError() == EasyVR.ERR_RP_NO_MSG
+
+
+def test_replace(session, sim):
+    sim.latency['play'] = 0.3
+    prompts = PromptQueue(session)
+    first = prompts.playSound(1)
+    second = prompts.playTones("123", duration=1)
+    until(lambda: session.getCurrent() is not None)
+    last = prompts.playSound(3, replace=True)
+    until(last.isDone)
+    assert first.isCancelled() and second.isCancelled()
+    assert not last.isCancelled() and len(last.getResults()) == 1
+    # the first sound was stopped, the tones never played
+    assert bytes(sim.log).count(b'w') == 2
+
+
+def test_prompt_interrupts_recognition(session, sim):
+    sim.script(('word', 1, 5.0))
+    listen = session.submitTask(lambda evr: evr.recognizeWord(1))
+    until(lambda: session.getCurrent() is listen)
+    prompt = PromptQueue(session).playSound(1)
+    until(prompt.isDone)
+    assert listen.isPreempted()
+    assert len(prompt.getResults()) == 1
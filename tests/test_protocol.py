@@ -0,0 +1,178 @@
+import pytest
+
+from fortebit.easyvr.easyvr import EasyVR, _ARG_ZERO, _RX_SIZE
+from fortebit.easyvr.simulator import EasyVRSimulator
+
+from conftest import FAST, ScriptedStream, until
+
+
+def test_command_written_as_one_frame(evr):
+    stream = evr._s
+    writes = stream.writes
+    evr.setLevel(2)
+    assert stream.writes == writes + 1
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+
+
+def test_frame_split_only_when_the_group_changes(evr, sim):
+    sim.addCommand(3, 0, "LAMP")
+    stream = evr._s
+    writes = stream.writes
+    evr.eraseCommand(3, 0)
+    assert stream.writes == writes + 2    # paused after the new group
+    writes = stream.writes
+    evr.eraseCommand(3, 0)
+    assert stream.writes == writes + 1
+
+
+def test_frame_bytes(evr, sim):
+    sim.addCommand(3, 0, "LAMP")
+    del sim.log[:]
+    evr.setCommandLabel(3, 0, "DOOR")
+    assert bytes(sim.log) == b'nDA' + bytes([0x41 + 4]) + b'DOOR'
+
+
+def test_pipelined_acks(evr, sim):
+    sim.addCommand(3, 0, "KITCHEN LIGHT", training=2)
+    evr.enableStats()
+    assert evr.dumpCommand(3, 0) == ("KITCHEN_LIGHT", 2)
+    stats = evr.getStats()["p"]
+    # one ACK per argument, but not one write per ACK
+    assert stats["acks"] >= len("KITCHEN_LIGHT") + 2
+    assert stats["writes"] <= 5
+
+
+def test_pipelined_export(evr, sim):
+    cmd = sim.addCommand(EasyVR.PASSWORD, 0, "ANNA", training=2)
+    assert bytes(evr.exportCommand(EasyVR.PASSWORD, 0)) == bytes(cmd.export())
+
+
+def test_replies_split_across_reads():
+    # the argument arrives only after its ACK
+    stream = ScriptedStream(lambda tx: b'x' if tx == b'x' else bytes([_ARG_ZERO + EasyVR.EASYVR3]))
+    assert EasyVR(stream).getID() == EasyVR.EASYVR3
+
+
+def test_receive_ring_buffer_wraps():
+    stream = ScriptedStream()
+    evr = EasyVR(stream)
+    data = bytes(range(0x41, 0x41 + 20))
+    evr._rxhead = _RX_SIZE - 7
+    stream.input.extend(data)
+    assert bytes(evr._recvBuf(len(data), 100)) == data
+    assert evr._rxcount == 0
+    assert evr._rxhead == 13
+
+
+def test_long_reply_through_the_ring_buffer(evr, sim):
+    # a few exports (517 bytes each), so that the buffer wraps
+    cmd = sim.addCommand(EasyVR.PASSWORD, 0, "ANNA", training=2)
+    for i in range(3):
+        assert bytes(evr.exportCommand(EasyVR.PASSWORD, 0)) == bytes(cmd.export())
+
+
+def test_timeout_is_a_deadline(virtual):
+    # the module never replies in time
+    stream = virtual(EasyVRSimulator(reply=60.0))
+    evr = EasyVR(stream)
+    start = stream.millis()
+    with pytest.raises(TimeoutError):
+        evr.getID()
+    # the wire time of the request, then the reply timeout
+    assert stream.millis() - start == pytest.approx(EasyVR.DEF_TIMEOUT + evr._wireTime(1))
+
+
+def test_wait_result_timeout(virtual):
+    stream = virtual(EasyVRSimulator(recognition=1.0))
+    evr = EasyVR(stream)
+    evr.recognizeWord(1)
+    start = stream.millis()
+    assert not evr.waitResult(50)
+    assert stream.millis() - start == pytest.approx(50)
+    # the task goes on
+    assert evr.waitResult(2000)
+    assert evr.isTimeout()
+
+
+def test_wait_result_returns_on_arrival(virtual):
+    sim = EasyVRSimulator(**FAST)
+    sim.script(('word', 1, 0.3))
+    stream = virtual(sim)
+    evr = EasyVR(stream)
+    evr.recognizeWord(1)
+    start = stream.millis()
+    assert evr.waitResult(1000)
+    assert evr.getWord() == 1
+    assert 300 <= stream.millis() - start < 310
+
+
+def test_stop_after_a_result_crossed_the_break():
+    # the task completes just before the break: result, then the break reply
+    def reply(tx):
+        if tx == b'b':
+            return b'ro'
+        if tx == b'x':
+            return b'x'
+        if tx == b' ':
+            return bytes([_ARG_ZERO + EasyVR.EASYVR3PLUS])
+        return b''
+    stream = ScriptedStream(reply)
+    evr = EasyVR(stream)
+    evr.recognizeCommand(1)
+    evr._sendFrame()
+    evr.stop()
+    assert stream.in_waiting == 0
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+
+
+def test_stop_interrupts_a_task(evr, sim):
+    evr.recognizeWord(1)
+    evr.stop()
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+
+
+def test_stop_when_idle(evr):
+    evr.stop()
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+
+
+def test_play_then_listen(evr, sim):
+    sim.script(('word', 2))
+    evr.playAndRecognizeWord(1, EasyVR.VOL_FULL, 1)
+    assert evr.getListenLatency() >= 0
+    assert evr.waitResult(1000)
+    assert evr.getWord() == 2
+    # the recognition request follows the end of playback
+    assert bytes(sim.log) == b'wABPiB '   # sound 1 at full volume, word set 1, ACK
+
+
+def test_play_then_listen_with_the_reader(evr, sim):
+    results = []
+    evr.addListener(results.append)
+    evr.startReader()
+    sim.script(('command', 0))
+    evr.playAndRecognizeCommand(1, EasyVR.VOL_FULL, 1)
+    assert evr.getListenLatency() >= 0
+    until(lambda: len(results) == 1)
+    evr.stopReader()
+    assert results[0].getCommand() == 0
+
+
+def test_continuous_listening(evr, sim):
+    sim.script(('timeout',), ('word', 2))
+    evr.listenWords(1)
+    assert evr.waitResult(1000) and evr.isTimeout()
+    assert evr.isListening()
+    assert evr.waitResult(1000) and evr.getWord() == 2
+    evr.stopListening()
+    assert not evr.isListening()
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+
+
+def test_continuous_listening_ends_on_invalid(evr, sim):
+    evr.listenWords(len(sim.grammars))   # no such grammar
+    assert evr.waitResult(1000)
+    assert evr.isInvalid()
+    assert not evr.isListening()
+    assert not evr.waitResult(100)
+    assert sim.log.count(ord('i')) == 1
@@ -0,0 +1,56 @@
+import queue
+
+import pytest
+
+from fortebit.easyvr.easyvr import EasyVR
+
+
+@pytest.fixture
+def reader(evr):
+    results = queue.Queue()
+    evr.startReader(results)
+    yield results
+    evr.stopReader()
+
+
+def test_results_are_queued(evr, sim, reader):
+    sim.script(('word', 3))
+    evr.recognizeWord(1)
+    result = reader.get(timeout=2)
+    assert result.getRequest() == b'i'
+    assert result.getWord() == 3
+    assert not evr.isListening()
+
+
+def test_listeners_are_called(evr, sim, reader):
+    heard = []
+    def failing(result):
+        raise ValueError
+    evr.addListener(failing)
+    evr.addListener(heard.append)
+    evr.playSoundAsync(1, EasyVR.VOL_FULL)
+    reader.get(timeout=2)
+    assert len(heard) == 1 and heard[0].getError() < 0
+    # a failing listener does not stop the reader
+    sim.script(('command', 0))
+    evr.recognizeCommand(1)
+    assert reader.get(timeout=2).getCommand() == 0
+    assert len(heard) == 2
+    evr.removeListener(heard.append)
+
+
+def test_commands_while_reading(evr, sim, reader):
+    # a command cancels the pending task, its result is never delivered
+    sim.script(('word', 1, 0.5))
+    evr.recognizeWord(1)
+    evr.stop()
+    assert evr.getID() == EasyVR.EASYVR3PLUS
+    with pytest.raises(queue.Empty):
+        reader.get(timeout=0.7)
+
+
+def test_token_result(evr, sim, reader):
+    sim.script(('token', 0x25))
+    evr.detectToken(8, EasyVR.REJECTION_AVG, 0)
+    result = reader.get(timeout=2)
+    assert result.getToken() == 0x25
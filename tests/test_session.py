@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.session import Session, PRIORITY_UI, PRIORITY_BACKGROUND
+
+from conftest import until
+
+
+@pytest.fixture
+def session(evr):
+    session = Session(evr)
+    session.start()
+    yield session
+    session.close()
+
+
+def test_jobs_run_in_priority_order(session):
+    order = []
+    blocker = session.submit(lambda evr: time.sleep(0.1))
+    session.submit(lambda evr: order.append("background"), PRIORITY_BACKGROUND)
+    session.submit(lambda evr: order.append("normal"))
+    session.submit(lambda evr: order.append("ui"), PRIORITY_UI)
+    session.call(lambda evr: None, PRIORITY_BACKGROUND)
+    assert blocker.isDone()
+    assert order == ["ui", "normal", "background"]
+
+
+def test_task_result(session, sim):
+    sim.script(('word', 3))
+    result = session.submitTask(lambda evr: evr.recognizeWord(1)).wait()
+    assert result.getWord() == 3
+    assert result.getRequest() == b'i'
+
+
+def test_cancel_task(session, sim):
+    sim.script(('word', 1, 5.0))
+    job = session.submitTask(lambda evr: evr.recognizeWord(1))
+    until(lambda: session.getCurrent() is job)
+    job.cancel()
+    until(job.isDone)
+    assert job.isCancelled() and not job.isPreempted()
+    assert session.call(lambda evr: evr.getID()) == EasyVR.EASYVR3PLUS
+
+
+def test_preempt_task(session, sim):
+    sim.script(('word', 1, 5.0))
+    job = session.submitTask(lambda evr: evr.recognizeWord(1))
+    until(lambda: session.getCurrent() is job)
+    assert session.call(lambda evr: evr.getID(), PRIORITY_UI) == EasyVR.EASYVR3PLUS
+    assert job.isDone() and job.isPreempted()
+
+
+def test_cancel_queued_job(session):
+    blocker = session.submit(lambda evr: time.sleep(0.1))
+    job = session.submit(lambda evr: evr.getID())
+    job.cancel()
+    assert job.wait() is None
+    assert blocker.isDone() and job.isCancelled()
+
+
+def test_close_cancels_the_queue(evr):
+    session = Session(evr)
+    session.start()
+    session.submit(lambda evr: time.sleep(0.1))
+    job = session.submit(lambda evr: evr.getID())
+    session.close()
+    job.wait()
+    assert job.isCancelled()
+
+
+def test_cancel_listen_between_results(session, sim):
+    # results keep coming, so waitResult never times out
+    results = []
+    job = session.submitListen(lambda evr: evr.listenWords(1), lambda r: results.append(r) and False)
+    until(lambda: len(results) >= 2)
+    job.cancel()
+    until(job.isDone, 1.0)
+    assert job.isCancelled()
+    assert session.call(lambda evr: evr.getID()) == EasyVR.EASYVR3PLUS
+
+
+def test_preempt_listen_between_results(session, sim):
+    results = []
+    job = session.submitListen(lambda evr: evr.listenWords(1), lambda r: results.append(r) and False)
+    until(lambda: len(results) >= 2)
+    assert session.call(lambda evr: evr.getID(), PRIORITY_UI) == EasyVR.EASYVR3PLUS
+    assert job.isDone() and job.isPreempted()
+
+
+def test_listen_until_heard(session, sim):
+    sim.script(('timeout',), ('word', 2), ('word', 0))
+    job = session.submitListen(lambda evr: evr.listenWords(1), lambda r: r.getWord() == 0)
+    assert job.wait().getWord() == 0
+    assert session.call(lambda evr: evr.isListening()) is False
+
+
+def test_listen_ends_on_invalid(session, sim):
+    results = []
+    job = session.submitListen(lambda evr: evr.listenWords(len(sim.grammars)), lambda r: results.append(r))
+    assert job.wait().isInvalid()
+    assert len(results) == 1
+    assert sim.log.count(ord('i')) == 1
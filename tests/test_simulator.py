@@ -0,0 +1,23 @@
+import pytest
+
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.simulator import EasyVRSimulator
+
+
+@pytest.mark.parametrize("timeout, seconds", [(2, 2.0), (0, 5.0), (9, 5.0)])
+def test_recording_ends_at_the_timeout(virtual, timeout, seconds):
+    stream = virtual(EasyVRSimulator(record=5.0))
+    evr = EasyVR(stream)
+    evr.recordMessageAsync(0, EasyVR.MSG_8BIT, timeout)
+    start = stream.now
+    assert evr.waitResult(10000)
+    assert stream.now - start == pytest.approx(seconds, abs=0.01)
+    (bits, length) = evr.dumpMessage(0)
+    assert bits == EasyVR.MSG_8BIT and length == 8000 * int(seconds + 1)
+
+
+def test_sound_and_message_playback(evr, sim):
+    evr.playSoundAsync(1, EasyVR.VOL_FULL)
+    assert evr.waitResult(1000) and evr.getError() < 0
+    evr.playMessageAsync(0, EasyVR.SPEED_NORMAL, EasyVR.ATTEN_NONE)
+    assert evr.waitResult(1000) and evr.getError() == EasyVR.ERR_RP_NO_MSG
@@ -0,0 +1,163 @@
+import pytest
+
+from fortebit.easyvr.easyvr import EasyVR
+from fortebit.easyvr.simulator import SimCommand
+from fortebit.easyvr.templates import TemplateArchive, TemplateCache, TemplateLibrary, TemplateSync
+
+
+def _template(label):
+    return bytes(SimCommand(label, 3).export())
+
+
+@pytest.fixture
+def library():
+    library = TemplateLibrary()
+    for user in ("ANNA", "BOB", "CARL"):
+        library.put(user, _template(user))
+    return library
+
+
+def test_cache_imports_and_verifies(evr, sim, library):
+    changes = []
+    cache = TemplateCache(evr, library, slots=8, callback=changes.append)
+    index = cache.load("bob")
+    assert index == 0
+    cmd = sim.groups[EasyVR.PASSWORD][index]
+    assert cmd.label == "BOB" and cmd.training > 0
+    assert bytes(cmd.export()) == library.get("BOB")
+    assert changes
+    assert cache.load("bob") == index
+    assert cache.getStats() == (1, 1, 1)
+    assert cache.load("nobody") == -1
+
+
+def test_cache_rejected_template(evr, sim, library):
+    cache = TemplateCache(evr, library, slots=8)
+    sim.script(('error', 0x11))
+    with pytest.raises(ValueError):
+        cache.load("anna")
+    cmd = sim.groups[EasyVR.PASSWORD][0]
+    assert cmd.label == "" and cmd.training == 0
+    assert cache.isResident("anna") == -1
+    # the erased command is reused
+    assert cache.load("carl") == 0
+
+
+def test_cache_keeps_foreign_commands(evr, sim, library):
+    sim.addCommand(EasyVR.PASSWORD, 0, "ADMIN", 2)
+    sim.addCommand(EasyVR.PASSWORD, 1, "BOB", 2)
+    sim.addCommand(EasyVR.PASSWORD, 2, "", 0)
+    cache = TemplateCache(evr, library, slots=4)
+    assert cache.isResident("bob") == 1
+    assert cache.load("anna") == 2
+    assert cache.load("carl") == 3
+    # full: the least recently used user is replaced, never the reserved command
+    library.put("dave", _template("DAVE"))
+    assert cache.load("dave") == 1
+    assert cache.isResident("bob") == -1
+    assert sim.groups[EasyVR.PASSWORD][0].label == "ADMIN"
+    assert sim.groups[EasyVR.PASSWORD][0].training == 2
+
+
+def test_cache_all_reserved(evr, sim, library):
+    sim.addCommand(EasyVR.PASSWORD, 0, "ADMIN", 2)
+    cache = TemplateCache(evr, library, slots=1)
+    with pytest.raises(ValueError):
+        cache.load("anna")
+
+
+def test_cache_snapshot_follows_changes(evr, sim, library):
+    saved = []
+    cache = TemplateCache(evr, library, slots=8, callback=lambda c: saved.append(evr.saveInventory()))
+    cache.load("anna")
+    reboot = EasyVR(evr._s)
+    assert reboot.loadInventory(saved[-1])
+    assert reboot.dumpCommand(EasyVR.PASSWORD, 0) == ("ANNA", 3)
+
+
+def test_library_round_trip(library, tmp_path):
+    path = str(tmp_path / "users.bin")
+    library.saveFile(path)
+    copy = TemplateLibrary()
+    copy.loadFile(path)
+    assert sorted(copy.users()) == ["ANNA", "BOB", "CARL"]
+    assert copy.get("bob") == library.get("bob")
+
+
+def test_archive(tmp_path):
+    path = str(tmp_path / "templates.eva")
+    archive = TemplateArchive(path)
+    archive.put("anna", _template("ANNA"), 1, 0)
+    archive.put("bob", _template("BOB"), 1, 1)
+    archive.put("anna", _template("ANNA"), 1, 0)
+    archive.remove("bob")
+    assert archive.getSize() == (1, 3)
+    assert archive.compact() == 2
+    archive.close()
+    archive = TemplateArchive(path)
+    assert archive.users() == ["ANNA"]
+    assert bytes(archive.get("anna")) == _template("ANNA")
+    assert archive.get("bob") is None
+    archive.close()
+
+
+def test_archive_keys_and_recovery(tmp_path):
+    path = str(tmp_path / "templates.eva")
+    archive = TemplateArchive(path)
+    archive.put("on", _template("ON"), 1, 0)
+    archive.put("off", _template("OFF"), 1, 1)
+    archive.put("anna", _template("ANNA"))
+    assert sorted(archive.keys(1)) == [(1, 0, "ON"), (1, 1, "OFF")]
+    assert archive.keys(label="anna") == [(EasyVR.PASSWORD, -1, "ANNA")]
+    assert bytes(archive.lookup(1, 1, "OFF")) == _template("OFF")
+    archive.close()
+    # an append interrupted after the header update
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 300)
+    archive = TemplateArchive(path)
+    assert archive.getSize() == (2, 2)
+    assert archive.get("anna") is None
+    archive.close()
+
+
+def test_archive_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not an archive, just some bytes")
+    with pytest.raises(ValueError):
+        TemplateArchive(str(path))
+
+
+def test_sync_plan_and_apply(evr, sim):
+    sim.addCommand(1, 0, "STALE", 2)
+    sim.addCommand(1, 1, "GONE", 2)
+    sync = TemplateSync(evr)
+    sync.setGroup(1, [("ON", _template("ON")), ("OFF", None)])
+    ops = sync.plan()
+    assert ("import", 1, 0) in ops and ("label", 1, 1) in ops and ("erase", 1, 1) in ops
+    assert sync.apply() == ops
+    assert [(c.label, c.training) for c in sim.groups[1]] == [("ON", 3), ("OFF", 0)]
+    assert sync.plan() == []
+
+
+def test_sync_rejected_template(evr, sim):
+    sync = TemplateSync(evr)
+    sync.setGroup(2, [("ON", _template("ON"))])
+    sim.script(('error', 0x11))
+    with pytest.raises(ValueError):
+        sync.apply()
+    assert sim.groups[2][0].training == 0
+
+
+def test_sync_from_the_snapshot(evr, sim):
+    sync = TemplateSync(evr)
+    sync.setGroup(1, [("ON", _template("ON"))])
+    sync.apply()
+    snapshot = evr.saveInventory()
+    evr = EasyVR(evr._s)
+    assert evr.loadInventory(snapshot)
+    sync = TemplateSync(evr)
+    sync.setGroup(1, [("ON", _template("ON")), ("OFF", _template("OFF"))])
+    writes = evr._s.writes
+    assert sync.plan() == [("add", 1, 1), ("import", 1, 1), ("label", 1, 1)]
+    # read from the snapshot, no template exported
+    assert evr._s.writes == writes
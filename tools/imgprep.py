@@ -0,0 +1,215 @@
+"""
+Converts the images in images/ to BT81x bitmaps (host side build step, CPython).
+
+Each PNG is decoded here, converted to a BT81x bitmap format and compressed for
+the coprocessor CMD_INFLATE command, so that the display only copies (or
+inflates) it into RAM_G instead of decoding a PNG at runtime. The bitmap
+parameters are written to a manifest module (assets.py) read by gui.py, with
+the output files relative to the directory of the manifest (the project root)::
+
+    python tools/imgprep.py                     # images/*.png -> images/build/, assets.py
+    python tools/imgprep.py --format RGB565 --raw
+
+Only 8 bit, non-interlaced PNG images are supported (no external libraries).
+Run it again whenever an image changes; the manifest records the SHA-1 of each
+output file.
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+
+# BT81x bitmap formats: code and bits per pixel
+FORMATS = {
+    "ARGB1555": (0, 16),
+    "L8": (3, 8),
+    "RGB332": (4, 8),
+    "ARGB4": (6, 16),
+    "RGB565": (7, 16),
+}
+
+# channels per PNG color type
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa = abs(p - a)
+    pb = abs(p - b)
+    pc = abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+
+def read_png(path):
+    """
+    Decodes a PNG file.
+
+    :return: a tuple (width, height, pixels) with a list of (r, g, b, a) rows
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("%s: not a PNG file" % path)
+    pos = 8
+    idat = bytearray()
+    palette = []
+    alpha = b""
+    while pos < len(data):
+        (length, kind) = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            (width, height, depth, color, comp, filt, interlace) = struct.unpack(">IIBBBBB", chunk)
+            if depth != 8 or interlace != 0 or color not in _CHANNELS:
+                raise ValueError("%s: only 8 bit non-interlaced images are supported" % path)
+        elif kind == b"PLTE":
+            palette = [tuple(chunk[i:i + 3]) for i in range(0, len(chunk), 3)]
+        elif kind == b"tRNS":
+            alpha = chunk
+        elif kind == b"IDAT":
+            idat.extend(chunk)
+        elif kind == b"IEND":
+            break
+    raw = zlib.decompress(bytes(idat))
+    bpp = _CHANNELS[color]
+    stride = width * bpp
+    rows = []
+    prev = bytearray(stride)
+    pos = 0
+    for y in range(height):
+        ftype = raw[pos]
+        line = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        for i in range(stride):
+            a = line[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            if ftype == 1:
+                line[i] = (line[i] + a) & 0xFF
+            elif ftype == 2:
+                line[i] = (line[i] + b) & 0xFF
+            elif ftype == 3:
+                line[i] = (line[i] + ((a + b) >> 1)) & 0xFF
+            elif ftype == 4:
+                line[i] = (line[i] + _paeth(a, b, c)) & 0xFF
+        prev = line
+        row = []
+        for x in range(width):
+            px = line[x * bpp:(x + 1) * bpp]
+            if color == 0:
+                row.append((px[0], px[0], px[0], 255))
+            elif color == 2:
+                row.append((px[0], px[1], px[2], 255))
+            elif color == 3:
+                (r, g, b) = palette[px[0]]
+                row.append((r, g, b, alpha[px[0]] if px[0] < len(alpha) else 255))
+            elif color == 4:
+                row.append((px[0], px[0], px[0], px[1]))
+            else:
+                row.append(tuple(px))
+        rows.append(row)
+    return (width, height, rows)
+
+
+def convert(rows, fmt):
+    """
+    Converts decoded pixels to a BT81x bitmap format (little endian words).
+
+    :return: the bitmap data
+    """
+    out = bytearray()
+    for row in rows:
+        for (r, g, b, a) in row:
+            if fmt == "ARGB4":
+                v = ((a >> 4) << 12) | ((r >> 4) << 8) | ((g >> 4) << 4) | (b >> 4)
+            elif fmt == "RGB565":
+                v = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+            elif fmt == "ARGB1555":
+                v = ((a >> 7) << 15) | ((r >> 3) << 10) | ((g >> 3) << 5) | (b >> 3)
+            elif fmt == "RGB332":
+                out.append((r & 0xE0) | ((g >> 3) & 0x1C) | (b >> 6))
+                continue
+            else:
+                out.append((r * 77 + g * 150 + b * 29) >> 8)
+                continue
+            out.append(v & 0xFF)
+            out.append(v >> 8)
+    return out
+
+
+def build(src, dst, fmt = "ARGB4", compress = True, root = "."):
+    """
+    Converts all the PNG images of a directory.
+
+    :param root: the directory the output file names are relative to
+
+    :return: the manifest, a dictionary of bitmap parameters by image name
+    """
+    (code, bits) = FORMATS[fmt]
+    os.makedirs(dst, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(src)):
+        if not name.lower().endswith(".png"):
+            continue
+        (width, height, rows) = read_png(os.path.join(src, name))
+        data = convert(rows, fmt)
+        packed = zlib.compress(bytes(data), 9) if compress else bytes(data)
+        out = os.path.join(dst, "%s.%s%s" % (os.path.splitext(name)[0], fmt.lower(), ".z" if compress else ".bin"))
+        with open(out, "wb") as f:
+            f.write(packed)
+        manifest[name] = {
+            "file": os.path.relpath(out, root).replace(os.sep, "/"),
+            "width": width,
+            "height": height,
+            "format": code,
+            "stride": width * bits // 8,
+            "size": len(data),
+            "packed": len(packed),
+            "compressed": compress,
+            "sha1": hashlib.sha1(packed).hexdigest(),
+        }
+    return manifest
+
+
+def write_manifest(manifest, path):
+    with open(path, "w") as f:
+        f.write("# BT81x bitmaps of images/, generated by tools/imgprep.py (do not edit)\n")
+        f.write("#\n# name: file (from the project root, registered by its name), width, height,\n")
+        f.write("# format, stride, size (in RAM_G), packed size,\n")
+        f.write("# compressed (for CMD_INFLATE), sha1 of the file\n\n")
+        f.write("IMAGES = {\n")
+        for name in sorted(manifest):
+            m = manifest[name]
+            f.write("    %r: (%r, %d, %d, %d, %d, %d, %d, %r, %r),\n" % (name, m["file"], m["width"],
+                m["height"], m["format"], m["stride"], m["size"], m["packed"], m["compressed"], m["sha1"]))
+        f.write("}\n")
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog="imgprep", description="BT81x image preprocessing")
+    parser.add_argument("--src", default="images", help="directory of the PNG images")
+    parser.add_argument("--dst", default="images/build", help="output directory")
+    parser.add_argument("--manifest", default="assets.py", help="manifest module read by gui.py")
+    parser.add_argument("--format", default="ARGB4", choices=sorted(FORMATS), help="bitmap format")
+    parser.add_argument("--raw", action="store_true", help="do not compress the bitmaps")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.abspath(args.manifest))
+    manifest = build(args.src, args.dst, args.format, not args.raw, root)
+    write_manifest(manifest, args.manifest)
+    for name in sorted(manifest):
+        m = manifest[name]
+        print("%s: %dx%d, %d bytes -> %s (%d bytes)" % (name, m["width"], m["height"], m["size"], m["file"], m["packed"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())